@@ -0,0 +1,82 @@
+"""
+Configuración de la base de datos a partir de variables de entorno.
+
+DB_ENGINE elige el perfil:
+- 'sqlite' (por defecto): archivo DB_NAME (db.sqlite3) en modo WAL, con
+  synchronous=NORMAL, mmap y espera ante bloqueos (DB_BUSY_TIMEOUT) para que
+  lecturas y escrituras no se bloqueen entre sí. Las transacciones empiezan
+  con BEGIN IMMEDIATE (SQLITE_TRANSACTION_MODE) para que dos escritores
+  esperen su turno en vez de fallar con "database is locked" al subir de
+  lectura a escritura.
+- 'postgres': DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT. Conexiones
+  persistentes DB_CONN_MAX_AGE segundos con chequeo de salud antes de
+  reutilizarlas; con DB_POOL=1 usa el pool de psycopg (requiere
+  psycopg[pool]) de DB_POOL_MIN a DB_POOL_MAX conexiones, y CONN_MAX_AGE
+  queda en 0 porque el pool ya las mantiene abiertas.
+
+Ejemplo con un Postgres local:
+    DB_ENGINE=postgres DB_NAME=licoreria DB_USER=licoreria DB_PASSWORD=... python manage.py test licoreria
+"""
+import os
+
+MOTORES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+}
+
+
+def _bool(valor):
+    return str(valor).strip().lower() in ('1', 'true', 'yes', 'si', 'on')
+
+
+def sqlite(entorno, base_dir):
+    timeout = int(entorno.get('DB_BUSY_TIMEOUT', 20))
+    pragmas = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={int(entorno.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))}",
+        f"PRAGMA busy_timeout={timeout * 1000}",
+    ]
+    return {
+        'ENGINE': MOTORES['sqlite'],
+        'NAME': entorno.get('DB_NAME') or base_dir / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': timeout,
+            'init_command': ';'.join(pragmas),
+            'transaction_mode': entorno.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE') or None,
+        },
+    }
+
+
+def postgres(entorno):
+    opciones = {}
+    conn_max_age = int(entorno.get('DB_CONN_MAX_AGE', 60))
+    if _bool(entorno.get('DB_POOL', False)):
+        opciones['pool'] = {
+            'min_size': int(entorno.get('DB_POOL_MIN', 2)),
+            'max_size': int(entorno.get('DB_POOL_MAX', 10)),
+            'timeout': int(entorno.get('DB_POOL_TIMEOUT', 10)),
+        }
+        conn_max_age = 0
+    return {
+        'ENGINE': MOTORES['postgres'],
+        'NAME': entorno.get('DB_NAME', 'licoreria'),
+        'USER': entorno.get('DB_USER', ''),
+        'PASSWORD': entorno.get('DB_PASSWORD', ''),
+        'HOST': entorno.get('DB_HOST', 'localhost'),
+        'PORT': entorno.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': opciones,
+    }
+
+
+def configuracion(base_dir, entorno=None):
+    """Entrada 'default' de DATABASES según DB_ENGINE"""
+    entorno = os.environ if entorno is None else entorno
+    motor = entorno.get('DB_ENGINE', 'sqlite').lower()
+    if motor in ('postgres', 'postgresql'):
+        return postgres(entorno)
+    if motor == 'sqlite':
+        return sqlite(entorno, base_dir)
+    raise ValueError(f"DB_ENGINE desconocido: {motor!r} (usar 'sqlite' o 'postgres')")
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from config import basedatos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -42,20 +45,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'licoreria.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'licoreria.middleware.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'licoreria.middleware.AuditoriaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (ver licoreria/metricas.py)
+        'BACKEND': 'licoreria.metricas.PlantillasMedidas',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,6 +70,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'licoreria.context_processors.carrito',
+                'licoreria.context_processors.catalogo',
             ],
         },
     },
@@ -74,11 +83,32 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Perfil según variables de entorno DB_* (ver config/basedatos.py):
+# SQLite en WAL por defecto, PostgreSQL con DB_ENGINE=postgres
 DATABASES = {
+    'default': basedatos.configuracion(BASE_DIR),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'apis': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'apis-externas',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Carritos con CART_STORE BACKEND 'cache'. En producción apuntar a Redis:
+    # 'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+    'carritos': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'carritos',
+        'TIMEOUT': None,
+    },
 }
 
 
@@ -127,6 +157,69 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # Business Settings
 WHATSAPP_NUMBER = "593999999999" # Cambiar por el número real
+DASHBOARD_CACHE_TTL = 60 # Segundos que se cachean las estadísticas del dashboard
+
+# APIs externas (ver licoreria/cliente_http.py)
+# Se pueden apuntar al stub local (python manage.py stub_apis, ver licoreria/stub_apis.py) con variables de entorno
+OFF_BASE_URL = os.environ.get('OFF_BASE_URL', 'https://world.openfoodfacts.org')
+COCKTAILDB_BASE_URL = os.environ.get('COCKTAILDB_BASE_URL', 'https://www.thecocktaildb.com/api/json/v1/1')
+EXTERNAL_API_TIMEOUT = (3.05, 10) # (conexión, lectura) en segundos
+EXTERNAL_API_RETRIES = 2 # Reintentos ante errores de conexión o 502/503/504
+EXTERNAL_API_POOL_SIZE = 10 # Conexiones keep-alive por servicio
+EXTERNAL_API_ASYNC_WORKERS = 32 # Hilos que atienden las llamadas de las vistas asíncronas (ver cliente_http.en_segundo_plano)
+EXTERNAL_API_BREAKER_FAILURES = 5 # Fallos seguidos que abren el circuit breaker
+EXTERNAL_API_BREAKER_COOLDOWN = 30 # Segundos antes de volver a intentar
+
+# Caché de respuestas de APIs externas (ver licoreria/cache_apis.py)
+# BACKEND 'django' usa el alias ALIAS de CACHES; 'sqlite' guarda en PATH con límite MAX_ENTRIES (LRU)
+EXTERNAL_API_CACHE = {
+    'BACKEND': 'django',
+    'ALIAS': 'apis',
+    'PATH': BASE_DIR / 'cache_apis.sqlite3',
+    'TTL': 60 * 60, # Búsquedas: 1 hora fresca
+    'TTL_EAN': 60 * 60 * 24 * 30, # Códigos de barras: 30 días
+    'STALE_TTL': 60 * 60 * 24, # Ventana en la que se sirve la copia vieja mientras se revalida
+    'MAX_ENTRIES': 5000,
+}
+
+# Dónde se guarda el carrito (ver licoreria/almacen_carrito.py):
+# 'session' (por defecto), 'cache' (alias CACHE_ALIAS de CACHES) o 'db' (tablas Carrito/CarritoItem)
+CART_STORE = {
+    'BACKEND': 'session',
+    'CACHE_ALIAS': 'carritos',
+    'TTL': 60 * 60 * 24 * 30, # Carritos en caché: 30 días
+}
+
+# Segundos que viven en caché las tarjetas y secciones del catálogo (ver licoreria/fragmentos.py)
+CATALOGO_CACHE_TTL = 60 * 15
+
+# Grupos de cada usuario en caché (ver licoreria/roles.py). El alias debe ser una caché compartida
+# entre workers (Redis, Memcached, DatabaseCache) para que quitar un rol se note en todos al instante.
+# Con LocMem cada proceso tiene su copia: el TTL se recorta a ROLES_CACHE_TTL_LOCAL, lo que puede
+# tardar un rol quitado en dejar de valer en los demás workers.
+ROLES_CACHE_ALIAS = 'default'
+ROLES_CACHE_TTL = 60 * 5
+ROLES_CACHE_TTL_LOCAL = 30
+
+# Minutos que el stock queda apartado para un carrito desde la factura previa (ver licoreria/reservas.py)
+STOCK_RESERVATION_MINUTES = 10
+
+# Métricas por vista (ver licoreria/metricas.py), consultables en /gestion/metricas/
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'WINDOW': 500, # Últimas peticiones que se conservan por vista
+    'BUCKETS_MS': [10, 25, 50, 100, 250, 500, 1000, 2500], # Límites del histograma de latencia
+}
+
+# Auditoría en lote (ver licoreria/auditoria.py)
+AUDIT_LOG = {
+    'ENABLED': True, # False: cada log_action escribe en el momento
+    'BATCH_SIZE': 50, # Entradas acumuladas que disparan un bulk_create
+    'FLUSH_INTERVAL': 2.0, # Cada cuánto vacía el buffer el hilo de fondo
+    'BACKGROUND_THREAD': False, # Hilo para lo registrado fuera de peticiones (las peticiones vacían el buffer al terminar)
+    'MAX_REINTENTOS': 3, # Intentos de una entrada que no se puede guardar antes de descartarla
+    'MAX_PENDIENTES': 10000, # Tope del buffer: si la base no responde se descartan las más viejas
+}
 
 
 # Auth Settings
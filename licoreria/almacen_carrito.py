@@ -0,0 +1,371 @@
+"""
+Almacenamiento del carrito de compras.
+
+Las vistas no tocan request.session['cart'] directamente: piden el almacén con
+obtener_almacen(request), que según settings.CART_STORE['BACKEND'] es:
+
+- 'session' (por defecto): el carrito va en la sesión en forma compacta
+  ("l12:3,c4:1"). Cada cambio reescribe la sesión, como antes, pero más chica.
+- 'cache': el carrito compacto bajo una sola clave del alias CACHE_ALIAS de CACHES
+  (LocMem en desarrollo, Redis en producción), escrito con compare-and-set para
+  que los cambios simultáneos no se pierdan.
+- 'db': tablas Carrito/CarritoItem. Sumar una unidad es un solo
+  UPDATE ... SET cantidad = cantidad + 1 sobre la línea.
+
+Con 'cache' y 'db' el carrito de un usuario sobrevive al cierre de sesión, y el
+de un anónimo (identificado por un token en su sesión) se fusiona con el del
+usuario al iniciar sesión (ver signals.py).
+
+Todas las claves de línea son las de siempre: 'lic_<id>' y 'coc_<id>'.
+"""
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .carrito import parsear_clave
+
+CONFIG_DEFAULT = {
+    'BACKEND': 'session',
+    'CACHE_ALIAS': 'carritos',
+    'TTL': 60 * 60 * 24 * 30,
+}
+
+SESION_CARRITO = 'cart'
+SESION_TOKEN = 'carrito_token'
+
+# Prefijos de una letra para la forma compacta
+PREFIJOS = {'lic': 'l', 'coc': 'c'}
+TIPOS = {v: k for k, v in PREFIJOS.items()}
+
+
+def config():
+    return {**CONFIG_DEFAULT, **getattr(settings, 'CART_STORE', {})}
+
+
+# --- Forma compacta ---
+
+def codificar(carrito):
+    """{'lic_12': 3, 'coc_4': 1} -> 'l12:3,c4:1' (omite claves inválidas y cantidades < 1)"""
+    partes = []
+    for clave, cantidad in carrito.items():
+        parsed = parsear_clave(clave)
+        if parsed is None or int(cantidad) < 1:
+            continue
+        tipo, item_id = parsed
+        partes.append(f"{PREFIJOS[tipo]}{item_id}:{int(cantidad)}")
+    return ','.join(partes)
+
+
+def decodificar(datos):
+    """Inverso de codificar(). Acepta también el dict de sesión del formato anterior."""
+    if isinstance(datos, dict):
+        return {k: int(v) for k, v in datos.items() if parsear_clave(k) and int(v) > 0}
+    carrito = {}
+    for parte in (datos or '').split(','):
+        linea, _, cantidad = parte.partition(':')
+        tipo = TIPOS.get(linea[:1])
+        if tipo and linea[1:].isdigit() and cantidad.isdigit() and int(cantidad) > 0:
+            carrito[f"{tipo}_{linea[1:]}"] = int(cantidad)
+    return carrito
+
+
+# --- Almacenes ---
+
+class AlmacenCarrito:
+    """
+    Interfaz común. `dueno` identifica el carrito: ('usuario', id) o ('anonimo', token).
+    incrementar() retorna la cantidad resultante de la línea (0 si se eliminó).
+    """
+    persistente = False
+
+    def __init__(self, request, dueno=None):
+        self.request = request
+        self.dueno = dueno or self._dueno_de(request)
+
+    def _dueno_de(self, request):
+        if request.user.is_authenticated:
+            return ('usuario', request.user.pk)
+        return ('anonimo', request.session.get(SESION_TOKEN))
+
+    @property
+    def vacio_sin_dueno(self):
+        """Anónimo que todavía no agregó nada: no tiene token ni carrito"""
+        return self.dueno[1] is None
+
+    def _asegurar_dueno(self):
+        # El token se crea recién al agregar algo, para no escribir la sesión de cada visitante
+        if self.vacio_sin_dueno:
+            token = self.request.session[SESION_TOKEN] = uuid.uuid4().hex
+            self.dueno = ('anonimo', token)
+
+    def obtener(self):
+        """Contenido del carrito como {'lic_12': 3, ...}"""
+        raise NotImplementedError
+
+    def incrementar(self, clave, delta=1):
+        raise NotImplementedError
+
+    def quitar(self, clave):
+        raise NotImplementedError
+
+    def vaciar(self):
+        raise NotImplementedError
+
+    def cantidad(self, clave):
+        return self.obtener().get(clave, 0)
+
+    def contar(self):
+        """Número de líneas distintas (lo que muestra el ícono del carrito)"""
+        return len(self.obtener())
+
+    def fusionar(self, carrito):
+        """Suma las cantidades de otro carrito {'lic_12': 3} a este"""
+        for clave, cantidad in carrito.items():
+            self.incrementar(clave, cantidad)
+
+    def codificado(self):
+        return codificar(self.obtener())
+
+    def eliminar(self):
+        """Descarta el carrito por completo (el anónimo, después de fusionarlo)"""
+        self.vaciar()
+
+
+class AlmacenSesion(AlmacenCarrito):
+    """El carrito compacto dentro de la sesión de Django"""
+
+    def _dueno_de(self, request):
+        return ('sesion', None)
+
+    def _guardar(self, carrito):
+        self.request.session[SESION_CARRITO] = codificar(carrito)
+
+    def obtener(self):
+        return decodificar(self.request.session.get(SESION_CARRITO))
+
+    def incrementar(self, clave, delta=1):
+        carrito = self.obtener()
+        cantidad = carrito.get(clave, 0) + delta
+        if cantidad > 0:
+            carrito[clave] = cantidad
+        else:
+            carrito.pop(clave, None)
+        self._guardar(carrito)
+        return max(cantidad, 0)
+
+    def quitar(self, clave):
+        carrito = self.obtener()
+        if carrito.pop(clave, None) is not None:
+            self._guardar(carrito)
+
+    def vaciar(self):
+        self.request.session[SESION_CARRITO] = ''
+
+
+class AlmacenCache(AlmacenCarrito):
+    """
+    El carrito entero en una sola clave ('carrito:u7' -> (version, 'l12:3,c4:1')) con
+    un solo TTL, que se renueva en cada cambio. Cada escritura es un compare-and-set:
+    para pasar de la versión v a v+1 primero se reclama 'carrito:u7:v<v+1>' con
+    cache.add (atómico); si otro cambio se adelantó se relee y se vuelve a aplicar,
+    así dos clics simultáneos sobre el mismo carrito no se pisan.
+    """
+    persistente = True
+    RECLAMO_TTL = 10
+    REINTENTOS = 20
+
+    def __init__(self, request, dueno=None):
+        super().__init__(request, dueno)
+        self.cache = caches[config()['CACHE_ALIAS']]
+        self.ttl = config()['TTL']
+
+    @property
+    def prefijo(self):
+        tipo, valor = self.dueno
+        return f"carrito:{tipo[0]}{valor}"
+
+    def _leer(self):
+        return self.cache.get(self.prefijo) or (0, '')
+
+    def _modificar(self, cambio):
+        """Aplica `cambio(carrito)` (muta el dict) sin perder cambios concurrentes; retorna el carrito"""
+        for intento in range(self.REINTENTOS):
+            version, datos = self._leer()
+            carrito = decodificar(datos)
+            cambio(carrito)
+            if self.cache.add(f"{self.prefijo}:v{version + 1}", 1, self.RECLAMO_TTL):
+                break
+            time.sleep(random.uniform(0, 0.001 * (intento + 1)))
+        # Agotados los reintentos (un escritor murió tras reclamar y su reclamo aún no vence) se escribe igual
+        self.cache.set(self.prefijo, (version + 1, codificar(carrito)), self.ttl)
+        return carrito
+
+    def obtener(self):
+        if self.vacio_sin_dueno:
+            return {}
+        return decodificar(self._leer()[1])
+
+    def incrementar(self, clave, delta=1):
+        if parsear_clave(clave) is None:
+            return 0
+        self._asegurar_dueno()
+
+        def sumar(carrito):
+            cantidad = carrito.get(clave, 0) + delta
+            if cantidad > 0:
+                carrito[clave] = cantidad
+            else:
+                carrito.pop(clave, None)
+
+        return self._modificar(sumar).get(clave, 0)
+
+    def quitar(self, clave):
+        if not self.vacio_sin_dueno:
+            self._modificar(lambda carrito: carrito.pop(clave, None))
+
+    def vaciar(self):
+        if not self.vacio_sin_dueno:
+            self._modificar(lambda carrito: carrito.clear())
+
+    def fusionar(self, carrito):
+        self._asegurar_dueno()
+
+        def sumar(actual):
+            for clave, cantidad in decodificar(carrito).items():
+                actual[clave] = actual.get(clave, 0) + cantidad
+
+        self._modificar(sumar)
+
+    def eliminar(self):
+        if not self.vacio_sin_dueno:
+            self.cache.delete(self.prefijo)
+
+
+class AlmacenBD(AlmacenCarrito):
+    """Tablas Carrito/CarritoItem; cada cambio toca una sola fila de CarritoItem"""
+    persistente = True
+
+    def __init__(self, request, dueno=None):
+        super().__init__(request, dueno)
+        self._carrito_id = None
+
+    def _filtro_dueno(self):
+        tipo, valor = self.dueno
+        return {'usuario_id': valor} if tipo == 'usuario' else {'token': valor}
+
+    def carrito_id(self, crear=True):
+        from .models import Carrito
+        if self._carrito_id is None:
+            if self.vacio_sin_dueno:
+                if not crear:
+                    return None
+                self._asegurar_dueno()
+            filtro = self._filtro_dueno()
+            self._carrito_id = Carrito.objects.filter(**filtro).values_list('pk', flat=True).first()
+            if self._carrito_id is None and crear:
+                try:
+                    with transaction.atomic():
+                        self._carrito_id = Carrito.objects.create(**filtro).pk
+                except IntegrityError:
+                    self._carrito_id = Carrito.objects.get(**filtro).pk
+        return self._carrito_id
+
+    def _items(self, clave=None):
+        from .models import CarritoItem
+        carrito_id = self.carrito_id(crear=False)
+        if carrito_id is None:
+            return CarritoItem.objects.none()
+        items = CarritoItem.objects.filter(carrito_id=carrito_id)
+        if clave is not None:
+            tipo, item_id = parsear_clave(clave)
+            items = items.filter(tipo=tipo, item_id=item_id)
+        return items
+
+    def obtener(self):
+        return {f"{tipo}_{item_id}": cantidad
+                for tipo, item_id, cantidad in self._items().order_by('pk').values_list('tipo', 'item_id', 'cantidad')}
+
+    def contar(self):
+        return self._items().count()
+
+    def incrementar(self, clave, delta=1):
+        from .models import CarritoItem
+        parsed = parsear_clave(clave)
+        if parsed is None:
+            return 0
+        tipo, item_id = parsed
+        if delta < 0:
+            # Si la línea quedaría en 0 o menos se elimina (cantidad es PositiveIntegerField)
+            if self._items(clave).filter(cantidad__gt=-delta).update(cantidad=F('cantidad') + delta):
+                return self._items(clave).values_list('cantidad', flat=True).first() or 0
+            self.quitar(clave)
+            return 0
+
+        carrito_id = self.carrito_id()
+        linea = CarritoItem.objects.filter(carrito_id=carrito_id, tipo=tipo, item_id=item_id)
+        if not linea.update(cantidad=F('cantidad') + delta):
+            try:
+                with transaction.atomic():
+                    CarritoItem.objects.create(carrito_id=carrito_id, tipo=tipo, item_id=item_id, cantidad=delta)
+                    return delta
+            except IntegrityError:
+                # Otra petición creó la línea entre el UPDATE y el INSERT
+                linea.update(cantidad=F('cantidad') + delta)
+        return linea.values_list('cantidad', flat=True).first() or 0
+
+    def quitar(self, clave):
+        if parsear_clave(clave) is not None:
+            self._items(clave).delete()
+
+    def vaciar(self):
+        self._items().delete()
+
+    def eliminar(self):
+        from .models import Carrito
+        if self.vacio_sin_dueno:
+            return
+        Carrito.objects.filter(**self._filtro_dueno()).delete()
+        self._carrito_id = None
+
+
+BACKENDS = {
+    'session': AlmacenSesion,
+    'cache': AlmacenCache,
+    'db': AlmacenBD,
+}
+
+
+def clase_almacen():
+    return BACKENDS[config()['BACKEND']]
+
+
+def obtener_almacen(request):
+    """Almacén del carrito de la petición (memorizado en el request)"""
+    almacen = getattr(request, '_almacen_carrito', None)
+    if almacen is None:
+        almacen = request._almacen_carrito = clase_almacen()(request)
+    return almacen
+
+
+def fusionar_al_iniciar_sesion(request, user):
+    """
+    Pasa el carrito anónimo de la sesión al carrito del usuario, sumando cantidades.
+    Con el backend de sesión no hace falta: login() conserva los datos de la sesión.
+    """
+    clase = clase_almacen()
+    vars(request).pop('_almacen_carrito', None)
+    if not clase.persistente:
+        return
+    token = request.session.pop(SESION_TOKEN, None)
+    if not token:
+        return
+    anonimo = clase(request, dueno=('anonimo', token))
+    contenido = anonimo.obtener()
+    if contenido:
+        clase(request, dueno=('usuario', user.pk)).fusionar(contenido)
+    anonimo.eliminar()
@@ -1,60 +1,89 @@
+"""
+APIs de importación desde Open Food Facts y TheCocktailDB.
+
+Las búsquedas (GET) son vistas asíncronas: bajo ASGI la espera a la API externa
+no ocupa un worker, las búsquedas idénticas concurrentes comparten una sola
+llamada (cache_apis.consultar_async) y, si el cliente se desconecta, Django
+cancela la vista y con ella la espera. La petición a la API que ya salió no se
+puede abortar (corre con requests en el executor de E/S): termina en su hilo,
+acotada por EXTERNAL_API_TIMEOUT, y su respuesta queda en la caché para la
+próxima búsqueda. Los POST que guardan lo importado siguen siendo APIViews de
+DRF y se atienden en un hilo con sync_to_async.
+"""
 from .models import Productos, Marcas, Cocteles, Categorias
 from .serializers import ProductoSerializer, CoctelSerializer
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import requests
 import logging
+import re
 from .utils import log_action, get_default_price
+from .cliente_http import off, cocktaildb, ServicioNoDisponible, RespuestaNoValida, en_segundo_plano
+from . import cache_apis
+from .importacion_off import nombre_categoria_off, nombre_marca_off
 
 logger = logging.getLogger(__name__)
 
-# Headers globales para evitar bloqueos de APIs externas
-HEADERS = {
-    'User-Agent': 'LicoreriaNeonApp/1.0 (https://github.com/starx04/BLB_Django_Tienda; starx04@example.com) requests/2.31.0'
-}
+def respuesta_no_disponible(e, vacia=None):
+    """Respuesta 503 inmediata cuando el circuit breaker del servicio está abierto"""
+    logger.warning(str(e))
+    if vacia is not None:
+        return JsonResponse(vacia, safe=False, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return JsonResponse({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-class CoctelesAPI(APIView):
-    def get(self, request):
-        """ Busca cocteles en TheCocktailDB (API para recetas y tragos). """
-        query = request.query_params.get('search', '').strip()
+async def registrar_accion(request, accion, modulo):
+    """log_action() desde una vista asíncrona"""
+    await sync_to_async(log_action)(await request.auser(), accion, modulo, request=request)
 
-        if query:
-            log_action(request.user, f"Búsqueda de cóctel: {query}", "APIs", request=request)
-            
-            base_url = "https://www.thecocktaildb.com/api/json/v1/1/"
-            url = f"{base_url}search.php"
-            params = {"s": query} if len(query) > 1 else {"f": query}
-            if query.lower() == 'random': url = f"{base_url}random.php"; params = {}
+class VistaAPIAsync(View):
+    """Base de las vistas con GET asíncrono y POST atendido por la APIView `vista_post`"""
+    vista_post = None
 
-            try:
-                response = requests.get(url, params=params, headers=HEADERS, timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    drinks = data.get('drinks', [])
-                    formatted_results = []
-                    if drinks:
-                        for item in drinks:
-                            ingredients = [f"{(item.get(f'strMeasure{i}') or '').strip()} {(item.get(f'strIngredient{i}') or '').strip()}".strip() 
-                                           for i in range(1, 16) if item.get(f'strIngredient{i}')]
-                            formatted_results.append({
-                                "nombre": item.get('strDrink', 'Sin Nombre'),
-                                "imagen_url": item.get('strDrinkThumb', ''),
-                                "categoria": item.get('strCategory', 'Coctel'),
-                                "ingredientes": ", ".join(ingredients),
-                                "id_externo": item.get('idDrink'),
-                                "es_alcoholico": item.get('strAlcoholic') == 'Alcoholic',
-                                "instrucciones": item.get('strInstructions', '')
-                            })
-                    return Response({"source": "TheCocktailDB", "results": formatted_results})
-                logger.error(f"Error TheCocktailDB API: Status {response.status_code}")
-                return Response({"error": "Error de conexión con API externa"}, status=response.status_code)
-            except Exception as e:
-                logger.error(f"Excepción en CoctelesAPI: {str(e)}")
-                return Response({"error": f"Error interno: {str(e)}"}, status=500)
-        
-        return Response({"results": []})
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Igual que APIView.as_view: DRF aplica su propia autenticación y CSRF al POST
+        return csrf_exempt(super().as_view(**initkwargs))
 
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.vista_post.as_view())(request, *args, **kwargs)
+
+def ingredientes_coctel(item):
+    """Une medidas e ingredientes (strMeasure1..15 / strIngredient1..15) de TheCocktailDB"""
+    return ", ".join([f"{(item.get(f'strMeasure{i}') or '').strip()} {(item.get(f'strIngredient{i}') or '').strip()}".strip() 
+                      for i in range(1, 16) if item.get(f'strIngredient{i}')])
+
+def formatear_coctel(item):
+    return {
+        "nombre": item.get('strDrink', 'Sin Nombre'),
+        "imagen_url": item.get('strDrinkThumb', ''),
+        "categoria": item.get('strCategory', 'Coctel'),
+        "ingredientes": ingredientes_coctel(item),
+        "id_externo": item.get('idDrink'),
+        "es_alcoholico": item.get('strAlcoholic') == 'Alcoholic',
+        "instrucciones": item.get('strInstructions', '')
+    }
+
+def formatear_producto_off(p):
+    prod_name = p.get('product_name') or p.get('product_name_es') or p.get('product_name_en') or 'Producto Desconocido'
+    brand = p.get('brands', 'Genérico').split(',')[0].strip()
+    nutriments = p.get('nutriments', {})
+    abv = nutriments.get('alcohol_100g') or p.get('alcohol_100g') or p.get('alcohol_base') or p.get('alcohol', 0)
+    return {
+        "nombre": prod_name,
+        "marca": brand,
+        "grados_alcohol": abv,
+        "origen": p.get('origins', 'Ecuador'),
+        "cantidad": p.get('quantity', 'N/A'),
+        "codigo_barras": p.get('code', ''),
+        "imagen_url": p.get('image_url') or p.get('image_front_url') or p.get('image_small_url', ''),
+        "descripcion_tecnica": p.get('categories', '')
+    }
+
+class ImportarCoctelAPI(APIView):
     def post(self, request):
         """ Guarda un cóctel importado. """
         id_externo = request.data.get('id_externo')
@@ -69,82 +98,58 @@ class CoctelesAPI(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class LicoresOFFAPI(APIView):
-    def get(self, request):
-        """ Busca licores/snacks en OFF (Contexto Ecuador y Global). """
-        query = request.query_params.get('search', '').strip()
-        if not query: return Response({"error": "Query requerido"}, status=400)
+class CoctelesAPI(VistaAPIAsync):
+    vista_post = ImportarCoctelAPI
 
-        log_action(request.user, f"Búsqueda OFF: {query}", "APIs", request=request)
-        results = []
-        
-        is_ean = query.isdigit() and len(query) >= 8
-        
-        try:
-            if is_ean:
-                off_url = f"https://world.openfoodfacts.org/api/v2/product/{query}.json"
-                off_res = requests.get(off_url, timeout=10, verify=False, headers=HEADERS)
-            else:
-                off_url = f"https://world.openfoodfacts.org/cgi/search.pl"
-                params = {
-                    "search_terms": query,
-                    "search_simple": 1,
-                    "action": "process",
-                    "json": 1,
-                    "page_size": 10
-                }
-                print(f"DEBUG: Consultando OFF URL: {off_url} con Params: {params}")
-                off_res = requests.get(off_url, params=params, timeout=10, verify=False, headers=HEADERS)
+    async def get(self, request):
+        """ Busca cocteles en TheCocktailDB (API para recetas y tragos). """
+        query = request.GET.get('search', '').strip()
 
-            if off_res.status_code == 200:
-                off_data = off_res.json()
-                
-                if is_ean:
-                    products_raw = [off_data["product"]] if "product" in off_data else []
-                else:
-                    products_raw = off_data.get("products", [])
-
-                for p in products_raw:
-                    prod_name = p.get('product_name') or p.get('product_name_es') or p.get('product_name_en') or 'Producto Desconocido'
-                    brand = p.get('brands', 'Genérico').split(',')[0].strip()
-                    nutriments = p.get('nutriments', {})
-                    abv = nutriments.get('alcohol_100g') or p.get('alcohol_100g') or p.get('alcohol_base') or p.get('alcohol', 0)
-                    
-                    results.append({
-                        "nombre": prod_name,
-                        "marca": brand,
-                        "grados_alcohol": abv,
-                        "origen": p.get('origins', 'Ecuador'),
-                        "cantidad": p.get('quantity', 'N/A'),
-                        "codigo_barras": p.get('code', ''),
-                        "imagen_url": p.get('image_url') or p.get('image_front_url') or p.get('image_small_url', ''),
-                        "descripcion_tecnica": p.get('categories', '')
-                    })
-                
-                return Response({"results": results})
+        if query:
+            await registrar_accion(request, f"Búsqueda de cóctel: {query}", "APIs")
             
-            logger.error(f"Error OFF API: Status {off_res.status_code} para query {query}")
-            return Response({"error": f"API OFF devolvió status {off_res.status_code}"}, status=off_res.status_code)
-        except Exception as e:
-            logger.error(f"Excepción en LicoresOFFAPI: {str(e)}")
-            return Response({"error": f"Error interno: {str(e)}"}, status=500)
+            ruta = "search.php"
+            params = {"s": query} if len(query) > 1 else {"f": query}
+            if query.lower() == 'random': ruta = "random.php"; params = {}
+
+            def cargar():
+                drinks = cocktaildb.get_json(ruta, params=params).get('drinks') or []
+                return [formatear_coctel(item) for item in drinks]
+
+            try:
+                if ruta == "random.php":
+                    formatted_results = await en_segundo_plano(cargar)  # Aleatorio: no se cachea
+                else:
+                    endpoint = "cocktaildb:letra" if "f" in params else "cocktaildb:nombre"
+                    formatted_results = await cache_apis.consultar_async(endpoint, query, cargar)
+                return JsonResponse({"source": "TheCocktailDB", "results": formatted_results})
+            except RespuestaNoValida as e:
+                logger.error(f"Error TheCocktailDB API: Status {e.status_code}")
+                return JsonResponse({"error": "Error de conexión con API externa"}, status=e.status_code)
+            except ServicioNoDisponible as e:
+                return respuesta_no_disponible(e)
+            except Exception as e:
+                logger.error(f"Excepción en CoctelesAPI: {str(e)}")
+                return JsonResponse({"error": f"Error interno: {str(e)}"}, status=500)
+        
+        return JsonResponse({"results": []})
 
+class ImportarLicorOFFAPI(APIView):
     def post(self, request):
         """ Guarda un producto importado de OFF. """
+        data = request.data.copy()
+
         # 1. Manejo de Categoría (Priorizar la seleccionada por el usuario)
         categoria_id = data.get('categoria')
         if not categoria_id:
-            categoria_str = data.get('categoria_api', 'Otros Licores').split(',')[0].strip()
-            # Limpiar tags de OFF si vienen como "en:whiskeys"
-            if ':' in categoria_str:
-                categoria_str = categoria_str.split(':')[-1].replace('-', ' ').title()
-            
+            # Limpia tags de OFF si vienen como "en:whiskeys"
+            categoria_str = nombre_categoria_off(data.get('categoria_api', 'Otros Licores'))
             categoria_obj, _ = Categorias.objects.get_or_create(nombre=categoria_str)
             data['categoria'] = categoria_obj.id
         # Si ya viene un ID de categoría, el serializer lo manejará correctamente.
 
         # 2. Manejo de Marca
-        marca_nombre = data.get('marca', 'GENERICO').strip().upper()
+        marca_nombre = nombre_marca_off(data.get('marca'))
         marca_obj, _ = Marcas.objects.get_or_create(nombre=marca_nombre)
         data['marca'] = marca_obj.id
 
@@ -158,6 +163,50 @@ class LicoresOFFAPI(APIView):
             log_action(request.user, f"Importó producto (OFF): {producto.nombre}", "Productos", 
                        detalles=f"Stock: {producto.stock}, Precio: {producto.precio}", request=request)
             return Response(serializer.data, status=201)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class LicoresOFFAPI(VistaAPIAsync):
+    vista_post = ImportarLicorOFFAPI
+
+    async def get(self, request):
+        """ Busca licores/snacks en OFF (Contexto Ecuador y Global). """
+        query = request.GET.get('search', '').strip()
+        if not query: return JsonResponse({"error": "Query requerido"}, status=400)
+
+        await registrar_accion(request, f"Búsqueda OFF: {query}", "APIs")
+        
+        is_ean = query.isdigit() and len(query) >= 8
+        
+        try:
+            if is_ean:
+                def cargar():
+                    off_data = off.get_json(f"api/v2/product/{query}.json")
+                    products_raw = [off_data["product"]] if "product" in off_data else []
+                    return [formatear_producto_off(p) for p in products_raw]
+                # Los metadatos de un EAN casi no cambian: TTL largo
+                results = await cache_apis.consultar_async("off:ean", query, cargar, ttl=cache_apis.ttl_ean())
+            else:
+                params = {
+                    "search_terms": query,
+                    "search_simple": 1,
+                    "action": "process",
+                    "json": 1,
+                    "page_size": 10
+                }
+                def cargar():
+                    products_raw = off.get_json("cgi/search.pl", params=params).get("products", [])
+                    return [formatear_producto_off(p) for p in products_raw]
+                results = await cache_apis.consultar_async("off:search", query, cargar)
+
+            return JsonResponse({"results": results})
+        except RespuestaNoValida as e:
+            logger.error(f"Error OFF API: Status {e.status_code} para query {query}")
+            return JsonResponse({"error": f"API OFF devolvió status {e.status_code}"}, status=e.status_code)
+        except ServicioNoDisponible as e:
+            return respuesta_no_disponible(e)
+        except Exception as e:
+            logger.error(f"Excepción en LicoresOFFAPI: {str(e)}")
+            return JsonResponse({"error": f"Error interno: {str(e)}"}, status=500)
 
 # Mapa de Categorías Locales (IDs obtenidos del sistema)
 LOCAL_CAT_MAP = {
@@ -175,21 +224,28 @@ LOCAL_CAT_MAP = {
     'alcoholic-beverages': 1,
 }
 
+# Matcher precompilado: el lookahead encuentra todas las claves presentes (incluso solapadas)
+# y gana la de mayor prioridad, es decir, la primera en el orden de LOCAL_CAT_MAP.
+_PRIORIDAD_CAT = {key: i for i, key in enumerate(LOCAL_CAT_MAP)}
+_CAT_MATCHER = re.compile('(?=(' + '|'.join(re.escape(k) for k in LOCAL_CAT_MAP) + '))')
+
+def clave_categoria_local(texto):
+    """Retorna la clave de LOCAL_CAT_MAP que aplica al texto (ya en minúsculas) o None"""
+    encontradas = _CAT_MATCHER.findall(texto)
+    return min(encontradas, key=_PRIORIDAD_CAT.__getitem__) if encontradas else None
+
 def get_suggested_cat_id(tags):
     """Retorna el ID de la categoría local basado en tags/nombres"""
     if not tags: return 1
-    tags_str = str(tags).lower()
-    for key, val in LOCAL_CAT_MAP.items():
-        if key in tags_str:
-            return val
-    return 1 # Default: Licores
+    clave = clave_categoria_local(str(tags).lower())
+    return LOCAL_CAT_MAP[clave] if clave else 1 # Default: Licores
 
-class BusquedaLicoresAPIView(APIView):
+class BusquedaLicoresAPIView(View):
     """Buscador para el apartado: Importar Licores"""
-    def get(self, request):
-        query = request.query_params.get('q', '').strip()
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
         if not query:
-            return Response([])
+            return JsonResponse([], safe=False)
 
         # Mapeo de categorías específicas solicitadas
         CATEGORY_MAP = {
@@ -199,10 +255,9 @@ class BusquedaLicoresAPIView(APIView):
             'ginebra': 'en:gins'
         }
         
-        selected_cat = request.query_params.get('cat', '').lower()
+        selected_cat = request.GET.get('cat', '').lower()
         
         # La búsqueda es estrictamente por nombre, filtrada por bebidas alcohólicas a nivel global
-        url = "https://world.openfoodfacts.org/cgi/search.pl"
         params = {
             'search_terms': query, 
             'json': 1, 
@@ -223,21 +278,12 @@ class BusquedaLicoresAPIView(APIView):
                 'tag_1': CATEGORY_MAP[selected_cat]
             })
         
-        # Desactivar advertencias de SSL para entornos locales con certificados autofirmados
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
+        def cargar():
+            return off.get_json("cgi/search.pl", params=params).get('products', [])
+
         try:
-            # Restauramos verify=False por posibles problemas de certificados en el entorno local
-            res = requests.get(url, params=params, headers=HEADERS, timeout=10, verify=False)
-            
-            if res.status_code != 200:
-                logger.error(f"Fallo BusquedaLicoresAPIView: OFF Status {res.status_code}")
-                return Response({"error": f"La API de Open Food Facts no está respondiendo (Status {res.status_code})"}, 
-                                status=status.HTTP_502_BAD_GATEWAY)
-            
-            data_json = res.json()
-            productos = data_json.get('products', [])
+            # Se cachean los productos de OFF; precio y categoría sugeridos se calculan en cada búsqueda
+            productos = await cache_apis.consultar_async("off:busqueda", query, cargar, categoria=selected_cat)
             
             # Formatear resultados priorizando nombres legibles y datos automatizados
             formatted = []
@@ -245,6 +291,13 @@ class BusquedaLicoresAPIView(APIView):
             # Categorías a excluir explícitamente si estamos en "Todos"
             EXCLUDE_TAGS = ['en:snacks', 'en:salty-snacks', 'en:sweet-snacks', 'en:confectionery', 'en:food', 'en:meals']
             
+            # Precios reales de los productos que ya existen en base de datos (una sola consulta)
+            codigos = {p.get('code') for p in productos if p.get('code')}
+            precios_existentes = {
+                codigo: precio async for codigo, precio in
+                Productos.objects.filter(codigo_barras__in=codigos).values_list('codigo_barras', 'precio')
+            } if codigos else {}
+            
             for p in productos:
                 cats = p.get('categories_tags', [])
                 
@@ -258,24 +311,19 @@ class BusquedaLicoresAPIView(APIView):
                 brand = p.get('brands', 'Genérico').split(',')[0].strip()
                 code = p.get('code', '')
                 
-                # Buscar si ya existe en base de datos para sugerir el precio real
-                producto_existente = Productos.objects.filter(codigo_barras=code).first()
-                
                 # Extraer graduación alcohólica
                 nutriments = p.get('nutriments', {})
                 abv = nutriments.get('alcohol_100g') or p.get('alcohol_100g') or p.get('alcohol_base') or p.get('alcohol', 0)
 
-                # Generar precio y categoría sugerida
-                cat_id_sugerido = get_suggested_cat_id(cats + [name, brand])
+                # Generar precio y categoría sugerida (una sola pasada del matcher)
+                clave_cat = clave_categoria_local(str(cats + [name, brand]).lower())
+                cat_id_sugerido = LOCAL_CAT_MAP[clave_cat] if clave_cat else 1
                 
-                # Obtener nombre legible de la categoría para el generador de precios
-                cat_name_price = 'DEFAULT'
-                for k in LOCAL_CAT_MAP:
-                    if k in str(cats + [name, brand]).lower():
-                        cat_name_price = k
-                        break
-
-                precio_sugerido = str(producto_existente.precio) if producto_existente else str(get_default_price(cat_name_price))
+                # Si ya existe en base de datos se sugiere su precio real
+                if code in precios_existentes:
+                    precio_sugerido = str(precios_existentes[code])
+                else:
+                    precio_sugerido = str(get_default_price(clave_cat or 'DEFAULT'))
                 cat_principal = cats[-1] if cats else 'en:alcoholic-beverages'
 
                 formatted.append({
@@ -293,32 +341,35 @@ class BusquedaLicoresAPIView(APIView):
                     "cantidad": p.get('quantity', 'N/A')
                 })
             
-            return Response(formatted)
+            return JsonResponse(formatted, safe=False)
+        except RespuestaNoValida as e:
+            logger.error(f"Fallo BusquedaLicoresAPIView: OFF Status {e.status_code}")
+            return JsonResponse({"error": f"La API de Open Food Facts no está respondiendo (Status {e.status_code})"}, 
+                                status=status.HTTP_502_BAD_GATEWAY)
+        except ServicioNoDisponible as e:
+            return respuesta_no_disponible(e, vacia=[])
         except Exception as e:
             logger.error(f"Fallo crítico en BusquedaLicoresAPIView (OFF): {str(e)}")
-            return Response([], status=500)
+            return JsonResponse([], safe=False, status=500)
 
-class BusquedaCoctelesAPIView(APIView):
+class BusquedaCoctelesAPIView(View):
     """Buscador para el apartado: Importar Cócteles"""
-    def get(self, request):
-        query = request.query_params.get('q', '').strip()
+    async def get(self, request):
+        query = request.GET.get('q', '').strip()
         if not query:
-            return Response([])
+            return JsonResponse([], safe=False)
 
-        url = "https://www.thecocktaildb.com/api/json/v1/1/search.php"
         params = {"s": query}
+
+        def cargar():
+            return cocktaildb.get_json("search.php", params=params).get('drinks') or []
         
         try:
-            res = requests.get(url, params=params, headers=HEADERS, timeout=10)
-            if res.status_code != 200:
-                 logger.error(f"Error TheCocktailDB search: Status {res.status_code}")
-                 return Response([])
-                 
-            data = res.json().get('drinks')
+            data = await cache_apis.consultar_async("cocktaildb:busqueda", query, cargar)
             if not data:
-                return Response([])
+                return JsonResponse([], safe=False)
 
-            return Response([{
+            return JsonResponse([{
                 "id": d.get("idDrink"),
                 "nombre": d.get("strDrink"),
                 "imagen": d.get("strDrinkThumb"),
@@ -326,12 +377,16 @@ class BusquedaCoctelesAPIView(APIView):
                 "categoria": d.get("strCategory"),
                 "categoria_sugerida": 2, # Default: Tragos
                 "precio_sugerido": str(get_default_price('DEFAULT')),
-                "ingredientes": ", ".join([f"{(d.get(f'strMeasure{i}') or '').strip()} {(d.get(f'strIngredient{i}') or '').strip()}".strip() 
-                                          for i in range(1, 16) if d.get(f'strIngredient{i}')]),
+                "ingredientes": ingredientes_coctel(d),
                 "instrucciones": d.get("strInstructions", ""),
                 "es_alcoholico": d.get("strAlcoholic") == "Alcoholic"
-            } for d in data])
+            } for d in data], safe=False)
+        except RespuestaNoValida as e:
+            logger.error(f"Error TheCocktailDB search: Status {e.status_code}")
+            return JsonResponse([], safe=False)
+        except ServicioNoDisponible as e:
+            return respuesta_no_disponible(e, vacia=[])
         except Exception as e:
             logger.error(f"Fallo crítico en BusquedaCoctelesAPIView: {str(e)}")
-            return Response([], status=500)
+            return JsonResponse([], safe=False, status=500)
 
@@ -7,9 +7,14 @@ class LicoreriaConfig(AppConfig):
 
     def ready(self):
         import licoreria.signals
+
+        from licoreria import auditoria
+        if auditoria.config()['ENABLED'] and auditoria.config()['BACKGROUND_THREAD']:
+            auditoria.buffer.iniciar_hilo()
         
         # Monkey-patching User model de forma segura
         from django.contrib.auth.models import User, Group
+        from licoreria import roles
 
         def get_user_rol(self):
             """Propiedad dinámica para obtener el rol del usuario"""
@@ -17,8 +22,8 @@ class LicoreriaConfig(AppConfig):
                 return 'Administrador'
             
             # 1. Intentar por Grupos (Orden de prioridad: Administrador, Supervisor, Bodeguero, Cliente)
-            priority_groups = ['Administrador', 'Supervisor', 'Bodeguero', 'Cliente']
-            user_groups = [g.name for g in self.groups.all()]
+            priority_groups = roles.PRIORIDAD
+            user_groups = roles.grupos_de(self)
             for gname in priority_groups:
                 if gname in user_groups:
                     return gname
@@ -0,0 +1,156 @@
+"""
+Escritura diferida del registro de auditoría (AuditLog).
+
+log_action() ya no inserta dentro de la petición: deja la entrada en un buffer
+en memoria del proceso y las entradas se guardan juntas con bulk_create cuando:
+- el buffer llega a BATCH_SIZE entradas,
+- al terminar cada petición que dejó entradas pendientes (AuditoriaMiddleware):
+  las acciones de una misma petición se guardan juntas y ninguna queda en
+  memoria esperando a que llegue otra petición,
+- cada FLUSH_INTERVAL segundos desde un hilo de fondo (opcional, BACKGROUND_THREAD),
+  para lo registrado fuera de peticiones,
+- al cerrar el proceso (atexit).
+
+Las entradas se encolan con transaction.on_commit: si la transacción de la
+vista se revierte, la acción tampoco queda registrada (igual que antes).
+Con ENABLED = False se vuelve a la escritura síncrona.
+
+Si el bulk_create falla, el lote se guarda fila por fila: las que fallan vuelven
+al buffer y se descartan (con un log de error) tras MAX_REINTENTOS intentos, así
+una fila inválida no bloquea a las demás. El buffer no pasa de MAX_PENDIENTES
+entradas: con la base caída se descartan las más viejas.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DEFAULT = {
+    'ENABLED': True,
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 2.0,
+    'BACKGROUND_THREAD': False,
+    'MAX_REINTENTOS': 3,
+    'MAX_PENDIENTES': 10000,
+}
+
+
+def config():
+    return {**CONFIG_DEFAULT, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+class BufferAuditoria:
+    """Cola de entradas de AuditLog sin guardar, compartida por los hilos del proceso"""
+
+    def __init__(self):
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pendientes)
+
+    def agregar(self, entrada):
+        with self._lock:
+            self._pendientes.append(entrada)
+            self._recortar()
+            lleno = len(self._pendientes) >= config()['BATCH_SIZE']
+        if lleno:
+            self.flush()
+
+    def _recortar(self):
+        """Descarta las entradas más viejas por encima de MAX_PENDIENTES (llamar con el lock tomado)"""
+        sobran = len(self._pendientes) - config()['MAX_PENDIENTES']
+        if sobran > 0:
+            logger.error(f"Buffer de auditoría lleno: se descartan las {sobran} entradas más viejas")
+            del self._pendientes[:sobran]
+
+    def flush(self):
+        """Guarda todo lo pendiente en un solo bulk_create. Retorna cuántas entradas escribió."""
+        with self._lock:
+            lote, self._pendientes = self._pendientes, []
+        if not lote:
+            return 0
+
+        from .models import AuditLog
+        try:
+            AuditLog.objects.bulk_create(lote, batch_size=config()['BATCH_SIZE'])
+            return len(lote)
+        except Exception:
+            logger.exception(f"No se pudieron guardar {len(lote)} entradas de auditoría en lote")
+        if transaction.get_connection().in_atomic_block:
+            # Dentro de una transacción ajena ya no se puede escribir: todo vuelve al buffer
+            self._reencolar(lote)
+            return 0
+
+        # Fila por fila (en autocommit): las válidas se guardan y solo las que fallan vuelven al buffer
+        escritas, fallidas = 0, []
+        for entrada in lote:
+            try:
+                entrada.save(force_insert=True)
+                escritas += 1
+            except Exception:
+                entrada.pk = None
+                fallidas.append(entrada)
+        self._reencolar(fallidas)
+        return escritas
+
+    def _reencolar(self, entradas):
+        """Devuelve al frente del buffer las entradas que fallaron; descarta las que agotaron MAX_REINTENTOS"""
+        vuelven = []
+        for entrada in entradas:
+            entrada._intentos = getattr(entrada, '_intentos', 0) + 1
+            if entrada._intentos >= config()['MAX_REINTENTOS']:
+                logger.error(f"Se descarta la entrada de auditoría '{entrada.accion}' tras {entrada._intentos} intentos")
+            else:
+                vuelven.append(entrada)
+        if vuelven:
+            with self._lock:
+                self._pendientes[:0] = vuelven
+                self._recortar()
+
+    def iniciar_hilo(self):
+        """Arranca (una sola vez) el hilo que vacía el buffer cada FLUSH_INTERVAL segundos"""
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return self._hilo
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._ciclo, name='auditoria-flush', daemon=True)
+            self._hilo.start()
+            return self._hilo
+
+    def detener_hilo(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def _ciclo(self):
+        while not self._detener.wait(config()['FLUSH_INTERVAL']):
+            close_old_connections()
+            self.flush()
+        self.flush()
+        close_old_connections()
+
+
+buffer = BufferAuditoria()
+atexit.register(buffer.flush)
+
+
+def registrar(entrada):
+    """Encola (o guarda directamente si el buffer está deshabilitado) una entrada de AuditLog"""
+    if not config()['ENABLED']:
+        entrada.save()
+        return
+    transaction.on_commit(lambda: buffer.agregar(entrada))
+
+
+def flush():
+    return buffer.flush()
@@ -0,0 +1,347 @@
+"""
+Benchmark de la tienda: siembra una tienda sintética y mide los flujos principales.
+
+sembrar() crea con bulk_create productos, clientes, órdenes (con su detalle),
+recompensas y multas de forma reproducible (misma semilla, mismos datos) y
+reconstruye el Libro de Fidelidad y el índice de búsqueda como en producción.
+
+Los escenarios son listas de pasos (nombre, usuario, ruta):
+- catalogo: productos (primera página y una búsqueda)
+- carrito: agregar_carrito + ver_carrito
+- checkout: agregar_carrito, resumen_checkout, previsualizar_factura, procesar_orden
+- index y detalle_cliente como administrador
+
+Se corren con el cliente de pruebas de Django en el mismo proceso
+(en_proceso) o con varios hilos haciendo peticiones HTTP reales contra un
+servidor en un hilo (http). El reporte trae, por paso, p50/p95/p99 de
+latencia y consultas por petición, más el throughput total; comparar() lo
+contrasta con un baseline guardado en JSON.
+
+El comando `python manage.py benchmark` lo orquesta sobre una base de datos
+de prueba aparte (nunca sobre la base real).
+"""
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from urllib.error import HTTPError
+from urllib.request import HTTPRedirectHandler, build_opener
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.db import close_old_connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import busqueda, metricas
+
+VOLUMENES = {
+    'productos': 10_000,
+    'clientes': 5_000,
+    'ordenes': 50_000,
+    'recompensas': 5_000,
+    'multas': 2_000,
+}
+CATEGORIAS = ['Whisky', 'Ron', 'Vodka', 'Gin', 'Tequila', 'Vino', 'Cerveza', 'Licores', 'Espumantes', 'Aguardiente']
+LOTE = 1000
+HOST = 'localhost'
+
+
+def escalar(factor):
+    """VOLUMENES multiplicados por `factor` (al menos 1 de cada cosa)"""
+    return {clave: max(1, int(valor * factor)) for clave, valor in VOLUMENES.items()}
+
+
+# --- Datos ---
+
+def sembrar(volumenes=None, semilla=42, usuarios=10):
+    """
+    Crea la tienda sintética. Retorna el contexto que usan los escenarios:
+    ids de productos, clientes con usuario (uno por hilo) y el administrador.
+    """
+    from .models import (Categorias, Clientes, DetallesOrdenes, Marcas, Multas, Ordenes, Productos,
+                         Recompensas)
+
+    volumenes = {**VOLUMENES, **(volumenes or {})}
+    rng = random.Random(semilla)
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        categorias = Categorias.objects.bulk_create([Categorias(nombre=n) for n in CATEGORIAS])
+        marcas = Marcas.objects.bulk_create([Marcas(nombre=f"Marca {i}") for i in range(50)])
+        Productos.objects.bulk_create([
+            Productos(nombre=f"{rng.choice(CATEGORIAS)} {i}", categoria=rng.choice(categorias),
+                      marca=rng.choice(marcas), precio=Decimal(rng.randint(500, 15000)) / 100,
+                      stock=rng.choice([0, 3, 10 ** 6]), grados_alcohol=Decimal(rng.randint(50, 450)) / 10)
+            for i in range(volumenes['productos'])], batch_size=LOTE)
+        productos = list(Productos.objects.filter(stock__gt=10).values_list('id', 'precio'))
+
+        Clientes.objects.bulk_create([
+            Clientes(nombre=f"Cliente {i}", email=f"cliente{i}@bench.local", telefono=f"09{i:08d}",
+                     codigo_unico=f"C{i:07d}", limite_prestamo=Decimal('100.00'))
+            for i in range(volumenes['clientes'])], batch_size=LOTE)
+        clientes = list(Clientes.objects.order_by('id').values_list('id', flat=True))
+
+        ordenes = Ordenes.objects.bulk_create([
+            Ordenes(cliente_id=rng.choice(clientes), codigo_orden=f"B{i:07d}",
+                    estado=estado, pagada=estado == 'PAGD', puntos_asignados=estado == 'PAGD')
+            for i, estado in enumerate(rng.choices(['PAGD', 'PREST', 'SOLI', 'CANC'], [70, 15, 10, 5],
+                                                   k=volumenes['ordenes']))], batch_size=LOTE)
+        # fecha es auto_now_add: se reparte en los últimos 90 días después de insertar
+        for orden in ordenes:
+            orden.fecha = ahora - timezone.timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+        detalles = []
+        for orden in ordenes:
+            producto_id, precio = rng.choice(productos)
+            cantidad = rng.randint(1, 3)
+            orden.total = precio * cantidad
+            detalles.append(DetallesOrdenes(orden=orden, producto_id=producto_id, cantidad=cantidad,
+                                            precio_unitario=precio))
+        Ordenes.objects.bulk_update(ordenes, ['fecha', 'total'], batch_size=LOTE)
+        DetallesOrdenes.objects.bulk_create(detalles, batch_size=LOTE)
+
+        Recompensas.objects.bulk_create([
+            Recompensas(cliente_id=rng.choice(clientes), tipo=rng.choice(['DES', 'POR', 'REG']),
+                        descripcion="Canje de puntos", valor=Decimal(rng.randint(1, 20)),
+                        costo_puntos=rng.randint(10, 200), solicitada_por_cliente=True,
+                        estado_solicitud=rng.choice(['PEND', 'APROB', 'ENTR']), utilizada=rng.random() < 0.3)
+            for _ in range(volumenes['recompensas'])], batch_size=LOTE)
+        Multas.objects.bulk_create([
+            Multas(cliente_id=rng.choice(clientes), tipo=rng.choice(['TARD', 'DEVOL']),
+                   monto=Decimal(rng.randint(1, 30)), descripcion="Multa sintética", pagada=rng.random() < 0.5)
+            for _ in range(volumenes['multas'])], batch_size=LOTE)
+
+        grupo_cliente, _ = Group.objects.get_or_create(name='Cliente')
+        grupo_admin, _ = Group.objects.get_or_create(name='Administrador')
+        admin = User.objects.create_user('bench-admin', is_staff=True)
+        admin.groups.add(grupo_admin)
+        compradores = []
+        for i, cliente_id in enumerate(clientes[:usuarios]):
+            usuario = User.objects.create_user(f"bench-{i}")
+            usuario.groups.add(grupo_cliente)
+            Clientes.objects.filter(pk=cliente_id).update(user=usuario)
+            compradores.append(usuario)
+
+    call_command('reconstruir_fidelidad', stdout=io.StringIO())
+    if busqueda.soportado():
+        call_command('reconstruir_busqueda', stdout=io.StringIO())
+
+    return {
+        'productos': [pk for pk, _ in productos],
+        'clientes': clientes,
+        'compradores': compradores,
+        'admin': admin,
+    }
+
+
+# --- Escenarios ---
+
+def _agregar(rng, ctx):
+    return reverse('agregar_carrito', args=['lic', rng.choice(ctx['productos'])])
+
+
+ESCENARIOS = {
+    'catalogo': [
+        ('productos', 'cliente', lambda rng, ctx: reverse('productos')),
+        ('productos_busqueda', 'cliente', lambda rng, ctx: f"{reverse('productos')}?busqueda={rng.choice(CATEGORIAS)}"),
+    ],
+    'carrito': [
+        ('agregar_carrito', 'cliente', _agregar),
+        ('ver_carrito', 'cliente', lambda rng, ctx: reverse('ver_carrito')),
+    ],
+    'checkout': [
+        ('agregar_carrito', 'cliente', _agregar),
+        ('resumen_checkout', 'cliente', lambda rng, ctx: reverse('resumen_checkout')),
+        ('previsualizar_factura', 'cliente', lambda rng, ctx: reverse('previsualizar_factura')),
+        ('procesar_orden', 'cliente', lambda rng, ctx: reverse('procesar_orden', args=['PAGO'])),
+    ],
+    'index': [
+        ('index', 'admin', lambda rng, ctx: reverse('index')),
+    ],
+    'detalle_cliente': [
+        ('detalle_cliente', 'admin', lambda rng, ctx: reverse('detalle_cliente', args=[rng.choice(ctx['clientes'])])),
+    ],
+}
+
+
+# --- Medición ---
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def resumir(muestras, segundos):
+    """
+    muestras: {paso: [(ms, consultas), ...]}. Retorna el reporte con p50/p95/p99,
+    consultas por petición de cada paso y el throughput de toda la corrida.
+    """
+    pasos = {}
+    for paso, valores in sorted(muestras.items()):
+        latencias = sorted(ms for ms, _ in valores)
+        consultas = [c for _, c in valores if c is not None]
+        pasos[paso] = {
+            'peticiones': len(valores),
+            'p50_ms': round(_percentil(latencias, 0.50), 2),
+            'p95_ms': round(_percentil(latencias, 0.95), 2),
+            'p99_ms': round(_percentil(latencias, 0.99), 2),
+            'consultas': round(sum(consultas) / len(consultas), 2) if consultas else None,
+        }
+    total = sum(p['peticiones'] for p in pasos.values())
+    return {
+        'peticiones': total,
+        'segundos': round(segundos, 3),
+        'throughput_rps': round(total / segundos, 2) if segundos else None,
+        'pasos': pasos,
+    }
+
+
+def en_proceso(ctx, escenarios, iteraciones, semilla=42, calentamiento=1):
+    """Corre los escenarios en serie con el cliente de pruebas de Django"""
+    rng = random.Random(semilla)
+    clientes = {'cliente': Client(SERVER_NAME=HOST), 'admin': Client(SERVER_NAME=HOST)}
+    clientes['cliente'].force_login(ctx['compradores'][0])
+    clientes['admin'].force_login(ctx['admin'])
+
+    muestras = defaultdict(list)
+    inicio = None
+    for vuelta in range(calentamiento + iteraciones):
+        if vuelta == calentamiento:
+            muestras.clear()
+            inicio = time.perf_counter()
+        for nombre in escenarios:
+            for paso, quien, ruta in ESCENARIOS[nombre]:
+                url = ruta(rng, ctx)
+                with metricas.medir() as medicion:
+                    response = clientes[quien].get(url)
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{paso} {url}: HTTP {response.status_code}")
+                muestras[paso].append((medicion.total_ms, medicion.consultas))
+    return resumir(muestras, time.perf_counter() - inicio)
+
+
+class _SinRedirecciones(HTTPRedirectHandler):
+    """Cada paso mide una sola petición: las redirecciones llegan como HTTPError 3xx"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _abridor(usuario):
+    """urllib con la cookie de sesión de `usuario` (iniciada con force_login)"""
+    sesion = Client(SERVER_NAME=HOST)
+    sesion.force_login(usuario)
+    abridor = build_opener(_SinRedirecciones)
+    abridor.addheaders = [('Cookie', f"{settings.SESSION_COOKIE_NAME}={sesion.cookies[settings.SESSION_COOKIE_NAME].value}")]
+    return abridor
+
+
+def por_http(ctx, escenarios, iteraciones, concurrencia, semilla=42, calentamiento=1):
+    """
+    Levanta el servidor de desarrollo multihilo y corre los escenarios con
+    `concurrencia` hilos, cada uno con su propio comprador. Las consultas por
+    petición se leen del registro de MetricasMiddleware del mismo proceso.
+    """
+    from django.test.testcases import LiveServerThread, _StaticFilesHandler
+
+    servidor = LiveServerThread(HOST, _StaticFilesHandler)
+    servidor.daemon = True
+    servidor.start()
+    servidor.is_ready.wait()
+    if servidor.error:
+        raise servidor.error
+    base = f"http://{HOST}:{servidor.port}"
+
+    try:
+        admin = _abridor(ctx['admin'])
+        abridores = [{'cliente': _abridor(comprador), 'admin': admin}
+                     for comprador in ctx['compradores'][:concurrencia]]
+        if len(abridores) < concurrencia:
+            raise ValueError(f"Hay {len(abridores)} compradores sembrados; se pidieron {concurrencia} hilos")
+
+        muestras = defaultdict(list)
+        errores = []
+        lock = threading.Lock()
+
+        def trabajar(indice, vueltas, registrar):
+            rng = random.Random(semilla + indice)
+            locales = defaultdict(list)
+            try:
+                for _ in range(vueltas):
+                    for nombre in escenarios:
+                        for paso, quien, ruta in ESCENARIOS[nombre]:
+                            url = base + ruta(rng, ctx)
+                            inicio = time.perf_counter()
+                            try:
+                                with abridores[indice][quien].open(url, timeout=60) as respuesta:
+                                    respuesta.read()
+                            except HTTPError as e:
+                                if e.code >= 500:
+                                    raise RuntimeError(f"{paso} {url}: HTTP {e.code}")
+                            locales[paso].append(((time.perf_counter() - inicio) * 1000, None))
+            except Exception as e:
+                errores.append(e)
+            finally:
+                close_old_connections()
+            if registrar:
+                with lock:
+                    for paso, valores in locales.items():
+                        muestras[paso].extend(valores)
+
+        def correr(vueltas, registrar):
+            hilos = [threading.Thread(target=trabajar, args=(i, vueltas, registrar)) for i in range(concurrencia)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            if errores:
+                raise errores[0]
+
+        correr(calentamiento, False)
+        metricas.registro.limpiar()
+        inicio = time.perf_counter()
+        correr(iteraciones, True)
+        reporte = resumir(muestras, time.perf_counter() - inicio)
+    finally:
+        servidor.terminate()
+
+    por_vista = metricas.registro.resumen()
+    for paso, datos in reporte['pasos'].items():
+        # productos_busqueda es la misma vista que productos
+        vista = 'productos' if paso == 'productos_busqueda' else paso
+        datos['consultas'] = por_vista.get(vista, {}).get('consultas_promedio')
+    return reporte
+
+
+# --- Baseline ---
+
+def guardar(reporte, ruta):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(reporte, indent=2, sort_keys=True, ensure_ascii=False))
+
+
+def cargar(ruta):
+    return json.loads(ruta.read_text()) if ruta.exists() else None
+
+
+def comparar(reporte, base, tolerancia=0.2):
+    """
+    Regresiones de `reporte` contra `base` (ambos de un mismo modo): p95 más de
+    `tolerancia` por encima, o más consultas por petición. Retorna una lista de textos.
+    """
+    regresiones = []
+    for paso, actual in reporte['pasos'].items():
+        anterior = base.get('pasos', {}).get(paso)
+        if not anterior:
+            continue
+        if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{paso}: p95 {anterior['p95_ms']} ms -> {actual['p95_ms']} ms")
+        if None not in (actual['consultas'], anterior['consultas']) and actual['consultas'] > anterior['consultas']:
+            regresiones.append(f"{paso}: consultas {anterior['consultas']} -> {actual['consultas']}")
+    if base.get('throughput_rps') and reporte['throughput_rps'] < base['throughput_rps'] / (1 + tolerancia):
+        regresiones.append(f"throughput {base['throughput_rps']} -> {reporte['throughput_rps']} req/s")
+    return regresiones
@@ -0,0 +1,248 @@
+"""
+Índice de búsqueda de texto completo del catálogo (Productos y Cócteles).
+
+- SQLite: tabla virtual FTS5 con el tokenizador `unicode61 remove_diacritics 2`
+  (insensible a tildes y mayúsculas) y ranking bm25.
+- PostgreSQL: tabla con columna tsvector (configuración 'spanish', con pesos por
+  campo), índice GIN y ranking ts_rank. El texto se guarda ya sin tildes.
+- Otros motores: se usa el filtro icontains de siempre.
+
+Las búsquedas son por prefijo ("whis" encuentra "Whisky") y todos los términos
+deben aparecer. signals.py mantiene el índice al guardar/borrar Productos,
+Cócteles, Marcas y Categorías; `manage.py reconstruir_busqueda` lo regenera.
+"""
+import re
+import unicodedata
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Case, IntegerField, Q, Value, When
+
+TABLA = 'licoreria_busqueda'
+PRODUCTO = 'producto'
+COCTEL = 'coctel'
+LIMITE_RESULTADOS = 500
+
+# Peso de cada columna en el ranking: nombre > marca > categoría > ingredientes
+PESOS = {'nombre': 'A', 'marca': 'B', 'categoria': 'C', 'ingredientes': 'D'}
+
+
+def _conexion(using=DEFAULT_DB_ALIAS):
+    return connections[using]
+
+
+def soportado(using=DEFAULT_DB_ALIAS):
+    return _conexion(using).vendor in ('sqlite', 'postgresql')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ('Añejo' -> 'anejo')"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def terminos(texto):
+    return re.findall(r'\w+', normalizar(texto))
+
+
+# --- Estructura del índice (la migración 0035 tiene su propia copia) ---
+
+def crear_indice(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+                "tipo UNINDEXED, objeto_id UNINDEXED, nombre, marca, categoria, ingredientes, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLA} ("
+                "tipo varchar(10) NOT NULL, objeto_id bigint NOT NULL, documento tsvector NOT NULL, "
+                "PRIMARY KEY (tipo, objeto_id))"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {TABLA}_documento ON {TABLA} USING GIN (documento)")
+
+
+def borrar_indice(connection):
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+
+
+# --- Documentos ---
+
+def documento_producto(producto):
+    return {
+        'nombre': producto.nombre,
+        'marca': producto.marca.nombre if producto.marca_id else '',
+        'categoria': producto.categoria.nombre if producto.categoria_id else '',
+        'ingredientes': '',
+    }
+
+
+def documento_coctel(coctel):
+    return {
+        'nombre': coctel.nombre,
+        'marca': '',
+        'categoria': coctel.categoria or '',
+        'ingredientes': coctel.ingredientes or '',
+    }
+
+
+def _sql_insertar(vendor):
+    if vendor == 'sqlite':
+        return (f"INSERT INTO {TABLA} (tipo, objeto_id, nombre, marca, categoria, ingredientes) "
+                "VALUES (%s, %s, %s, %s, %s, %s)")
+    vector = ' || '.join(f"setweight(to_tsvector('spanish', %s), '{peso}')" for peso in PESOS.values())
+    return f"INSERT INTO {TABLA} (tipo, objeto_id, documento) VALUES (%s, %s, {vector})"
+
+
+def _fila(vendor, tipo, objeto_id, documento):
+    valores = [documento[campo] for campo in PESOS]
+    if vendor == 'postgresql':
+        valores = [normalizar(v) for v in valores]
+    return [tipo, objeto_id, *valores]
+
+
+def indexar(tipo, objeto_id, documento, using=DEFAULT_DB_ALIAS):
+    connection = _conexion(using)
+    if not soportado(using):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE tipo = %s AND objeto_id = %s", [tipo, objeto_id])
+        cursor.execute(_sql_insertar(connection.vendor), _fila(connection.vendor, tipo, objeto_id, documento))
+
+
+def indexar_producto(producto, using=DEFAULT_DB_ALIAS):
+    indexar(PRODUCTO, producto.pk, documento_producto(producto), using)
+
+
+def indexar_coctel(coctel, using=DEFAULT_DB_ALIAS):
+    indexar(COCTEL, coctel.pk, documento_coctel(coctel), using)
+
+
+def desindexar(tipo, objeto_ids, using=DEFAULT_DB_ALIAS):
+    objeto_ids = list(objeto_ids)
+    if not objeto_ids or not soportado(using):
+        return
+    marcadores = ', '.join(['%s'] * len(objeto_ids))
+    with _conexion(using).cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE tipo = %s AND objeto_id IN ({marcadores})", [tipo, *objeto_ids])
+
+
+def indexar_varios(tipo, objetos, documento, using=DEFAULT_DB_ALIAS):
+    """Reindexa varios objetos con un DELETE y un INSERT por lotes"""
+    connection = _conexion(using)
+    if not soportado(using):
+        return
+    objetos = list(objetos)
+    desindexar(tipo, [o.pk for o in objetos], using)
+    with connection.cursor() as cursor:
+        cursor.executemany(_sql_insertar(connection.vendor),
+                           [_fila(connection.vendor, tipo, o.pk, documento(o)) for o in objetos])
+
+
+def indexar_productos(productos, using=DEFAULT_DB_ALIAS):
+    """`productos`: queryset o lista con marca y categoría ya cargadas"""
+    indexar_varios(PRODUCTO, productos, documento_producto, using)
+
+
+def indexar_cocteles(cocteles, using=DEFAULT_DB_ALIAS):
+    indexar_varios(COCTEL, cocteles, documento_coctel, using)
+
+
+def reconstruir(productos, cocteles, using=DEFAULT_DB_ALIAS, batch_size=1000):
+    """
+    Vacía y vuelve a llenar el índice. Recibe los querysets/managers de Productos
+    y Cocteles. Retorna cuántos documentos indexó.
+    """
+    connection = _conexion(using)
+    if not soportado(using):
+        return 0
+    sql = _sql_insertar(connection.vendor)
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA}")
+        fuentes = [
+            (PRODUCTO, productos.select_related('marca', 'categoria'), documento_producto),
+            (COCTEL, cocteles.all(), documento_coctel),
+        ]
+        for tipo, queryset, documento in fuentes:
+            lote = []
+            for objeto in queryset.iterator(chunk_size=batch_size):
+                lote.append(_fila(connection.vendor, tipo, objeto.pk, documento(objeto)))
+                if len(lote) >= batch_size:
+                    cursor.executemany(sql, lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                cursor.executemany(sql, lote)
+                total += len(lote)
+    return total
+
+
+# --- Consultas ---
+
+class Coincidencias(list):
+    """IDs de una búsqueda; `truncado` indica que había más de `limite` coincidencias"""
+    truncado = False
+
+
+def buscar_ids(tipo, texto, limite=None, using=DEFAULT_DB_ALIAS):
+    """
+    IDs que coinciden con todos los términos (por prefijo), del más al menos relevante.
+    Como mucho `limite` (LIMITE_RESULTADOS por defecto): se pide uno más para saber
+    si el resultado quedó truncado.
+    """
+    limite = limite or LIMITE_RESULTADOS
+    palabras = terminos(texto)
+    if not palabras:
+        return Coincidencias()
+    connection = _conexion(using)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            consulta = ' '.join(f'"{p}"*' for p in palabras)
+            # bm25 recibe un peso por columna, incluidas las UNINDEXED (tipo, objeto_id)
+            cursor.execute(
+                f"SELECT objeto_id FROM {TABLA} WHERE {TABLA} MATCH %s AND tipo = %s "
+                f"ORDER BY bm25({TABLA}, 0, 0, 10.0, 5.0, 3.0, 1.0) LIMIT %s",
+                [consulta, tipo, limite + 1],
+            )
+        else:
+            consulta = ' & '.join(f"{p}:*" for p in palabras)
+            cursor.execute(
+                f"SELECT objeto_id FROM {TABLA} WHERE tipo = %s AND documento @@ to_tsquery('spanish', %s) "
+                f"ORDER BY ts_rank(documento, to_tsquery('spanish', %s)) DESC LIMIT %s",
+                [tipo, consulta, consulta, limite + 1],
+            )
+        ids = Coincidencias(fila[0] for fila in cursor.fetchall())
+    if len(ids) > limite:
+        del ids[limite:]
+        ids.truncado = True
+    return ids
+
+
+def filtrar(queryset, tipo, texto, campos_respaldo):
+    return filtrar_con_limite(queryset, tipo, texto, campos_respaldo)[0]
+
+
+def filtrar_con_limite(queryset, tipo, texto, campos_respaldo):
+    """
+    Filtra `queryset` por la búsqueda y lo ordena por relevancia, anotada como
+    `relevancia` (0 la más relevante) para poder paginar con cursor sobre ella.
+    `campos_respaldo` son los lookups icontains a usar si el motor no tiene índice;
+    en ese caso no hay ranking y todas las filas tienen relevancia 0.
+    Retorna (queryset, truncado): truncado es True si el índice encontró más de
+    LIMITE_RESULTADOS coincidencias y solo se conservan las más relevantes.
+    """
+    if not soportado(queryset.db):
+        condicion = Q()
+        for campo in campos_respaldo:
+            condicion |= Q(**{f"{campo}__icontains": texto})
+        return queryset.filter(condicion).annotate(relevancia=Value(0, output_field=IntegerField())), False
+
+    ids = buscar_ids(tipo, texto, using=queryset.db)
+    if not ids:
+        return queryset.none(), False
+    relevancia = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(relevancia=relevancia).order_by('relevancia'), ids.truncado
@@ -0,0 +1,215 @@
+"""
+Caché de respuestas de las APIs externas (Open Food Facts y TheCocktailDB).
+
+Las entradas se indexan por (endpoint, búsqueda, categoría) normalizados y
+guardan la hora en que se obtuvieron:
+- Dentro de TTL se sirven directamente.
+- Entre TTL y TTL + STALE_TTL se sirven "viejas" y se revalidan en segundo
+  plano (stale-while-revalidate); si la API falla también se sirven viejas.
+- Después de eso se consideran ausentes.
+
+Backends (settings.EXTERNAL_API_CACHE['BACKEND']):
+- 'django': usa el alias de caché de Django indicado en 'ALIAS'. El límite de
+  tamaño/LRU lo pone la propia caché (p. ej. MAX_ENTRIES de LocMemCache).
+- 'sqlite': archivo SQLite local persistente con límite MAX_ENTRIES y desalojo LRU.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .cliente_http import Coalescedor, en_segundo_plano
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DEFAULT = {
+    'BACKEND': 'django',
+    'ALIAS': 'default',
+    'PATH': None,
+    'TTL': 60 * 60,
+    'TTL_EAN': 60 * 60 * 24 * 30,
+    'STALE_TTL': 60 * 60 * 24,
+    'MAX_ENTRIES': 5000,
+}
+
+
+def config():
+    return {**CONFIG_DEFAULT, **getattr(settings, 'EXTERNAL_API_CACHE', {})}
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con espacios colapsados"""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def clave_cache(endpoint, query, categoria=''):
+    base = '|'.join([endpoint, normalizar(query), normalizar(categoria)])
+    return 'apis:' + hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+class BackendDjango:
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, clave):
+        return self.cache.get(clave)
+
+    def set(self, clave, entrada, timeout):
+        self.cache.set(clave, entrada, timeout)
+
+    def limpiar(self):
+        self.cache.clear()
+
+
+class BackendSQLite:
+    """Almacén persistente en un archivo SQLite, con desalojo LRU por fecha de acceso"""
+
+    def __init__(self, ruta, max_entradas):
+        self.ruta = str(ruta)
+        self.max_entradas = max_entradas
+        with self._conectar() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respuestas ("
+                " clave TEXT PRIMARY KEY, valor TEXT NOT NULL,"
+                " guardado_en REAL NOT NULL, expira_en REAL NOT NULL, accedido_en REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS respuestas_accedido ON respuestas (accedido_en)")
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=5)
+
+    def get(self, clave):
+        ahora = time.time()
+        with self._conectar() as conn:
+            fila = conn.execute(
+                "SELECT valor, guardado_en, expira_en FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if fila[2] <= ahora:
+                conn.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                return None
+            conn.execute("UPDATE respuestas SET accedido_en = ? WHERE clave = ?", (ahora, clave))
+        return fila[1], json.loads(fila[0])
+
+    def set(self, clave, entrada, timeout):
+        guardado_en, payload = entrada
+        ahora = time.time()
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?)",
+                (clave, json.dumps(payload), guardado_en, ahora + timeout, ahora),
+            )
+            sobrantes = conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - self.max_entradas
+            if sobrantes > 0:
+                conn.execute(
+                    "DELETE FROM respuestas WHERE clave IN "
+                    "(SELECT clave FROM respuestas ORDER BY accedido_en LIMIT ?)", (sobrantes,)
+                )
+
+    def limpiar(self):
+        with self._conectar() as conn:
+            conn.execute("DELETE FROM respuestas")
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def backend():
+    cfg = config()
+    if cfg['BACKEND'] == 'sqlite':
+        llave = ('sqlite', str(cfg['PATH']), cfg['MAX_ENTRIES'])
+    else:
+        llave = ('django', cfg['ALIAS'])
+    with _backends_lock:
+        if llave not in _backends:
+            if llave[0] == 'sqlite':
+                _backends[llave] = BackendSQLite(cfg['PATH'], cfg['MAX_ENTRIES'])
+            else:
+                _backends[llave] = BackendDjango(cfg['ALIAS'])
+        return _backends[llave]
+
+
+_revalidando = set()
+_revalidando_lock = threading.Lock()
+
+
+def _guardar(clave, payload, ttl, stale_ttl):
+    backend().set(clave, (time.time(), payload), ttl + stale_ttl)
+
+
+def _revalidar(clave, cargar, ttl, stale_ttl):
+    """Refresca una entrada vieja en un hilo aparte (una sola revalidación por clave)"""
+    with _revalidando_lock:
+        if clave in _revalidando:
+            return None
+        _revalidando.add(clave)
+
+    def tarea():
+        try:
+            _guardar(clave, cargar(), ttl, stale_ttl)
+        except Exception as e:
+            logger.warning(f"No se pudo revalidar la caché de APIs: {e}")
+        finally:
+            with _revalidando_lock:
+                _revalidando.discard(clave)
+
+    hilo = threading.Thread(target=tarea, daemon=True)
+    hilo.start()
+    return hilo
+
+
+def consultar(endpoint, query, cargar, categoria='', ttl=None):
+    """
+    Retorna el payload cacheado para (endpoint, query, categoria) o lo obtiene
+    llamando a `cargar()`. `cargar` debe devolver datos serializables a JSON y
+    lanzar una excepción si la respuesta de la API no es válida (no se cachea).
+    """
+    cfg = config()
+    ttl = cfg['TTL'] if ttl is None else ttl
+    stale_ttl = cfg['STALE_TTL']
+    clave = clave_cache(endpoint, query, categoria)
+
+    entrada = backend().get(clave)
+    if entrada is not None:
+        guardado_en, payload = entrada
+        if time.time() - guardado_en < ttl:
+            return payload
+        _revalidar(clave, cargar, ttl, stale_ttl)
+        return payload
+
+    payload = cargar()
+    _guardar(clave, payload, ttl, stale_ttl)
+    return payload
+
+
+coalescedor = Coalescedor()
+
+
+async def consultar_async(endpoint, query, cargar, categoria='', ttl=None):
+    """
+    consultar() para vistas asíncronas: la consulta (caché y, si falta, `cargar()`)
+    corre en el executor de E/S y las búsquedas idénticas concurrentes la comparten.
+    """
+    return await coalescedor.ejecutar(
+        clave_cache(endpoint, query, categoria),
+        lambda: en_segundo_plano(consultar, endpoint, query, cargar, categoria=categoria, ttl=ttl),
+    )
+
+
+def ttl_ean():
+    """Los metadatos de un código de barras casi no cambian: se cachean mucho más tiempo"""
+    return config()['TTL_EAN']
@@ -0,0 +1,135 @@
+"""
+Servicio del carrito de compras.
+
+El carrito es un dict {"lic_<id>": cantidad, "coc_<id>": cantidad} que se lee
+y escribe con almacen_carrito.obtener_almacen(request) (sesión, caché o BD).
+Este módulo interpreta esas claves una sola vez y carga todos los ítems con
+una consulta por modelo, para que ver_carrito, resumen_checkout,
+previsualizar_factura y procesar_orden compartan las mismas líneas.
+
+Al confirmar la orden, reservas.descontar_stock y crear_detalles trabajan por
+conjuntos: un UPDATE condicional por modelo y un bulk_create de los detalles,
+sin importar cuántas líneas tenga el carrito.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from .models import Productos, Cocteles, DetallesOrdenes
+
+MODELOS = {
+    'lic': Productos,
+    'coc': Cocteles,
+}
+
+SECCIONES = {
+    'lic': 'Licores',
+    'coc': 'Cócteles',
+}
+
+
+@dataclass
+class LineaCarrito:
+    """Una línea del carrito ya hidratada con su Productos/Cocteles"""
+    tipo: str
+    item_id: int
+    item: object
+    cantidad: int
+
+    @property
+    def subtotal(self):
+        return self.item.precio * self.cantidad
+
+    @property
+    def seccion(self):
+        return SECCIONES[self.tipo]
+
+    @property
+    def error_stock(self):
+        return self.cantidad > self.item.stock
+
+    @property
+    def msg_stock(self):
+        return f"Stock insuficiente (Máx: {self.item.stock})" if self.error_stock else ""
+
+
+def parsear_clave(key):
+    """Convierte 'lic_12' en ('lic', 12). Retorna None si la clave no es válida."""
+    tipo, _, item_id = str(key).partition('_')
+    if tipo not in SECCIONES or not item_id.isdigit():
+        return None
+    return tipo, int(item_id)
+
+
+def cargar_carrito(carrito):
+    """
+    Hidrata el carrito de sesión con dos consultas `id__in` (licores y cócteles).
+    Conserva el orden del carrito y omite claves inválidas o ítems ya eliminados.
+    """
+    claves = []
+    ids = {'lic': set(), 'coc': set()}
+    for key, cant in carrito.items():
+        parsed = parsear_clave(key)
+        if parsed is None:
+            continue
+        claves.append((parsed, cant))
+        ids[parsed[0]].add(parsed[1])
+
+    items = {'lic': {}, 'coc': {}}
+    if ids['lic']:
+        items['lic'] = Productos.objects.select_related('categoria', 'marca').in_bulk(ids['lic'])
+    if ids['coc']:
+        items['coc'] = Cocteles.objects.in_bulk(ids['coc'])
+
+    lineas = []
+    for (tipo, item_id), cant in claves:
+        item = items[tipo].get(item_id)
+        if item is not None:
+            lineas.append(LineaCarrito(tipo=tipo, item_id=item_id, item=item, cantidad=cant))
+    return lineas
+
+
+def total_carrito(lineas):
+    """Suma de los subtotales de las líneas"""
+    return sum((linea.subtotal for linea in lineas), Decimal('0.00'))
+
+
+def crear_detalles(orden, lineas):
+    """
+    Inserta los detalles de la orden con un solo bulk_create. No dispara las señales
+    de DetallesOrdenes: el stock ya se descontó con descontar_stock y el total de la
+    orden se calcula una vez en la vista.
+    """
+    return DetallesOrdenes.objects.bulk_create([
+        DetallesOrdenes(
+            orden=orden,
+            producto=linea.item if linea.tipo == 'lic' else None,
+            coctel=linea.item if linea.tipo == 'coc' else None,
+            cantidad=linea.cantidad,
+            precio_unitario=linea.item.precio,
+        )
+        for linea in lineas
+    ])
+
+
+def resumen_json(lineas, clave=None):
+    """
+    Estado del carrito para las respuestas AJAX: cantidad de líneas, total,
+    si hay líneas sin stock suficiente y la línea `clave` ('lic_12') tal como quedó
+    (None si ya no está en el carrito).
+    """
+    linea = next((l for l in lineas if f"{l.tipo}_{l.item_id}" == clave), None)
+    return {
+        'cart_count': len(lineas),
+        'total': f"{total_carrito(lineas):.2f}",
+        'hay_errores_stock': any(l.error_stock for l in lineas),
+        'linea': linea and {
+            'clave': clave,
+            'nombre': linea.item.nombre,
+            'cantidad': linea.cantidad,
+            'stock': linea.item.stock,
+            'precio': f"{linea.item.precio:.2f}",
+            'subtotal': f"{linea.subtotal:.2f}",
+            'error_stock': linea.error_stock,
+            'msg_stock': linea.msg_stock,
+        },
+    }
@@ -0,0 +1,284 @@
+"""
+Cliente HTTP compartido para las APIs externas (Open Food Facts y TheCocktailDB).
+
+Cada servicio tiene una sesión `requests` a nivel de módulo con pool de
+conexiones keep-alive, reintentos acotados con backoff para errores de
+conexión/5xx y un circuit breaker: tras varios fallos seguidos el servicio se
+marca como no disponible durante un tiempo y las vistas fallan al instante en
+lugar de bloquear un worker hasta el timeout.
+
+Las URLs base se leen de settings en cada llamada, así que los tests pueden
+apuntarlas a un servidor local con override_settings.
+
+Las vistas asíncronas usan los mismos clientes con get_json_async(): la
+petición corre en un executor de E/S propio, de modo que el event loop queda
+libre mientras se espera a la API. Coalescedor une las peticiones idénticas
+que llegan a la vez para que compartan una sola llamada.
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'LicoreriaNeonApp/1.0 (https://github.com/starx04/BLB_Django_Tienda; starx04@example.com)'
+
+
+class ServicioNoDisponible(requests.RequestException):
+    """El circuit breaker del servicio está abierto: no se intenta la llamada"""
+
+
+class RespuestaNoValida(requests.RequestException):
+    """La API respondió con un status distinto de 200"""
+
+    def __init__(self, status_code, *args, **kwargs):
+        self.status_code = status_code
+        super().__init__(f"Status {status_code}", *args, **kwargs)
+
+
+class CircuitBreaker:
+    """
+    Breaker clásico de tres estados (cerrado, abierto, semiabierto).
+    Se abre tras `max_fallos` fallos consecutivos y deja pasar una llamada de
+    prueba cuando han transcurrido `espera` segundos.
+    """
+
+    def __init__(self, max_fallos=5, espera=30):
+        self.max_fallos = max_fallos
+        self.espera = espera
+        self._fallos = 0
+        self._abierto_desde = None
+        self._lock = threading.Lock()
+
+    @property
+    def abierto(self):
+        with self._lock:
+            return self._abierto_desde is not None and time.monotonic() - self._abierto_desde < self.espera
+
+    def permitir(self):
+        """True si se puede intentar la llamada (cerrado o semiabierto)"""
+        with self._lock:
+            if self._abierto_desde is None:
+                return True
+            if time.monotonic() - self._abierto_desde >= self.espera:
+                # Semiabierto: dejamos pasar una llamada de prueba y reiniciamos la ventana
+                self._abierto_desde = time.monotonic()
+                return True
+            return False
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos >= self.max_fallos:
+                self._abierto_desde = time.monotonic()
+
+    def reiniciar(self):
+        self.registrar_exito()
+
+
+class LimitadorTasa:
+    """Espacia las llamadas para no superar `por_segundo` peticiones por segundo entre todos los hilos"""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self._siguiente = 0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            self._siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+class ClienteHTTP:
+    """Sesión con pool, reintentos y circuit breaker para un servicio externo"""
+
+    def __init__(self, nombre, base_url_setting, base_url_default, verify=True):
+        self.nombre = nombre
+        self.base_url_setting = base_url_setting
+        self.base_url_default = base_url_default
+        self.verify = verify
+        self.breaker = CircuitBreaker(
+            max_fallos=getattr(settings, 'EXTERNAL_API_BREAKER_FAILURES', 5),
+            espera=getattr(settings, 'EXTERNAL_API_BREAKER_COOLDOWN', 30),
+        )
+        self.session = self._crear_sesion()
+
+    def _crear_sesion(self):
+        reintentos = getattr(settings, 'EXTERNAL_API_RETRIES', 2)
+        retry = Retry(
+            total=reintentos,
+            connect=reintentos,
+            read=0,  # Un servicio lento no se reintenta: eso duplicaría el bloqueo del worker
+            status=reintentos,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        pool = getattr(settings, 'EXTERNAL_API_POOL_SIZE', 10)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool, max_retries=retry)
+        session = requests.Session()
+        session.headers.update({'User-Agent': USER_AGENT})
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @property
+    def base_url(self):
+        return getattr(settings, self.base_url_setting, self.base_url_default).rstrip('/')
+
+    def url(self, ruta):
+        return f"{self.base_url}/{ruta.lstrip('/')}"
+
+    def get(self, ruta, params=None, timeout=None):
+        """
+        GET sobre `ruta` (relativa a la URL base). Lanza ServicioNoDisponible si el
+        breaker está abierto y propaga las excepciones de requests en otro caso.
+        """
+        if not self.breaker.permitir():
+            raise ServicioNoDisponible(f"{self.nombre} no disponible temporalmente")
+
+        if not self.verify:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        try:
+            response = self.session.get(
+                self.url(ruta), params=params, verify=self.verify,
+                timeout=timeout or getattr(settings, 'EXTERNAL_API_TIMEOUT', (3.05, 10)),
+            )
+        except requests.RequestException:
+            self.breaker.registrar_fallo()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.registrar_fallo()
+        else:
+            self.breaker.registrar_exito()
+        return response
+
+    def get_json(self, ruta, params=None, timeout=None):
+        """Como get(), pero retorna el JSON decodificado y lanza RespuestaNoValida si el status no es 200"""
+        response = self.get(ruta, params=params, timeout=timeout)
+        if response.status_code != 200:
+            raise RespuestaNoValida(response.status_code)
+        return response.json()
+
+    async def get_json_async(self, ruta, params=None, timeout=None):
+        """get_json() para vistas asíncronas (ver en_segundo_plano)"""
+        return await en_segundo_plano(self.get_json, ruta, params=params, timeout=timeout)
+
+    def get_concurrente(self, peticiones, max_workers=4, limitador=None):
+        """
+        Ejecuta varias peticiones GET en paralelo sobre el mismo pool.
+        `peticiones` es una lista de (ruta, params); retorna una lista con la
+        respuesta o la excepción de cada una, en el mismo orden. Con un
+        LimitadorTasa, cada petición espera su turno antes de salir.
+        """
+        def ejecutar(peticion):
+            ruta, params = peticion
+            if limitador:
+                limitador.esperar()
+            try:
+                return self.get(ruta, params=params)
+            except requests.RequestException as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(ejecutar, peticiones))
+
+
+# --- Uso desde código asíncrono ---
+
+_executor_io = None
+_executor_lock = threading.Lock()
+
+
+def executor_io():
+    """Hilos donde corren las llamadas bloqueantes (requests, caché) de las vistas asíncronas"""
+    global _executor_io
+    with _executor_lock:
+        if _executor_io is None:
+            _executor_io = ThreadPoolExecutor(max_workers=getattr(settings, 'EXTERNAL_API_ASYNC_WORKERS', 32),
+                                              thread_name_prefix='apis-io')
+        return _executor_io
+
+
+async def en_segundo_plano(funcion, *args, **kwargs):
+    """
+    Espera `funcion(*args, **kwargs)` sin bloquear el event loop. Si se cancela
+    la espera, el resultado se descarta (la llamada ya iniciada termina en su hilo).
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor_io(), functools.partial(funcion, *args, **kwargs))
+
+
+class Coalescedor:
+    """
+    Une operaciones idénticas concurrentes: la primera crea la tarea y las
+    demás esperan su mismo resultado (o excepción). La tarea compartida solo se
+    cancela cuando se cancelan todos los que la esperan, p. ej. porque todos
+    los clientes cerraron la conexión. Las tareas pertenecen a un event loop,
+    así que se agrupan por loop.
+    """
+
+    def __init__(self):
+        self._por_loop = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def en_vuelo(self):
+        loop = asyncio.get_running_loop()
+        return len(self._por_loop.get(loop, {}))
+
+    async def ejecutar(self, clave, fabrica):
+        """Resultado de `await fabrica()`, compartido con quien ya esté esperando la misma `clave`"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            tareas = self._por_loop.setdefault(loop, {})
+        entrada = tareas.get(clave)
+        if entrada is None:
+            entrada = tareas[clave] = {'tarea': loop.create_task(fabrica()), 'esperando': 0}
+
+            def terminar(_, entrada=entrada):
+                if tareas.get(clave) is entrada:
+                    del tareas[clave]
+            entrada['tarea'].add_done_callback(terminar)
+
+        entrada['esperando'] += 1
+        try:
+            return await asyncio.shield(entrada['tarea'])
+        except asyncio.CancelledError:
+            if entrada['esperando'] == 1:
+                entrada['tarea'].cancel()
+            raise
+        finally:
+            entrada['esperando'] -= 1
+
+
+# Clientes compartidos por todas las vistas de importación
+off = ClienteHTTP(
+    'Open Food Facts', 'OFF_BASE_URL', 'https://world.openfoodfacts.org',
+    # Se mantiene verify=False por posibles problemas de certificados en entornos locales
+    verify=False,
+)
+cocktaildb = ClienteHTTP(
+    'TheCocktailDB', 'COCKTAILDB_BASE_URL', 'https://www.thecocktaildb.com/api/json/v1/1',
+)
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import fragmentos
+from .almacen_carrito import obtener_almacen
+
+
+def carrito(request):
+    """Número de líneas del carrito para el ícono del encabezado (se calcula solo si la plantilla lo usa)"""
+    return {'carrito_lineas': lambda: obtener_almacen(request).contar()}
+
+
+def catalogo(request):
+    """TTL y versión global para las claves {% cache %} del catálogo (ver fragmentos.py)"""
+    return {'catalogo_cache': {'ttl': fragmentos.ttl(), 'version': SimpleLazyObject(fragmentos.version)}}
@@ -0,0 +1,97 @@
+"""
+Estadísticas del dashboard (index) para Administración, Supervisión y Bodega.
+
+Las cifras se calculan con pocas consultas agregadas y se cachean por
+combinación de roles durante DASHBOARD_CACHE_TTL segundos. signals.py invalida
+la caché al cambiar órdenes, recompensas o stock.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ordenes, Productos, Recompensas
+
+CACHE_VERSION_KEY = 'dashboard:version'
+DIAS_GRAFICO = 7
+UMBRAL_STOCK_BAJO = 5
+
+
+def _version_cache():
+    return cache.get_or_set(CACHE_VERSION_KEY, 1, None)
+
+
+def invalidar_cache():
+    """Invalida todas las entradas del dashboard cambiando la versión de la caché"""
+    try:
+        cache.incr(CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(CACHE_VERSION_KEY, 1, None)
+
+
+def estadisticas_negocio(hoy, dias=DIAS_GRAFICO):
+    """
+    Ventas de los últimos `dias` días, ventas de hoy y pendientes de aprobación.
+    La serie diaria y el conteo de solicitudes salen de una sola consulta agrupada.
+    """
+    desde = hoy - timezone.timedelta(days=dias - 1)
+    # Rango sobre la columna (no fecha__date) para que se use el índice parcial de fecha de las pagadas
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hoy + timezone.timedelta(days=1), time.min))
+    en_rango = Q(pagada=True, fecha__gte=inicio, fecha__lt=fin)
+    solicitud = Q(estado='SOLI')
+
+    filas = (Ordenes.objects
+             .filter(en_rango | solicitud)
+             .annotate(dia=TruncDate('fecha'))
+             .order_by()
+             .values('dia')
+             .annotate(ventas=Sum('total', filter=en_rango), solicitudes=Count('pk', filter=solicitud)))
+
+    ventas_por_dia = {}
+    solicitudes_pendientes = 0
+    for fila in filas:
+        if fila['ventas']:
+            ventas_por_dia[fila['dia']] = fila['ventas']
+        solicitudes_pendientes += fila['solicitudes']
+
+    fechas = [hoy - timezone.timedelta(days=i) for i in range(dias - 1, -1, -1)]
+    return {
+        'ventas_hoy': ventas_por_dia.get(hoy, 0),
+        'solicitudes_pendientes': solicitudes_pendientes,
+        'canjes_pendientes': Recompensas.objects.filter(estado_solicitud='PEND').count(),
+        'chart_labels': [f.strftime("%d/%m") for f in fechas],
+        'chart_data': [float(ventas_por_dia.get(f, 0)) for f in fechas],
+    }
+
+
+def estadisticas_bodega():
+    """Stock total y cantidad de productos con stock bajo en una sola consulta"""
+    datos = Productos.objects.aggregate(
+        productos_stock=Sum('stock'),
+        stock_bajo=Count('pk', filter=Q(stock__lt=UMBRAL_STOCK_BAJO)),
+    )
+    return {
+        'productos_stock': datos['productos_stock'] or 0,
+        'stock_bajo': datos['stock_bajo'],
+    }
+
+
+def estadisticas_dashboard(hoy, ver_negocio=False, ver_bodega=False):
+    """Retorna (desde caché si es posible) las estadísticas visibles para los roles dados"""
+    if not (ver_negocio or ver_bodega):
+        return {}
+
+    key = f"dashboard:v{_version_cache()}:{hoy.isoformat()}:{int(ver_negocio)}{int(ver_bodega)}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = {}
+        if ver_negocio:
+            stats.update(estadisticas_negocio(hoy))
+        if ver_bodega:
+            stats.update(estadisticas_bodega())
+        cache.set(key, stats, getattr(settings, 'DASHBOARD_CACHE_TTL', 60))
+    return stats
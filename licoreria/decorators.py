@@ -7,26 +7,27 @@ from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
 
+from . import roles
+
 def es_cliente(user):
     """Verifica si el usuario pertenece al grupo Cliente o es staff/superuser"""
-    return user.groups.filter(name='Cliente').exists() or user.is_superuser or user.is_staff
+    return roles.tiene_rol(user, 'Cliente') or user.is_superuser or user.is_staff
 
 def es_bodeguero(user):
     """Verifica si el usuario pertenece al grupo Bodeguero"""
-    return user.groups.filter(name='Bodeguero').exists() or user.is_superuser
+    return roles.tiene_rol(user, 'Bodeguero') or user.is_superuser
 
 def es_supervisor(user):
     """Verifica si el usuario pertenece al grupo Supervisor"""
-    return user.groups.filter(name='Supervisor').exists() or user.is_superuser
+    return roles.tiene_rol(user, 'Supervisor') or user.is_superuser
 
 def es_administrador(user):
     """Verifica si el usuario pertenece al grupo Administrador"""
-    return user.groups.filter(name='Administrador').exists() or user.is_superuser
+    return roles.tiene_rol(user, 'Administrador') or user.is_superuser
 
 def es_empleado(user):
     """Verifica si el usuario es empleado (Bodeguero o Supervisor)"""
-    return (user.groups.filter(name__in=['Bodeguero', 'Supervisor']).exists() 
-            or user.is_superuser)
+    return roles.tiene_rol(user, *roles.EMPLEADOS) or user.is_superuser
 
 # Decoradores específicos por rol
 cliente_required = user_passes_test(es_cliente, login_url='index')
@@ -51,7 +52,7 @@ def rol_requerido(*roles_permitidos):
                 return view_func(request, *args, **kwargs)
             
             # Verificar si el usuario tiene alguno de los roles permitidos
-            user_groups = request.user.groups.values_list('name', flat=True)
+            user_groups = roles.de_peticion(request)
             
             if any(rol in user_groups for rol in roles_permitidos):
                 return view_func(request, *args, **kwargs)
@@ -0,0 +1,56 @@
+"""
+Caché de fragmentos del catálogo: tarjetas de producto y secciones por categoría.
+
+Las plantillas usan {% cache %} con claves que cambian cuando cambia lo que muestran:
+- Tarjeta: id del producto + su stock (los UPDATE de stock de reservas.py no
+  disparan señales) + un sello por producto en caché que signals.py sube en cada
+  post_save/post_delete de Productos + la versión global del catálogo. La columna
+  `version` no entra: reservar() la sube en cada factura previa sin tocar el stock.
+- Sección de categoría: id de la categoría + la firma de sus productos (id y sellos
+  de cada uno) + la versión global.
+- Versión global: la suben los cambios de Marcas y Categorías (nombres visibles en
+  las tarjetas y encabezados de sección).
+
+versionar() lee los sellos de una lista de productos con un solo get_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_VERSION_KEY = 'catalogo:version'
+PREFIJO_PRODUCTO = 'catalogo:producto:'
+
+
+def ttl():
+    return getattr(settings, 'CATALOGO_CACHE_TTL', 60 * 15)
+
+
+def version():
+    return cache.get_or_set(CACHE_VERSION_KEY, 1, None)
+
+
+def _subir(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def invalidar():
+    """Invalida todos los fragmentos del catálogo"""
+    _subir(CACHE_VERSION_KEY)
+
+
+def invalidar_producto(producto_id):
+    _subir(f"{PREFIJO_PRODUCTO}{producto_id}")
+
+
+def versionar(productos):
+    """
+    Anota en cada producto `cache_version` ("<stock>.<sello>") y retorna la firma
+    del conjunto, útil como clave de la sección que los agrupa.
+    """
+    productos = list(productos)
+    sellos = cache.get_many([f"{PREFIJO_PRODUCTO}{p.pk}" for p in productos])
+    for producto in productos:
+        producto.cache_version = f"{producto.stock}.{sellos.get(f'{PREFIJO_PRODUCTO}{producto.pk}', 0)}"
+    return ','.join(f"{p.pk}:{p.cache_version}" for p in productos)
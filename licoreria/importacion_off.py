@@ -0,0 +1,273 @@
+"""
+Importación masiva de volcados de Open Food Facts (JSONL o CSV/TSV, también .gz).
+
+leer_volcado() recorre el archivo línea por línea, sin cargarlo en memoria, y
+entrega cada producto con la forma del JSON de OFF junto al offset (en bytes
+del archivo descomprimido) donde empieza la línea siguiente.
+
+ImportadorOFF se queda solo con bebidas alcohólicas y acumula lotes de
+`batch_size` productos. Por lote:
+- resuelve marcas y categorías contra diccionarios en memoria (cargados una
+  vez); las que faltan se crean todas juntas con bulk_create,
+- hace upsert de Productos con bulk_create(update_conflicts=True) sobre
+  codigo_barras: los nuevos entran con precio sugerido y stock 0, los
+  existentes actualizan sus datos de catálogo pero conservan precio y stock,
+- reindexa el lote en la búsqueda e invalida las tarjetas del catálogo,
+- guarda un checkpoint con el offset ya confirmado para poder reanudar.
+
+Las filas cuyo (nombre, marca) ya pertenece a otro código de barras se
+omiten: Productos tiene unique_together sobre esos campos.
+"""
+import csv
+import gzip
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+
+from . import busqueda, fragmentos
+from .utils import get_default_price
+
+CATEGORIA_ALCOHOL = 'en:alcoholic-beverages'
+CAMPOS_ACTUALIZABLES = ['nombre', 'marca', 'categoria', 'grados_alcohol', 'url_imagen_externa', 'origen',
+                        'descripcion_tecnica']
+
+
+def nombre_categoria_off(tag):
+    """'en:irish-whiskies' -> 'Irish Whiskies' (mismo criterio que ImportarLicorOFFAPI.post)"""
+    texto = tag.split(',')[0].strip()
+    if ':' in texto:
+        texto = texto.split(':')[-1].replace('-', ' ').title()
+    return texto
+
+
+def nombre_marca_off(brands):
+    return (brands or '').split(',')[0].strip().upper() or 'GENERICO'
+
+
+# --- Lectura ---
+
+def abrir(ruta):
+    ruta = Path(ruta)
+    return gzip.open(ruta, 'rb') if ruta.suffix == '.gz' else open(ruta, 'rb')
+
+
+def detectar_formato(ruta):
+    sufijos = [s.lower() for s in Path(ruta).suffixes if s.lower() != '.gz']
+    return 'jsonl' if sufijos and sufijos[-1] in ('.jsonl', '.json', '.ndjson') else 'csv'
+
+
+def _desde_csv(fila):
+    """Fila del CSV de OFF (en.openfoodfacts.org.products.csv) con la forma del JSON"""
+    return {
+        'code': fila.get('code', ''),
+        'product_name': fila.get('product_name', ''),
+        'brands': fila.get('brands', ''),
+        'categories': fila.get('categories', ''),
+        'categories_tags': [t for t in (fila.get('categories_tags') or '').split(',') if t],
+        'origins': fila.get('origins', ''),
+        'quantity': fila.get('quantity', ''),
+        'image_url': fila.get('image_url', ''),
+        'nutriments': {'alcohol_100g': fila.get('alcohol_100g')},
+    }
+
+
+def leer_volcado(ruta, desde=0, formato=None, delimitador='\t'):
+    """Genera (offset_siguiente, producto) desde `desde` (un offset devuelto antes)"""
+    formato = formato or detectar_formato(ruta)
+    with abrir(ruta) as archivo:
+        columnas = None
+        if formato == 'csv':
+            columnas = next(csv.reader([archivo.readline().decode('utf-8')], delimiter=delimitador))
+            columnas = [c.strip() for c in columnas]
+        if desde:
+            archivo.seek(desde)
+
+        while True:
+            linea = archivo.readline()
+            if not linea:
+                break
+            offset = archivo.tell()
+            texto = linea.decode('utf-8', errors='replace').strip()
+            if not texto:
+                continue
+            if formato == 'jsonl':
+                try:
+                    producto = json.loads(texto)
+                except ValueError:
+                    yield offset, None
+                    continue
+            else:
+                valores = next(csv.reader([texto], delimiter=delimitador, quoting=csv.QUOTE_NONE))
+                producto = _desde_csv(dict(zip(columnas, valores)))
+            yield offset, producto
+
+
+def es_alcoholica(producto):
+    tags = producto.get('categories_tags') or []
+    return CATEGORIA_ALCOHOL in tags
+
+
+def _grados(producto):
+    nutriments = producto.get('nutriments') or {}
+    valor = nutriments.get('alcohol_100g') or producto.get('alcohol_100g') or 0
+    try:
+        return min(max(Decimal(str(valor)).quantize(Decimal('0.1')), Decimal('0')), Decimal('100'))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+
+
+# --- Checkpoints ---
+
+class Checkpoint:
+    """Offset confirmado y contadores de una importación, en un JSON junto al volcado"""
+
+    def __init__(self, ruta, volcado):
+        self.ruta = Path(ruta)
+        self.volcado = Path(volcado)
+
+    def _firma(self):
+        estado = self.volcado.stat()
+        return {'archivo': str(self.volcado.resolve()), 'tamano': estado.st_size}
+
+    def cargar(self):
+        """(offset, estadísticas) guardados, o (0, None) si no hay checkpoint de este mismo archivo"""
+        if not self.ruta.exists():
+            return 0, None
+        datos = json.loads(self.ruta.read_text())
+        if {k: datos.get(k) for k in ('archivo', 'tamano')} != self._firma():
+            raise ValueError(f"El checkpoint {self.ruta} es de otro archivo o el volcado cambió")
+        return datos['offset'], datos['estadisticas']
+
+    def guardar(self, offset, estadisticas):
+        temporal = self.ruta.with_suffix(self.ruta.suffix + '.tmp')
+        temporal.write_text(json.dumps({**self._firma(), 'offset': offset, 'estadisticas': estadisticas}))
+        temporal.replace(self.ruta)  # atómico: nunca queda un checkpoint a medio escribir
+
+    def borrar(self):
+        self.ruta.unlink(missing_ok=True)
+
+
+# --- Importación ---
+
+class ImportadorOFF:
+    def __init__(self, batch_size=2000, checkpoint=None, progreso=None):
+        from .models import Categorias, Marcas, Productos
+
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.progreso = progreso
+        self.estadisticas = {'lineas': 0, 'alcoholicas': 0, 'creados': 0, 'actualizados': 0,
+                             'omitidos': 0, 'invalidas': 0}
+        self._lote = {}
+        self._inicio = time.monotonic()
+
+        # Todo se resuelve en memoria; solo se consulta la base para crear lo que falta
+        self.marcas = dict(Marcas.objects.values_list('nombre', 'id'))
+        self.categorias = dict(Categorias.objects.values_list('nombre', 'id'))
+        # (nombre, marca_id) -> código de barras de todos los productos, también los que no tienen
+        # código (None): cualquiera de ellos choca con el unique_together
+        self._clave_de = {}
+        self._codigo_de = {}
+        for codigo, nombre, marca_id in Productos.objects.values_list('codigo_barras', 'nombre', 'marca_id'):
+            self._codigo_de[(nombre, marca_id)] = codigo
+            if codigo is not None:
+                self._clave_de[codigo] = (nombre, marca_id)
+
+    def importar(self, ruta, desde=0, formato=None, delimitador='\t', limite=None):
+        offset = desde
+        for offset, producto in leer_volcado(ruta, desde, formato, delimitador):
+            self.estadisticas['lineas'] += 1
+            if producto is None:
+                self.estadisticas['invalidas'] += 1
+            else:
+                self.agregar(producto)
+            if len(self._lote) >= self.batch_size:
+                self.confirmar(offset)
+            if limite and self.estadisticas['lineas'] >= limite:
+                break
+        self.confirmar(offset)
+        return self.estadisticas
+
+    def agregar(self, producto):
+        if not es_alcoholica(producto):
+            return
+        codigo = str(producto.get('code') or '').strip()[:50]
+        nombre = (producto.get('product_name') or producto.get('product_name_es')
+                  or producto.get('product_name_en') or '').strip()[:200]
+        if not codigo or not nombre:
+            self.estadisticas['invalidas'] += 1
+            return
+        self.estadisticas['alcoholicas'] += 1
+        tags = [t for t in producto.get('categories_tags') or [] if t != CATEGORIA_ALCOHOL]
+        # El último tag es el más específico (en:beverages, en:spirits, en:whiskies)
+        self._lote[codigo] = {
+            'codigo': codigo,
+            'nombre': nombre,
+            'marca': nombre_marca_off(producto.get('brands'))[:100],
+            'categoria': nombre_categoria_off(tags[-1] if tags else CATEGORIA_ALCOHOL)[:100],
+            'grados_alcohol': _grados(producto),
+            'url_imagen_externa': (producto.get('image_url') or producto.get('image_front_url') or '')[:500] or None,
+            'origen': (producto.get('origins') or '').split(',')[0].strip()[:100] or None,
+            'descripcion_tecnica': producto.get('categories') or None,
+        }
+
+    def _resolver(self, modelo, cache, nombres):
+        faltantes = {n for n in nombres if n not in cache}
+        if faltantes:
+            modelo.objects.bulk_create([modelo(nombre=n) for n in faltantes], ignore_conflicts=True)
+            cache.update(modelo.objects.filter(nombre__in=faltantes).values_list('nombre', 'id'))
+
+    def confirmar(self, offset):
+        """Escribe el lote pendiente y guarda el checkpoint en `offset`"""
+        from .models import Categorias, Marcas, Productos
+
+        filas, self._lote = list(self._lote.values()), {}
+        if filas:
+            with transaction.atomic():
+                self._resolver(Marcas, self.marcas, {f['marca'] for f in filas})
+                self._resolver(Categorias, self.categorias, {f['categoria'] for f in filas})
+
+                productos, claves = [], {}
+                for fila in filas:
+                    marca_id = self.marcas[fila['marca']]
+                    clave = (fila['nombre'], marca_id)
+                    # claves: las ya tomadas por este mismo lote, que aún no está confirmado
+                    duenio = claves[clave] if clave in claves else self._codigo_de.get(clave, fila['codigo'])
+                    if duenio != fila['codigo']:
+                        self.estadisticas['omitidos'] += 1
+                        continue
+                    claves[clave] = fila['codigo']
+                    productos.append(Productos(
+                        codigo_barras=fila['codigo'], nombre=fila['nombre'], marca_id=marca_id,
+                        categoria_id=self.categorias[fila['categoria']], grados_alcohol=fila['grados_alcohol'],
+                        url_imagen_externa=fila['url_imagen_externa'], origen=fila['origen'],
+                        descripcion_tecnica=fila['descripcion_tecnica'],
+                        precio=Decimal(str(get_default_price(fila['categoria']))), stock=0,
+                    ))
+
+                codigos = [p.codigo_barras for p in productos]
+                existentes = set(Productos.objects.filter(codigo_barras__in=codigos)
+                                 .values_list('codigo_barras', flat=True))
+                Productos.objects.bulk_create(productos, batch_size=self.batch_size, update_conflicts=True,
+                                              unique_fields=['codigo_barras'], update_fields=CAMPOS_ACTUALIZABLES)
+                busqueda.indexar_productos(Productos.objects.filter(codigo_barras__in=codigos)
+                                           .select_related('marca', 'categoria'))
+                self.estadisticas['actualizados'] += len(existentes)
+                self.estadisticas['creados'] += len(productos) - len(existentes)
+
+            # Solo tras el commit: si el lote se revierte, los mapas siguen reflejando la base
+            for clave, codigo in claves.items():
+                anterior = self._clave_de.get(codigo)
+                if anterior and anterior != clave:
+                    self._codigo_de.pop(anterior, None)
+                self._clave_de[codigo] = clave
+                self._codigo_de[clave] = codigo
+            fragmentos.invalidar()
+
+        if self.checkpoint:
+            self.checkpoint.guardar(offset, self.estadisticas)
+        if self.progreso:
+            self.progreso(offset, self.estadisticas, time.monotonic() - self._inicio)
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from licoreria import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Siembra una tienda sintética en una base de datos de prueba y mide catálogo, carrito, checkout, '
+            'dashboard y ficha de cliente (p50/p95/p99, consultas por petición y throughput)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1.0,
+                            help='Factor sobre 10k productos, 5k clientes, 50k órdenes, 5k recompensas y 2k multas')
+        parser.add_argument('--iteraciones', type=int, default=20,
+                            help='Vueltas de cada escenario (por hilo en modo http)')
+        parser.add_argument('--concurrencia', type=int, default=8, help='Hilos del modo http')
+        parser.add_argument('--modo', choices=['proceso', 'http', 'ambos'], default='ambos',
+                            help='proceso: cliente de pruebas de Django; http: peticiones reales concurrentes')
+        parser.add_argument('--escenarios', nargs='+', choices=list(benchmark.ESCENARIOS),
+                            default=list(benchmark.ESCENARIOS))
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--baseline', type=Path, default=settings.BASE_DIR / 'benchmarks' / 'baseline.json',
+                            help='JSON contra el que se comparan los resultados')
+        parser.add_argument('--guardar-baseline', action='store_true',
+                            help='Guarda estos resultados como nuevo baseline')
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help='Aumento de p95 (o caída de throughput) tolerado antes de marcar regresión')
+
+    def handle(self, *args, **options):
+        # Igual que el runner de pruebas: sin DEBUG (no acumula connection.queries) y en una base aparte
+        settings.DEBUG = False
+        config = connection.settings_dict
+        if connection.vendor == 'sqlite' and not config['TEST'].get('NAME'):
+            # En archivo y no en memoria: los hilos del servidor HTTP abren sus propias conexiones
+            config['TEST']['NAME'] = str(settings.BASE_DIR / 'benchmark.sqlite3')
+        nombre_original = config['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        volumenes = benchmark.escalar(options['escala'])
+        reportes = {}
+        try:
+            self.stdout.write(f"Sembrando: {', '.join(f'{v} {k}' for k, v in volumenes.items())}")
+            ctx = benchmark.sembrar(volumenes, options['semilla'], usuarios=max(options['concurrencia'], 1))
+
+            if options['modo'] in ('proceso', 'ambos'):
+                reportes['proceso'] = benchmark.en_proceso(
+                    ctx, options['escenarios'], options['iteraciones'], options['semilla'])
+            if options['modo'] in ('http', 'ambos'):
+                reportes['http'] = benchmark.por_http(
+                    ctx, options['escenarios'], options['iteraciones'], options['concurrencia'], options['semilla'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        for modo, reporte in reportes.items():
+            self._imprimir(modo, reporte)
+
+        resultado = {'escala': options['escala'], 'concurrencia': options['concurrencia'], **reportes}
+        base = benchmark.cargar(options['baseline'])
+        regresiones = []
+        if base and base.get('escala') == options['escala'] and base.get('concurrencia') == options['concurrencia']:
+            for modo, reporte in reportes.items():
+                if modo in base:
+                    regresiones += [f"[{modo}] {r}" for r in benchmark.comparar(reporte, base[modo], options['tolerancia'])]
+        elif base:
+            self.stdout.write(self.style.WARNING("El baseline es de otra escala o concurrencia; no se compara"))
+
+        if options['guardar_baseline']:
+            benchmark.guardar(resultado, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {options['baseline']}"))
+
+        if regresiones:
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(regresion))
+            if not options['guardar_baseline']:
+                raise CommandError(f"{len(regresiones)} regresiones contra {options['baseline']}")
+        elif base:
+            self.stdout.write(self.style.SUCCESS("Sin regresiones contra el baseline"))
+
+    def _imprimir(self, modo, reporte):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n[{modo}] {reporte['peticiones']} peticiones en {reporte['segundos']} s "
+            f"({reporte['throughput_rps']} req/s)"))
+        self.stdout.write(f"{'paso':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'consultas':>11}")
+        for paso, datos in reporte['pasos'].items():
+            consultas = '-' if datos['consultas'] is None else datos['consultas']
+            self.stdout.write(f"{paso:<24}{datos['peticiones']:>6}{datos['p50_ms']:>10}{datos['p95_ms']:>10}"
+                              f"{datos['p99_ms']:>10}{consultas:>11}")
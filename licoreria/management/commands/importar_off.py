@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from licoreria import importacion_off
+from licoreria.utils import log_action
+
+
+class Command(BaseCommand):
+    help = ('Importa las bebidas alcohólicas de un volcado de Open Food Facts (JSONL o CSV, también .gz) '
+            'por lotes, con checkpoints para reanudar')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='openfoodfacts-products.jsonl[.gz] o en.openfoodfacts.org.products.csv[.gz]')
+        parser.add_argument('--formato', choices=['jsonl', 'csv'], help='Por defecto se deduce de la extensión')
+        parser.add_argument('--delimitador', default='\t', help='Separador del CSV (el de OFF usa tabuladores)')
+        parser.add_argument('--lote', type=int, default=2000, help='Productos por upsert')
+        parser.add_argument('--checkpoint', help='Archivo de checkpoint (por defecto <archivo>.checkpoint.json)')
+        parser.add_argument('--reanudar', action='store_true', help='Continúa desde el último checkpoint')
+        parser.add_argument('--limite', type=int, help='Máximo de líneas a leer (para pruebas)')
+
+    def handle(self, *args, **options):
+        ruta = Path(options['archivo'])
+        if not ruta.exists():
+            raise CommandError(f"No existe {ruta}")
+
+        checkpoint = importacion_off.Checkpoint(options['checkpoint'] or f"{ruta}.checkpoint.json", ruta)
+        desde, estadisticas = 0, None
+        if options['reanudar']:
+            try:
+                desde, estadisticas = checkpoint.cargar()
+            except ValueError as e:
+                raise CommandError(str(e))
+            if desde:
+                self.stdout.write(f"Reanudando desde el byte {desde}")
+
+        # Tamaño descomprimido desconocido en .gz: el avance se muestra solo para archivos planos
+        tamano = ruta.stat().st_size if ruta.suffix != '.gz' else None
+
+        leidas_antes = (estadisticas or {}).get('lineas', 0)
+
+        def progreso(offset, stats, segundos):
+            avance = f" ({offset * 100 / tamano:.0f}%)" if tamano else ''
+            self.stdout.write(
+                f"  {stats['lineas']} líneas{avance}: {stats['creados']} nuevos, {stats['actualizados']} actualizados, "
+                f"{stats['omitidos']} omitidos, {stats['invalidas']} inválidas — {(stats['lineas'] - leidas_antes) / max(segundos, 1e-6):.0f} líneas/s"
+            )
+
+        importador = importacion_off.ImportadorOFF(batch_size=options['lote'], checkpoint=checkpoint, progreso=progreso)
+        if estadisticas:
+            importador.estadisticas.update(estadisticas)
+        stats = importador.importar(ruta, desde, options['formato'], options['delimitador'], options['limite'])
+
+        if not options['limite']:
+            checkpoint.borrar()
+        log_action(None, f"Importó volcado OFF: {ruta.name}", "Productos",
+                   detalles=', '.join(f"{k}: {v}" for k, v in stats.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {stats['creados']} productos nuevos y {stats['actualizados']} actualizados "
+            f"de {stats['alcoholicas']} bebidas alcohólicas"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from licoreria import busqueda
+from licoreria.models import Cocteles, Productos
+
+
+class Command(BaseCommand):
+    help = 'Regenera el índice de búsqueda de texto completo de Productos y Cócteles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Cantidad de documentos insertados por lote')
+
+    def handle(self, *args, **options):
+        if not busqueda.soportado():
+            raise CommandError(f"El motor '{connection.vendor}' no tiene índice de búsqueda (se usa icontains)")
+
+        with transaction.atomic():
+            busqueda.crear_indice(connection)
+            total = busqueda.reconstruir(Productos.objects, Cocteles.objects, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido: {total} documentos"))
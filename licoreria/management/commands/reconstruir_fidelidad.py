@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from licoreria.models import Clientes, LibroFidelidad
+
+
+class Command(BaseCommand):
+    help = 'Reconcilia el Libro de Fidelidad de cada cliente contra Ordenes, Recompensas y Multas'
+
+    CAMPOS = ('total_gastado', 'puntos_canjeados', 'deuda_ordenes', 'deuda_multas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reporta las diferencias, sin escribir en la base de datos')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Tamaño de lote para bulk_create/bulk_update')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+
+        # Una consulta agrupada por tabla para todos los clientes
+        saldos = LibroFidelidad.calcular_saldos()
+        libros = {l.cliente_id: l for l in LibroFidelidad.objects.all()}
+
+        nuevos, modificados = [], []
+        ahora = timezone.now()
+        for cliente_id in Clientes.objects.values_list('id', flat=True).iterator():
+            esperado = saldos.get(cliente_id, LibroFidelidad.saldo_vacio())
+            libro = libros.get(cliente_id)
+            if libro is None:
+                nuevos.append(LibroFidelidad(cliente_id=cliente_id, fecha_actualizacion=ahora, **esperado))
+                continue
+
+            diferencias = [c for c in self.CAMPOS if getattr(libro, c) != esperado[c]]
+            if diferencias:
+                self.stdout.write(f"Cliente #{cliente_id}: " + ", ".join(
+                    f"{c} {getattr(libro, c)} -> {esperado[c]}" for c in diferencias))
+                for campo in self.CAMPOS:
+                    setattr(libro, campo, esperado[campo])
+                libro.fecha_actualizacion = ahora
+                modificados.append(libro)
+
+        if not dry_run:
+            with transaction.atomic():
+                LibroFidelidad.objects.bulk_create(nuevos, batch_size=batch_size)
+                LibroFidelidad.objects.bulk_update(
+                    modificados, list(self.CAMPOS) + ['fecha_actualizacion'], batch_size=batch_size)
+
+        prefijo = '[DRY-RUN] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}Libros creados: {len(nuevos)}, corregidos: {len(modificados)}"))
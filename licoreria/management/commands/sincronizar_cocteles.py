@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from licoreria import sincronizacion_cocteles
+from licoreria.utils import log_action
+
+
+class Command(BaseCommand):
+    help = ('Sincroniza los cócteles con el índice a-z de TheCocktailDB (peticiones concurrentes con límite de tasa; '
+            'retoma desde el checkpoint si la ejecución anterior no terminó)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=4, help='Peticiones simultáneas')
+        parser.add_argument('--por-segundo', type=float, default=5, help='Máximo de peticiones por segundo (0: sin límite)')
+        parser.add_argument('--letras', default=sincronizacion_cocteles.LETRAS,
+                            help='Letras del índice a recorrer (p. ej. "abc" o "abcdefghijklmnopqrstuvwxyz0123456789")')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / 'sincronizar_cocteles.checkpoint.json'))
+        parser.add_argument('--desde-cero', action='store_true', help='Ignora el checkpoint y recorre todas las letras')
+        parser.add_argument('--url', help='URL base alternativa (p. ej. la del stub: manage.py stub_apis)')
+
+    def handle(self, *args, **options):
+        if options['concurrencia'] < 1:
+            raise CommandError('--concurrencia debe ser al menos 1')
+
+        checkpoint = sincronizacion_cocteles.CheckpointLetras(options['checkpoint'])
+        if options['desde_cero']:
+            checkpoint.borrar()
+
+        def progreso(letras, stats, segundos):
+            self.stdout.write(
+                f"  {','.join(letras) or '-'}: {stats['letras']} letras, {stats['recibidos']} tragos "
+                f"({stats['creados']} nuevos, {stats['actualizados']} actualizados, {stats['sin_cambios']} sin cambios) "
+                f"en {segundos:.1f}s"
+            )
+
+        with override_settings(**({'COCKTAILDB_BASE_URL': options['url']} if options['url'] else {})):
+            sincronizador = sincronizacion_cocteles.SincronizadorCocteles(
+                concurrencia=options['concurrencia'], por_segundo=options['por_segundo'],
+                checkpoint=checkpoint, progreso=progreso,
+            )
+            if sincronizador.completadas:
+                self.stdout.write(f"Retomando: {len(sincronizador.completadas)} letras ya sincronizadas")
+            stats = sincronizador.sincronizar(options['letras'])
+
+        log_action(None, "Sincronizó cócteles con TheCocktailDB", "Cócteles",
+                   detalles=', '.join(f"{k}: {v}" for k, v in stats.items()))
+        if sincronizador.fallidas:
+            raise CommandError(f"Fallaron las letras {','.join(sincronizador.fallidas)}; "
+                               "vuelve a ejecutar el comando para reintentarlas")
+        checkpoint.borrar()
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {stats['creados']} cócteles nuevos, {stats['actualizados']} actualizados, "
+            f"{stats['sin_cambios']} sin cambios"
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from licoreria.stub_apis import ServidorStub, catalogo_sintetico
+
+
+class Command(BaseCommand):
+    help = ('Levanta un servidor local con las formas de Open Food Facts y TheCocktailDB '
+            '(catálogo sintético, latencia y errores configurables)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--productos', type=int, default=200, help='Productos del catálogo OFF sintético')
+        parser.add_argument('--cocteles', type=int, default=120, help='Tragos del catálogo sintético')
+        parser.add_argument('--latencia', type=float, default=0, help='Milisegundos de espera por respuesta')
+        parser.add_argument('--variacion', type=float, default=0, help='± milisegundos aleatorios sobre la latencia')
+        parser.add_argument('--tasa-error', type=float, default=0, help='Fracción de respuestas con error (0-1)')
+        parser.add_argument('--status-error', type=int, default=503)
+        parser.add_argument('--tasa-cuelgue', type=float, default=0,
+                            help='Fracción de respuestas que tardan --cuelgue segundos (para probar timeouts)')
+        parser.add_argument('--cuelgue', type=float, default=30)
+        parser.add_argument('--semilla', type=int, default=7)
+
+    def handle(self, *args, **options):
+        stub = ServidorStub(
+            catalogo=catalogo_sintetico(options['productos'], options['cocteles'], options['semilla']),
+            latencia=options['latencia'] / 1000, variacion=options['variacion'] / 1000,
+            tasa_error=options['tasa_error'], status_error=options['status_error'],
+            tasa_cuelgue=options['tasa_cuelgue'], cuelgue=options['cuelgue'],
+            semilla=options['semilla'], host=options['host'], puerto=options['puerto'],
+        )
+        with stub:
+            self.stdout.write(self.style.SUCCESS(f"Stub de APIs en {stub.url}"))
+            self.stdout.write(f"  OFF_BASE_URL={stub.url} COCKTAILDB_BASE_URL={stub.url} python manage.py runserver")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(', '.join(f"{ruta}: {n}" for ruta, n in sorted(stub.llamadas.items())) or 'Sin llamadas')
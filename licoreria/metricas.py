@@ -0,0 +1,188 @@
+"""
+Métricas por vista: consultas SQL, tiempo en SQL, tiempo de render de
+plantillas y latencia total de cada petición, agrupadas por nombre de URL.
+
+MetricasMiddleware (el primero de MIDDLEWARE) mide cada petición con medir():
+- las consultas se cuentan con un execute_wrapper instalado en todas las
+  conexiones (contar_consultas), que suma a la medición de la ContextVar
+  actual. Como sync_to_async copia el contexto al hilo donde corre, también
+  se cuentan las consultas que las vistas asíncronas hacen desde otros hilos,
+- el render se mide con el backend de plantillas PlantillasMedidas (solo la
+  plantilla de nivel superior: los include quedan dentro de su tiempo),
+- al terminar se guarda la muestra en el registro del proceso.
+
+El registro conserva las últimas WINDOW muestras de cada vista; resumen() da
+promedios, percentiles y un histograma de latencias sobre esa ventana, que
+la vista metricas_vistas devuelve como JSON. Con ENABLED = False el
+middleware no mide nada.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+CONFIG_DEFAULT = {
+    'ENABLED': True,
+    'WINDOW': 500,
+    'BUCKETS_MS': [10, 25, 50, 100, 250, 500, 1000, 2500],
+}
+
+_actual = ContextVar('medicion_actual', default=None)
+
+
+def config():
+    return {**CONFIG_DEFAULT, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class Medicion:
+    """Contadores de una petición; lo que suma también se suma a la medición que la contiene (`padre`)"""
+
+    def __init__(self, padre=None):
+        self.padre = padre
+        self.consultas = 0
+        self.sql_ms = 0.0
+        self.plantillas_ms = 0.0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()  # una vista asíncrona puede consultar desde varios hilos
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sumar(consultas=1, sql_ms=(time.perf_counter() - inicio) * 1000)
+
+    def sumar(self, consultas=0, sql_ms=0.0, plantillas_ms=0.0):
+        medicion = self
+        while medicion is not None:
+            with medicion._lock:
+                medicion.consultas += consultas
+                medicion.sql_ms += sql_ms
+                medicion.plantillas_ms += plantillas_ms
+            medicion = medicion.padre
+
+
+def contar_consultas(execute, sql, params, many, context):
+    """execute_wrapper permanente: suma a la medición en curso del contexto, si la hay"""
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def instalar(conexion):
+    # Al principio de la lista: execute_wrapper() de Django saca con pop() el último
+    if contar_consultas not in conexion.execute_wrappers:
+        conexion.execute_wrappers.insert(0, contar_consultas)
+
+
+def _al_conectar(sender, connection, **kwargs):
+    instalar(connection)
+
+
+connection_created.connect(_al_conectar, dispatch_uid='metricas_contar_consultas')
+
+
+class RegistroMetricas:
+    """Ventana de las últimas muestras por vista, compartida por los hilos del proceso"""
+
+    def __init__(self):
+        self._muestras = defaultdict(lambda: deque(maxlen=config()['WINDOW']))
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, medicion):
+        with self._lock:
+            self._muestras[vista].append(
+                (medicion.consultas, medicion.sql_ms, medicion.plantillas_ms, medicion.total_ms))
+
+    def limpiar(self):
+        with self._lock:
+            self._muestras.clear()
+
+    def resumen(self):
+        """{vista: estadísticas} de la ventana actual"""
+        with self._lock:
+            copia = {vista: list(muestras) for vista, muestras in self._muestras.items()}
+        buckets = config()['BUCKETS_MS']
+        return {vista: _estadisticas(muestras, buckets) for vista, muestras in sorted(copia.items())}
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _estadisticas(muestras, buckets):
+    n = len(muestras)
+    consultas, sql_ms, plantillas_ms, total_ms = zip(*muestras)
+    latencias = sorted(total_ms)
+
+    histograma = {f"<={limite}": 0 for limite in buckets}
+    histograma[f">{buckets[-1]}"] = 0
+    for valor in total_ms:
+        limite = next((b for b in buckets if valor <= b), None)
+        histograma[f"<={limite}" if limite is not None else f">{buckets[-1]}"] += 1
+
+    return {
+        'peticiones': n,
+        'consultas_promedio': round(sum(consultas) / n, 2),
+        'consultas_max': max(consultas),
+        'sql_ms_promedio': round(sum(sql_ms) / n, 2),
+        'plantillas_ms_promedio': round(sum(plantillas_ms) / n, 2),
+        'total_ms_promedio': round(sum(total_ms) / n, 2),
+        'total_ms_p50': round(_percentil(latencias, 0.5), 2),
+        'total_ms_p95': round(_percentil(latencias, 0.95), 2),
+        'total_ms_max': round(latencias[-1], 2),
+        'histograma_ms': histograma,
+    }
+
+
+registro = RegistroMetricas()
+
+
+def nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+@contextmanager
+def medir():
+    """Mide lo que se ejecute dentro del bloque (y en los hilos que hereden su contexto): consultas, render y tiempo total"""
+    for conexion in connections.all(initialized_only=True):
+        instalar(conexion)  # conexiones abiertas antes de importar este módulo
+    medicion = Medicion(padre=_actual.get())
+    token = _actual.set(medicion)
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        _actual.reset(token)
+        medicion.total_ms = (time.perf_counter() - inicio) * 1000
+
+
+class PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.sumar(plantillas_ms=(time.perf_counter() - inicio) * 1000)
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """Backend DjangoTemplates que suma a la medición actual el tiempo de render"""
+
+    def from_string(self, template_code):
+        return PlantillaMedida(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        plantilla = super().get_template(template_name)
+        return PlantillaMedida(plantilla.template, self)
@@ -0,0 +1,80 @@
+"""
+Middleware propios. Todos aceptan los dos modos (sync_capable y async_capable):
+bajo ASGI, si un solo middleware de la pila fuera solo síncrono, Django correría
+cada petición en un hilo para emular la pila síncrona y las vistas asíncronas de
+api_views dejarían de liberar el worker mientras esperan a la API externa.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.functional import SimpleLazyObject
+
+from . import auditoria, metricas, roles
+
+
+class MiddlewareDual:
+    """Base: __call__ en modo síncrono, __acall__ si el resto de la pila es asíncrona"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.procesar(request)
+
+
+class AuditoriaMiddleware(MiddlewareDual):
+    """Al terminar cada petición guarda las entradas de auditoría que quedaron en el buffer"""
+
+    def procesar(self, request):
+        response = self.get_response(request)
+        if len(auditoria.buffer):
+            auditoria.flush()
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if len(auditoria.buffer):
+            await sync_to_async(auditoria.flush)()
+        return response
+
+
+class RolesMiddleware(MiddlewareDual):
+    """Deja en request.roles los grupos del usuario; se consultan (o leen de caché) la primera vez que se usan"""
+
+    def procesar(self, request):
+        request.roles = SimpleLazyObject(lambda: roles.grupos_de(request.user))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.roles = SimpleLazyObject(lambda: roles.grupos_de(request.user))
+        return await self.get_response(request)
+
+
+class MetricasMiddleware(MiddlewareDual):
+    """Registra consultas SQL, render y latencia de cada petición bajo el nombre de su URL"""
+
+    def procesar(self, request):
+        if not metricas.config()['ENABLED']:
+            return self.get_response(request)
+        with metricas.medir() as medicion:
+            response = self.get_response(request)
+        self._registrar(request, medicion)
+        return response
+
+    async def __acall__(self, request):
+        if not metricas.config()['ENABLED']:
+            return await self.get_response(request)
+        with metricas.medir() as medicion:
+            response = await self.get_response(request)
+        self._registrar(request, medicion)
+        return response
+
+    @staticmethod
+    def _registrar(request, medicion):
+        vista = metricas.nombre_vista(request)
+        if vista:
+            metricas.registro.registrar(vista, medicion)
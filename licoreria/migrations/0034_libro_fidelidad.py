@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licoreria', '0033_multas_orden'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibroFidelidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_gastado', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Total gastado (órdenes pagadas)')),
+                ('puntos_canjeados', models.IntegerField(default=0, verbose_name='Puntos canjeados')),
+                ('deuda_ordenes', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Deuda en órdenes no pagadas')),
+                ('deuda_multas', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Deuda en multas pendientes')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='libro_fidelidad', to='licoreria.clientes')),
+            ],
+            options={
+                'verbose_name': 'Libro de Fidelidad',
+                'verbose_name_plural': 'Libros de Fidelidad',
+            },
+        ),
+    ]
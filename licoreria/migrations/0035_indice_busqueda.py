@@ -0,0 +1,72 @@
+import unicodedata
+
+from django.db import migrations
+
+# Copia fija del esquema y del llenado inicial de licoreria/busqueda.py: la migración
+# no debe cambiar si ese módulo cambia después.
+TABLA = 'licoreria_busqueda'
+PESOS = ['A', 'B', 'C', 'D']  # nombre, marca, categoría, ingredientes
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def documentos(apps):
+    Productos = apps.get_model('licoreria', 'Productos')
+    Cocteles = apps.get_model('licoreria', 'Cocteles')
+    for producto in Productos.objects.select_related('marca', 'categoria').iterator(chunk_size=1000):
+        yield ('producto', producto.pk, producto.nombre,
+               producto.marca.nombre if producto.marca_id else '',
+               producto.categoria.nombre if producto.categoria_id else '', '')
+    for coctel in Cocteles.objects.iterator(chunk_size=1000):
+        yield ('coctel', coctel.pk, coctel.nombre, '', coctel.categoria or '', coctel.ingredientes or '')
+
+
+def crear_y_poblar(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        crear = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+            "tipo UNINDEXED, objeto_id UNINDEXED, nombre, marca, categoria, ingredientes, "
+            "tokenize = 'unicode61 remove_diacritics 2')",
+        ]
+        insertar = (f"INSERT INTO {TABLA} (tipo, objeto_id, nombre, marca, categoria, ingredientes) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)")
+        fila = list
+    elif connection.vendor == 'postgresql':
+        crear = [
+            f"CREATE TABLE IF NOT EXISTS {TABLA} ("
+            "tipo varchar(10) NOT NULL, objeto_id bigint NOT NULL, documento tsvector NOT NULL, "
+            "PRIMARY KEY (tipo, objeto_id))",
+            f"CREATE INDEX IF NOT EXISTS {TABLA}_documento ON {TABLA} USING GIN (documento)",
+        ]
+        vector = ' || '.join(f"setweight(to_tsvector('spanish', %s), '{peso}')" for peso in PESOS)
+        insertar = f"INSERT INTO {TABLA} (tipo, objeto_id, documento) VALUES (%s, %s, {vector})"
+        fila = lambda d: [d[0], d[1], *[normalizar(v) for v in d[2:]]]
+    else:
+        return  # Otros motores buscan con icontains
+
+    with connection.cursor() as cursor:
+        for sql in crear:
+            cursor.execute(sql)
+        cursor.execute(f"DELETE FROM {TABLA}")
+        cursor.executemany(insertar, [fila(d) for d in documentos(apps)])
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licoreria', '0034_libro_fidelidad'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_y_poblar, borrar),
+    ]
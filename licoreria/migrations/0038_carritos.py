@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licoreria', '0037_reservas_stock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Carrito',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(blank=True, help_text='Token del carrito anónimo', max_length=32, null=True, unique=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('usuario', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='carrito', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Carrito',
+                'verbose_name_plural': 'Carritos',
+            },
+        ),
+        migrations.CreateModel(
+            name='CarritoItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=3)),
+                ('item_id', models.PositiveIntegerField()),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('carrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='licoreria.carrito')),
+            ],
+            options={
+                'verbose_name': 'Ítem de Carrito',
+                'verbose_name_plural': 'Ítems de Carrito',
+                'unique_together': {('carrito', 'tipo', 'item_id')},
+            },
+        ),
+    ]
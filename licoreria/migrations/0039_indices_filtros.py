@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licoreria', '0038_carritos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-fecha', '-id'], name='auditlog_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='multas',
+            index=models.Index(condition=models.Q(('pagada', False)), fields=['cliente'], name='multa_impaga_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenes',
+            index=models.Index(fields=['cliente', 'estado', '-fecha'], name='orden_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenes',
+            index=models.Index(fields=['estado', '-fecha'], name='orden_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenes',
+            index=models.Index(condition=models.Q(('pagada', True)), fields=['fecha'], name='orden_pagada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenes',
+            index=models.Index(condition=models.Q(('pagada', False)), fields=['estado'], name='orden_impaga_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productos',
+            index=models.Index(fields=['stock'], name='producto_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recompensas',
+            index=models.Index(fields=['cliente', 'estado_solicitud', 'utilizada'], name='recompensa_cliente_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licoreria', '0039_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recompensas',
+            name='tipo',
+            field=models.CharField(choices=[('PUN', 'Puntos'), ('DES', 'Descuento'), ('REG', 'Regalo/Producto Gratis'), ('BON', 'Bono Especial'), ('POR', 'Descuento Porcentual')], default='PUN', max_length=3, verbose_name='Tipo de Recompensa'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Categorias(models.Model):
     nombre = models.CharField(max_length=100, unique=True, verbose_name="Nombre de la Categoría")
@@ -33,10 +34,17 @@ class Productos(models.Model):
     origen = models.CharField(max_length=100, blank=True, null=True, verbose_name="País de Origen")
     descripcion_tecnica = models.TextField(blank=True, null=True, verbose_name="Descripción OFF")
 
+    # Control optimista de concurrencia sobre el stock (ver reservas.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         unique_together = ('nombre', 'marca')
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        indexes = [
+            # Conteo de stock bajo del dashboard (índice cubriente de Sum/Count sobre stock)
+            models.Index(fields=['stock'], name='producto_stock_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -52,6 +60,7 @@ class Cocteles(models.Model):
     stock = models.PositiveIntegerField(default=0, verbose_name="Stock disponible")
     precio = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.nombre
@@ -73,11 +82,16 @@ class Clientes(models.Model):
             self.codigo_unico = str(uuid.uuid4())[:8].upper()
         super().save(*args, **kwargs)
     
+    def obtener_libro(self):
+        """Devuelve el libro de fidelidad del cliente, creándolo si aún no existe"""
+        try:
+            return self.libro_fidelidad
+        except LibroFidelidad.DoesNotExist:
+            return LibroFidelidad.reconstruir(self)
+
     def total_gastado(self):
-        """Calcula el total gastado en órdenes pagadas"""
-        from django.db.models import Sum
-        total = self.ordenes_set.filter(pagada=True).aggregate(Sum('total'))['total__sum'] or 0
-        return total
+        """Total gastado en órdenes pagadas (leído del libro de fidelidad)"""
+        return self.obtener_libro().total_gastado
 
     def aumentar_cupo(self, monto_compra):
         """
@@ -109,10 +123,13 @@ class Clientes(models.Model):
         return False
 
     def total_deuda_multas(self):
-        """Calcula la deuda total por multas pendientes, excluyendo las de órdenes ya pagadas"""
-        from django.db.models import Sum
-        # Filtramos multas no pagadas Y que no pertenezcan a una orden ya pagada
-        return self.multas.filter(pagada=False).exclude(orden__pagada=True).aggregate(total=Sum('monto'))['total'] or 0
+        """Deuda total por multas pendientes, excluyendo las de órdenes ya pagadas"""
+        return self.obtener_libro().deuda_multas
+
+    @property
+    def deuda_ordenes_pendientes(self):
+        """Suma de las órdenes aún no pagadas (préstamos y solicitudes)"""
+        return self.obtener_libro().deuda_ordenes
     
     @property
     def limite_credito_calculado(self):
@@ -132,13 +149,8 @@ class Clientes(models.Model):
 
     @property
     def puntos_canjeados_total(self):
-        """Calcula el total de puntos que ha canjeado el cliente"""
-        from django.db.models import Sum
-        # Sumar costo_puntos de recompensas que NO sean de tipo 'PUN' (si es que hay bonos) 
-        # o simplemente todas las recompensas solicitadas/canjeadas.
-        # Asumimos que 'recompensas' tiene un costo_puntos.
-        # Filtramos recompensas que costaron puntos.
-        return self.recompensas.aggregate(total=Sum('costo_puntos'))['total'] or 0
+        """Total de puntos que ha canjeado el cliente (suma de costo_puntos de sus recompensas)"""
+        return self.obtener_libro().puntos_canjeados
 
     @property
     def puntos_actuales_calculados(self):
@@ -148,6 +160,94 @@ class Clientes(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.codigo_unico})"
 
+class LibroFidelidad(models.Model):
+    """
+    Saldos materializados de fidelidad y crédito por cliente.
+    Se mantiene desde signals.py al guardar/borrar Ordenes, Recompensas y Multas,
+    y se puede reconciliar con `manage.py reconstruir_fidelidad`.
+    """
+    cliente = models.OneToOneField(Clientes, on_delete=models.CASCADE, related_name='libro_fidelidad')
+    total_gastado = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Total gastado (órdenes pagadas)")
+    puntos_canjeados = models.IntegerField(default=0, verbose_name="Puntos canjeados")
+    deuda_ordenes = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Deuda en órdenes no pagadas")
+    deuda_multas = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Deuda en multas pendientes")
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Libro de Fidelidad"
+        verbose_name_plural = "Libros de Fidelidad"
+
+    @staticmethod
+    def calcular_saldos(cliente_ids=None):
+        """
+        Calcula los saldos a partir de las tablas originales.
+        Retorna {cliente_id: {campo: valor}} usando una consulta agrupada por tabla.
+        """
+        from decimal import Decimal
+        from django.db.models import Q, Sum
+
+        ordenes = Ordenes.objects.all()
+        recompensas = Recompensas.objects.all()
+        multas = Multas.objects.filter(pagada=False).exclude(orden__pagada=True)
+        if cliente_ids is not None:
+            ordenes = ordenes.filter(cliente_id__in=cliente_ids)
+            recompensas = recompensas.filter(cliente_id__in=cliente_ids)
+            multas = multas.filter(cliente_id__in=cliente_ids)
+
+        saldos = {}
+        def saldo(cliente_id):
+            return saldos.setdefault(cliente_id, LibroFidelidad.saldo_vacio())
+
+        for fila in ordenes.order_by().values('cliente_id').annotate(
+                gastado=Sum('total', filter=Q(pagada=True)),
+                deuda=Sum('total', filter=Q(pagada=False))):
+            s = saldo(fila['cliente_id'])
+            s['total_gastado'] = fila['gastado'] or Decimal('0.00')
+            s['deuda_ordenes'] = fila['deuda'] or Decimal('0.00')
+
+        for fila in recompensas.order_by().values('cliente_id').annotate(canjeados=Sum('costo_puntos')):
+            saldo(fila['cliente_id'])['puntos_canjeados'] = fila['canjeados'] or 0
+
+        for fila in multas.order_by().values('cliente_id').annotate(deuda=Sum('monto')):
+            saldo(fila['cliente_id'])['deuda_multas'] = fila['deuda'] or Decimal('0.00')
+
+        return saldos
+
+    @staticmethod
+    def saldo_vacio():
+        from decimal import Decimal
+        return {
+            'total_gastado': Decimal('0.00'),
+            'puntos_canjeados': 0,
+            'deuda_ordenes': Decimal('0.00'),
+            'deuda_multas': Decimal('0.00'),
+        }
+
+    @classmethod
+    def _saldos_cliente(cls, cliente_id):
+        return cls.calcular_saldos([cliente_id]).get(cliente_id, cls.saldo_vacio())
+
+    @classmethod
+    def reconstruir(cls, cliente):
+        """Recalcula (o crea) el libro de un cliente y lo deja cacheado en la instancia"""
+        libro, _ = cls.objects.update_or_create(cliente=cliente, defaults=cls._saldos_cliente(cliente.pk))
+        cliente.libro_fidelidad = libro
+        return libro
+
+    @classmethod
+    def actualizar(cls, cliente_id):
+        """
+        Refresca el libro existente de un cliente. No lo crea: si aún no existe,
+        se construirá al primer acceso desde Clientes.obtener_libro().
+        """
+        if cliente_id is None:
+            return
+        cls.objects.filter(cliente_id=cliente_id).update(
+            fecha_actualizacion=timezone.now(), **cls._saldos_cliente(cliente_id))
+
+    def __str__(self):
+        return f"Libro {self.cliente.nombre}: ${self.total_gastado} gastado"
+
 class Empleados(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     nombre = models.CharField(max_length=150)
@@ -202,6 +302,18 @@ class Ordenes(models.Model):
     codigo_orden = models.CharField(max_length=8, unique=True, editable=False, default=uuid.uuid4)
     # Relación con Productos se maneja a través de DetallesOrdenes
 
+    class Meta:
+        indexes = [
+            # mis_solicitudes, mis_prestamos, detalle_cliente: cliente + estado, más recientes primero
+            models.Index(fields=['cliente', 'estado', '-fecha'], name='orden_cliente_estado_idx'),
+            # Solicitudes y préstamos de todos los clientes
+            models.Index(fields=['estado', '-fecha'], name='orden_estado_fecha_idx'),
+            # Ventas por día del dashboard: rango de fechas sobre las pagadas
+            models.Index(fields=['fecha'], name='orden_pagada_fecha_idx', condition=models.Q(pagada=True)),
+            # Órdenes pendientes de pago: solo las impagas entran al índice
+            models.Index(fields=['estado'], name='orden_impaga_idx', condition=models.Q(pagada=False)),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.codigo_orden or len(self.codigo_orden) > 8:
              self.codigo_orden = uuid.uuid4().hex[:8].upper()
@@ -241,6 +353,60 @@ class DetallesOrdenes(models.Model):
     def __str__(self):
         return f"{self.descripcion} - ${self.monto}"
 
+
+class ReservaStock(models.Model):
+    """
+    Stock apartado temporalmente por un carrito durante el checkout.
+    Mientras no expira, ese stock no está disponible para otros carritos.
+    """
+    clave = models.CharField(max_length=64, db_index=True, help_text="Clave de sesión del carrito")
+    producto = models.ForeignKey(Productos, on_delete=models.CASCADE, null=True, blank=True, related_name='reservas')
+    coctel = models.ForeignKey(Cocteles, on_delete=models.CASCADE, null=True, blank=True, related_name='reservas')
+    cantidad = models.PositiveIntegerField()
+    expira_en = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Reserva de Stock"
+        verbose_name_plural = "Reservas de Stock"
+
+    def __str__(self):
+        item = self.producto or self.coctel
+        return f"{self.cantidad} x {item} (hasta {self.expira_en:%H:%M})"
+
+
+class Carrito(models.Model):
+    """
+    Carrito persistente (CART_STORE BACKEND 'db', ver almacen_carrito.py).
+    Pertenece a un usuario o, si es anónimo, a un token guardado en su sesión.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='carrito')
+    token = models.CharField(max_length=32, unique=True, null=True, blank=True, help_text="Token del carrito anónimo")
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Carrito"
+        verbose_name_plural = "Carritos"
+
+    def __str__(self):
+        return f"Carrito de {self.usuario or self.token}"
+
+
+class CarritoItem(models.Model):
+    """Una línea del carrito: tipo ('lic'/'coc') + id del ítem y su cantidad"""
+    carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='items')
+    tipo = models.CharField(max_length=3)
+    item_id = models.PositiveIntegerField()
+    cantidad = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('carrito', 'tipo', 'item_id')
+        verbose_name = "Ítem de Carrito"
+        verbose_name_plural = "Ítems de Carrito"
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.tipo}_{self.item_id}"
+
+
 class Recompensas(models.Model):
     """Modelo para gestionar recompensas y regalos por consumo del cliente"""
     TIPO_RECOMPENSA = [
@@ -284,6 +450,10 @@ class Recompensas(models.Model):
         verbose_name = "Recompensa"
         verbose_name_plural = "Recompensas"
         ordering = ['-fecha_otorgada']
+        indexes = [
+            # Recompensas activas / pendientes de un cliente
+            models.Index(fields=['cliente', 'estado_solicitud', 'utilizada'], name='recompensa_cliente_idx'),
+        ]
     
     def __str__(self):
         if self.solicitada_por_cliente:
@@ -309,6 +479,12 @@ class Multas(models.Model):
     pagada = models.BooleanField(default=False)
     fecha_pago = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Deuda en multas de LibroFidelidad.calcular_saldos: solo las impagas
+            models.Index(fields=['cliente'], name='multa_impaga_idx', condition=models.Q(pagada=False)),
+        ]
+
     def __str__(self):
         return f"Multa {self.get_tipo_display()} - {self.cliente.nombre}: ${self.monto}"
 
@@ -317,11 +493,16 @@ class AuditLog(models.Model):
     accion = models.CharField(max_length=255)
     modulo = models.CharField(max_length=100)
     detalles = models.TextField(blank=True, null=True)
-    fecha = models.DateTimeField(auto_now_add=True)
+    # default en lugar de auto_now_add: las entradas se guardan en lote y conservan la hora de la acción
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
     class Meta:
         ordering = ['-fecha']
+        indexes = [
+            # Listado de auditoría paginado por (-fecha, -id)
+            models.Index(fields=['-fecha', '-id'], name='auditlog_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.fecha.strftime('%Y-%m-%d %H:%M')}] {self.usuario} - {self.accion}"
@@ -0,0 +1,151 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+En lugar de OFFSET, cada página se pide "después de" (o "antes de") la última
+fila vista comparando contra las columnas de orden, p. ej. (-fecha, -id). Así el
+costo de una página no depende de cuán profundo esté en la tabla. El orden
+siempre debe terminar en una columna única (normalmente `id`) para desempatar.
+
+El cursor viaja en la URL (?despues=... / ?antes=...) como los valores de esas
+columnas en JSON codificado en base64. Las plantillas usan
+`licoreria/components/paginacion.html`.
+"""
+import base64
+import binascii
+import json
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+POR_PAGINA = 25
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _campos(orden):
+    """('-fecha', 'id') -> [('fecha', True), ('id', False)]"""
+    return [(c.lstrip('-'), c.startswith('-')) for c in orden]
+
+
+def _a_json(valor):
+    # isoformat() completo: DjangoJSONEncoder recorta los microsegundos y el cursor dejaría de ser exacto
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+def codificar_cursor(objeto, campos):
+    valores = [getattr(objeto, nombre) for nombre, _ in campos]
+    datos = json.dumps(valores, default=_a_json).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def _campo(queryset, nombre):
+    """Campo del modelo o, si es una anotación (p. ej. la relevancia de la búsqueda), su output_field"""
+    if nombre in queryset.query.annotations:
+        return queryset.query.annotations[nombre].output_field
+    return queryset.model._meta.get_field(nombre)
+
+
+def decodificar_cursor(cursor, queryset, campos):
+    try:
+        datos = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        valores = json.loads(datos)
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            raise CursorInvalido(cursor)
+        return [_campo(queryset, nombre).to_python(valor) for (nombre, _), valor in zip(campos, valores)]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, ValidationError) as e:
+        raise CursorInvalido(cursor) from e
+
+
+def filtro_keyset(campos, valores, hacia_adelante=True):
+    """(a, b) "después de" (x, y)  <=>  a > x OR (a = x AND b > y), según la dirección de cada columna"""
+    condicion = Q()
+    iguales = {}
+    for (nombre, descendente), valor in zip(campos, valores):
+        operador = 'lt' if descendente == hacia_adelante else 'gt'
+        condicion |= Q(**iguales, **{f"{nombre}__{operador}": valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+class Pagina:
+    """
+    Página de resultados. Se itera como el queryset original; `count` sigue siendo
+    el total del listado (las plantillas lo muestran) y `siguiente`/`anterior` son
+    los cursores de las páginas vecinas (None si no existen).
+    """
+
+    def __init__(self, items, queryset, siguiente=None, anterior=None, por_pagina=POR_PAGINA):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+        self.por_pagina = por_pagina
+        self._queryset = queryset
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @cached_property
+    def count(self):
+        return self._queryset.count()
+
+    @property
+    def tiene_siguiente(self):
+        return self.siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.anterior is not None
+
+
+def paginar(queryset, request, orden, por_pagina=POR_PAGINA):
+    """
+    Retorna la Página pedida en request.GET ('despues' o 'antes') de `queryset`
+    ordenado por `orden`. Un cursor inválido o manipulado lleva a la primera página.
+    """
+    campos = _campos(orden)
+    despues = request.GET.get('despues')
+    antes = request.GET.get('antes')
+
+    try:
+        if antes:
+            valores = decodificar_cursor(antes, queryset, campos)
+            invertido = [('' if c.startswith('-') else '-') + c.lstrip('-') for c in orden]
+            filas = list(queryset.filter(filtro_keyset(campos, valores, hacia_adelante=False))
+                         .order_by(*invertido)[:por_pagina + 1])
+            hay_mas = len(filas) > por_pagina
+            filas = filas[:por_pagina][::-1]
+            return Pagina(
+                filas, queryset,
+                siguiente=codificar_cursor(filas[-1], campos) if filas else None,
+                anterior=codificar_cursor(filas[0], campos) if hay_mas else None,
+                por_pagina=por_pagina,
+            )
+        if despues:
+            valores = decodificar_cursor(despues, queryset, campos)
+            queryset_pagina = queryset.filter(filtro_keyset(campos, valores))
+        else:
+            queryset_pagina = queryset
+    except CursorInvalido:
+        despues = None
+        queryset_pagina = queryset
+
+    filas = list(queryset_pagina.order_by(*orden)[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    return Pagina(
+        filas, queryset,
+        siguiente=codificar_cursor(filas[-1], campos) if hay_mas else None,
+        anterior=codificar_cursor(filas[0], campos) if despues and filas else None,
+        por_pagina=por_pagina,
+    )
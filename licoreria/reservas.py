@@ -0,0 +1,211 @@
+"""
+Reservas de stock y descuento concurrente durante el checkout.
+
+- previsualizar_factura llama a reservar(): aparta el stock del carrito durante
+  STOCK_RESERVATION_MINUTES. El stock disponible para los demás es
+  `stock - reservas vigentes de otros carritos`.
+- procesar_orden llama a descontar_stock(): un UPDATE condicional por modelo que
+  solo descuenta si alcanza el disponible, y luego liberar() las reservas.
+
+Concurrencia:
+- PostgreSQL (y cualquier motor con SELECT ... FOR UPDATE): se bloquean las
+  filas de Productos/Cocteles en orden de id antes de comprobar y reservar.
+- SQLite: no hay bloqueo por fila; se usa control optimista con la columna
+  `version`: se lee (stock, version), se comprueba y se incrementa la versión
+  solo si no cambió (`WHERE id = .. AND version = ..`). Si otro checkout se
+  adelantó, se reintenta. Agotados los reintentos se vuelve a comprobar el stock:
+  si no alcanza se lanza StockInsuficiente con la línea que falta, y si alcanza,
+  ReservaEnConflicto (el cliente puede volver a intentarlo).
+"""
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .carrito import MODELOS
+from .models import ReservaStock
+
+logger = logging.getLogger(__name__)
+
+REINTENTOS_OPTIMISTAS = 20
+
+# Campo de ReservaStock que apunta a cada modelo del carrito
+CAMPO_RESERVA = {
+    'lic': 'producto',
+    'coc': 'coctel',
+}
+
+
+class StockInsuficiente(Exception):
+    """Alguno de los ítems ya no tiene stock disponible suficiente"""
+
+    def __init__(self, item, disponibles=None):
+        self.item = item
+        self.disponibles = item.stock if disponibles is None else disponibles
+        super().__init__(f"Stock insuficiente para {item.nombre}. Disponibles: {self.disponibles}")
+
+
+class ReservaEnConflicto(Exception):
+    """Había stock, pero otros checkouts simultáneos sobre los mismos ítems no dejaron reservarlo"""
+
+    def __init__(self):
+        super().__init__("Hay muchas compras simultáneas de estos productos. Intenta de nuevo en unos segundos.")
+
+
+class _Conflicto(Exception):
+    """Otra transacción modificó las filas leídas (control optimista)"""
+
+
+def minutos_reserva():
+    return getattr(settings, 'STOCK_RESERVATION_MINUTES', 10)
+
+
+def usa_bloqueo_por_fila(modelo):
+    return connections[router.db_for_write(modelo)].features.has_select_for_update
+
+
+def _cantidades(lineas, tipo):
+    cantidades = {}
+    for linea in lineas:
+        if linea.tipo == tipo:
+            cantidades[linea.item_id] = cantidades.get(linea.item_id, 0) + linea.cantidad
+    return cantidades
+
+
+def _reservado_por_otros(tipo, clave, ahora):
+    """Subconsulta: unidades reservadas por otros carritos para la fila exterior"""
+    campo = CAMPO_RESERVA[tipo]
+    reservas = (ReservaStock.objects
+                .filter(**{campo: OuterRef('pk')}, expira_en__gt=ahora)
+                .exclude(clave=clave)
+                .order_by()
+                .values(campo)
+                .annotate(total=Sum('cantidad'))
+                .values('total'))
+    return Coalesce(Subquery(reservas, output_field=IntegerField()), Value(0))
+
+
+def disponibles(tipo, ids, clave=None):
+    """{id: stock - reservas vigentes de otros carritos} para los ítems dados"""
+    modelo = MODELOS[tipo]
+    ahora = timezone.now()
+    return dict(modelo.objects
+                .filter(pk__in=ids)
+                .annotate(disponible=F('stock') - _reservado_por_otros(tipo, clave, ahora))
+                .values_list('pk', 'disponible'))
+
+
+def _comprobar(tipo, cantidades, clave, ahora, bloquear):
+    """Lee stock/versión/reservado (bloqueando si corresponde) y valida que alcance"""
+    modelo = MODELOS[tipo]
+    filas = (modelo.objects
+             .filter(pk__in=cantidades)
+             .annotate(reservado=_reservado_por_otros(tipo, clave, ahora))
+             .order_by('pk'))
+    if bloquear:
+        filas = filas.select_for_update(of=('self',))
+    filas = list(filas)
+    for item in filas:
+        disponible = item.stock - item.reservado
+        if cantidades[item.pk] > disponible:
+            raise StockInsuficiente(item, max(disponible, 0))
+    return filas
+
+
+def _subir_versiones(modelo, filas):
+    """UPDATE ... SET version = version + 1 WHERE (id, version) coincide con lo leído"""
+    if not filas:
+        return
+    leidas = Q()
+    for item in filas:
+        leidas |= Q(pk=item.pk, version=item.version)
+    if modelo.objects.filter(leidas).update(version=F('version') + 1) != len(filas):
+        raise _Conflicto()
+
+
+def reservar(lineas, clave):
+    """
+    Aparta el stock de las líneas para el carrito `clave` (reemplaza su reserva previa)
+    hasta dentro de STOCK_RESERVATION_MINUTES. Lanza StockInsuficiente si no alcanza
+    y ReservaEnConflicto si se agotan los reintentos optimistas.
+    """
+    for intento in range(REINTENTOS_OPTIMISTAS):
+        try:
+            with transaction.atomic():
+                ahora = timezone.now()
+                nuevas = []
+                for tipo, modelo in MODELOS.items():
+                    cantidades = _cantidades(lineas, tipo)
+                    if not cantidades:
+                        continue
+                    bloquear = usa_bloqueo_por_fila(modelo)
+                    filas = _comprobar(tipo, cantidades, clave, ahora, bloquear)
+                    if not bloquear:
+                        _subir_versiones(modelo, filas)
+                    nuevas += [
+                        ReservaStock(clave=clave, cantidad=cantidades[item.pk],
+                                     expira_en=ahora + timezone.timedelta(minutes=minutos_reserva()),
+                                     **{CAMPO_RESERVA[tipo]: item})
+                        for item in filas
+                    ]
+                ReservaStock.objects.filter(Q(clave=clave) | Q(expira_en__lte=ahora)).delete()
+                ReservaStock.objects.bulk_create(nuevas)
+                return nuevas
+        except _Conflicto:
+            logger.info(f"Conflicto de versión al reservar stock (intento {intento + 1})")
+            # Espera breve y aleatoria para que los checkouts en conflicto no vuelvan a chocar al mismo tiempo
+            time.sleep(random.uniform(0, 0.005 * (intento + 1)))
+    # Demasiados checkouts simultáneos sobre los mismos ítems: sin stock solo si de verdad falta
+    ahora = timezone.now()
+    for tipo in MODELOS:
+        cantidades = _cantidades(lineas, tipo)
+        if cantidades:
+            _comprobar(tipo, cantidades, clave, ahora, bloquear=False)
+    raise ReservaEnConflicto()
+
+
+def clave_sesion(request):
+    """Clave con la que se reserva el carrito de la sesión actual"""
+    if not request.session.session_key:
+        request.session.save()
+    return request.session.session_key
+
+
+def liberar(clave):
+    ReservaStock.objects.filter(clave=clave).delete()
+
+
+def descontar_stock(lineas, clave=None):
+    """
+    Descuenta el stock de todas las líneas con un UPDATE por modelo:
+        stock = stock - CASE id WHEN ... END, version = version + 1
+        WHERE id IN (...) AND stock - <reservado por otros> >= CASE id WHEN ... END
+    Las reservas del propio carrito (`clave`) no cuentan en contra. Si alguna fila
+    no cumple la condición lanza StockInsuficiente; el llamador debe revertir la transacción.
+    """
+    ahora = timezone.now()
+    for tipo, modelo in MODELOS.items():
+        cantidades = _cantidades(lineas, tipo)
+        if not cantidades:
+            continue
+
+        if usa_bloqueo_por_fila(modelo):
+            # Serializa contra reservar(), que bloquea las mismas filas
+            list(modelo.objects.select_for_update().filter(pk__in=cantidades).order_by('pk').values_list('pk'))
+
+        cantidad = Case(*[When(pk=pk, then=Value(cant)) for pk, cant in cantidades.items()],
+                        output_field=IntegerField())
+        actualizados = (modelo.objects
+                        .filter(pk__in=cantidades, stock__gte=cantidad + _reservado_por_otros(tipo, clave, ahora))
+                        .update(stock=F('stock') - cantidad, version=F('version') + 1))
+        if actualizados != len(cantidades):
+            libres = disponibles(tipo, cantidades, clave)
+            item = next((l.item for l in lineas
+                         if l.tipo == tipo and cantidades[l.item_id] > libres.get(l.item_id, 0)),
+                        next(l.item for l in lineas if l.tipo == tipo))
+            raise StockInsuficiente(item, max(libres.get(item.pk, 0), 0))
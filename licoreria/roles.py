@@ -0,0 +1,76 @@
+"""
+Roles (grupos de Django) del usuario, resueltos una sola vez.
+
+grupos_de(user) consulta user.groups como máximo una vez por petición (queda
+memorizado en el objeto user) y guarda el resultado en caché ROLES_CACHE_TTL
+segundos para las peticiones siguientes. RolesMiddleware lo deja en
+`request.roles`; User.rol (apps.py), los predicados es_* y rol_requerido
+(decorators.py) y las vistas leen de ahí.
+
+signals.py invalida la caché con m2m_changed de User.groups y al renombrar o
+borrar un grupo. La invalidación solo llega a los procesos que comparten la caché
+ROLES_CACHE_ALIAS: con LocMem (una por proceso) los demás workers siguen viendo
+los roles viejos hasta que vencen, por eso ahí el TTL se recorta a
+ROLES_CACHE_TTL_LOCAL.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+PRIORIDAD = ['Administrador', 'Supervisor', 'Bodeguero', 'Cliente']
+EMPLEADOS = frozenset({'Bodeguero', 'Supervisor'})
+CACHE_PREFIJO = 'roles:usuario:'
+ATRIBUTO = '_roles_cache'
+
+
+def _cache():
+    return caches[getattr(settings, 'ROLES_CACHE_ALIAS', 'default')]
+
+
+def es_local():
+    """True si la caché vive en cada proceso y invalidar() no alcanza a los otros workers"""
+    return isinstance(_cache(), LocMemCache)
+
+
+def ttl():
+    segundos = getattr(settings, 'ROLES_CACHE_TTL', 60 * 5)
+    if es_local():
+        return min(segundos, getattr(settings, 'ROLES_CACHE_TTL_LOCAL', 30))
+    return segundos
+
+
+def grupos_de(user):
+    """frozenset con los nombres de los grupos del usuario (vacío si es anónimo)"""
+    if not user.is_authenticated:
+        return frozenset()
+    grupos = getattr(user, ATRIBUTO, None)
+    if grupos is not None:
+        return grupos
+
+    if 'groups' in getattr(user, '_prefetched_objects_cache', {}):
+        grupos = frozenset(g.name for g in user.groups.all())
+    else:
+        clave = f"{CACHE_PREFIJO}{user.pk}"
+        grupos = _cache().get(clave)
+        if grupos is None:
+            grupos = frozenset(user.groups.values_list('name', flat=True))
+            _cache().set(clave, grupos, ttl())
+    setattr(user, ATRIBUTO, grupos)
+    return grupos
+
+
+def de_peticion(request):
+    """Los roles que RolesMiddleware dejó en la petición (o se resuelven si no pasó por él)"""
+    roles = getattr(request, 'roles', None)
+    return grupos_de(request.user) if roles is None else roles
+
+
+def tiene_rol(user, *roles):
+    return bool(grupos_de(user) & set(roles))
+
+
+def invalidar(user_ids, usuario=None):
+    """Descarta los roles cacheados de esos usuarios (y los memorizados en `usuario`, si se pasa)"""
+    _cache().delete_many([f"{CACHE_PREFIJO}{pk}" for pk in user_ids])
+    if usuario is not None:
+        vars(usuario).pop(ATRIBUTO, None)
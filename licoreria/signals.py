@@ -1,7 +1,16 @@
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
 from django.db import transaction
-from .models import DetallesOrdenes, Ordenes
+from django.db.models import F
+from .models import (DetallesOrdenes, Ordenes, Clientes, LibroFidelidad, Recompensas, Multas, Productos,
+                     Cocteles, Marcas, Categorias)
+from . import dashboard, busqueda, almacen_carrito, fragmentos, roles
+
+logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Ordenes)
 def asignar_puntos_al_pagar(sender, instance, **kwargs):
@@ -18,22 +27,31 @@ def asignar_puntos_al_pagar(sender, instance, **kwargs):
                 puntos_ganados = instance.cliente.agregar_puntos(float(instance.total))
                 # Actualizar la orden sin disparar post_save de nuevo (o verificar puntos_asignados)
                 Ordenes.objects.filter(pk=instance.pk).update(puntos_asignados=True)
-                print(f"Puntos asignados: {puntos_ganados} a cliente {instance.cliente.nombre}")
+                logger.info(f"Puntos asignados: {puntos_ganados} a cliente {instance.cliente.nombre}")
 
         transaction.on_commit(asignar)
 
+def mover_stock(detalle, delta):
+    """
+    Suma `delta` al stock del ítem del detalle con un UPDATE (stock = stock + delta,
+    version = version + 1). Un save() del ítem en memoria pisaría descuentos
+    concurrentes y devolvería `version` a un valor viejo (ver reservas.py).
+    """
+    if detalle.producto_id:
+        filas = Productos.objects.filter(pk=detalle.producto_id)
+    elif detalle.coctel_id:
+        filas = Cocteles.objects.filter(pk=detalle.coctel_id)
+    else:
+        return
+    filas.update(stock=F('stock') + delta, version=F('version') + 1)
+
 @receiver(post_save, sender=DetallesOrdenes)
 def actualizar_al_guardar(sender, instance, created, **kwargs):
     # Usamos transaction.atomic para asegurar integridad
     with transaction.atomic():
         # 1. Actualizar Stock al crear
         if created:
-            if instance.producto:
-                instance.producto.stock -= instance.cantidad
-                instance.producto.save()
-            elif instance.coctel:
-                instance.coctel.stock -= instance.cantidad
-                instance.coctel.save()
+            mover_stock(instance, -instance.cantidad)
         
         # 2. Recalcular Total de la Orden
         orden = instance.orden
@@ -42,17 +60,14 @@ def actualizar_al_guardar(sender, instance, created, **kwargs):
         # Actualizamos sin disparar señales innecesarias de Orden si es posible, 
         # pero aquí Ordenes.save() está bien (controlado por el dispatcher)
         Ordenes.objects.filter(pk=orden.pk).update(total=nuevo_total)
+        # update() no dispara post_save de Ordenes: refrescamos el libro aquí
+        LibroFidelidad.actualizar(orden.cliente_id)
 
 @receiver(post_delete, sender=DetallesOrdenes)
 def actualizar_al_borrar(sender, instance, **kwargs):
     with transaction.atomic():
         # 1. Devolver Stock
-        if instance.producto:
-            instance.producto.stock += instance.cantidad
-            instance.producto.save()
-        elif instance.coctel:
-            instance.coctel.stock += instance.cantidad
-            instance.coctel.save()
+        mover_stock(instance, instance.cantidad)
 
         # 2. Recalcular Total
         orden = instance.orden
@@ -61,3 +76,140 @@ def actualizar_al_borrar(sender, instance, **kwargs):
         else:
             nuevo_total = 0
         Ordenes.objects.filter(pk=orden.pk).update(total=nuevo_total)
+        LibroFidelidad.actualizar(orden.cliente_id)
+
+# --- Libro de Fidelidad (saldos materializados por cliente) ---
+
+@receiver(post_save, sender=Clientes)
+def crear_libro_fidelidad(sender, instance, created, raw=False, **kwargs):
+    """Todo cliente nuevo arranca con un libro en cero"""
+    if created and not raw:
+        LibroFidelidad.objects.get_or_create(cliente=instance)
+
+@receiver(pre_save, sender=Ordenes)
+@receiver(pre_save, sender=Recompensas)
+@receiver(pre_save, sender=Multas)
+def recordar_cliente_anterior(sender, instance, raw=False, **kwargs):
+    """Anota el cliente que la fila tenía en la base: si el save lo cambia, su libro también se refresca"""
+    instance._cliente_anterior_id = None
+    if raw or instance._state.adding:
+        return
+    instance._cliente_anterior_id = (sender.objects.filter(pk=instance.pk)
+                                     .values_list('cliente_id', flat=True).first())
+
+@receiver(post_save, sender=Ordenes)
+@receiver(post_delete, sender=Ordenes)
+@receiver(post_save, sender=Recompensas)
+@receiver(post_delete, sender=Recompensas)
+@receiver(post_save, sender=Multas)
+@receiver(post_delete, sender=Multas)
+def actualizar_libro_fidelidad(sender, instance, raw=False, **kwargs):
+    """Refresca el libro del cliente afectado (y el del anterior, si cambió) cuando cambian sus órdenes, canjes o multas"""
+    if raw:
+        return
+    LibroFidelidad.actualizar(instance.cliente_id)
+    anterior = getattr(instance, '_cliente_anterior_id', None)
+    if anterior != instance.cliente_id:
+        LibroFidelidad.actualizar(anterior)
+
+# --- Caché del dashboard ---
+
+@receiver(post_save, sender=Ordenes)
+@receiver(post_delete, sender=Ordenes)
+@receiver(post_save, sender=DetallesOrdenes)
+@receiver(post_delete, sender=DetallesOrdenes)
+@receiver(post_save, sender=Recompensas)
+@receiver(post_delete, sender=Recompensas)
+@receiver(post_save, sender=Productos)
+@receiver(post_delete, sender=Productos)
+def invalidar_dashboard(sender, **kwargs):
+    """Ventas, solicitudes, canjes o stock cambiaron: las cifras cacheadas ya no valen"""
+    dashboard.invalidar_cache()
+
+# --- Índice de búsqueda del catálogo ---
+
+CAMPOS_INDEXADOS_PRODUCTO = {'nombre', 'marca', 'categoria'}
+
+@receiver(post_save, sender=Productos)
+def indexar_producto(sender, instance, raw=False, update_fields=None, **kwargs):
+    # save(update_fields=['stock']) y similares no cambian el texto indexado
+    if raw or (update_fields and not CAMPOS_INDEXADOS_PRODUCTO & set(update_fields)):
+        return
+    busqueda.indexar_producto(instance)
+
+@receiver(post_delete, sender=Productos)
+def desindexar_producto(sender, instance, **kwargs):
+    busqueda.desindexar(busqueda.PRODUCTO, [instance.pk])
+
+@receiver(post_save, sender=Cocteles)
+def indexar_coctel(sender, instance, raw=False, **kwargs):
+    if not raw:
+        busqueda.indexar_coctel(instance)
+
+@receiver(post_delete, sender=Cocteles)
+def desindexar_coctel(sender, instance, **kwargs):
+    busqueda.desindexar(busqueda.COCTEL, [instance.pk])
+
+@receiver(post_save, sender=Marcas)
+@receiver(post_save, sender=Categorias)
+def reindexar_productos_relacionados(sender, instance, raw=False, **kwargs):
+    """El nombre de la marca/categoría forma parte del documento de cada producto"""
+    if raw:
+        return
+    for producto in instance.productos.select_related('marca', 'categoria'):
+        busqueda.indexar_producto(producto)
+
+@receiver(pre_delete, sender=Marcas)
+def recordar_productos_de_marca(sender, instance, **kwargs):
+    # Al borrar la marca, sus productos quedan con marca=NULL vía UPDATE (sin señales)
+    instance._productos_a_reindexar = list(instance.productos.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Marcas)
+def reindexar_productos_sin_marca(sender, instance, **kwargs):
+    ids = getattr(instance, '_productos_a_reindexar', [])
+    for producto in Productos.objects.filter(pk__in=ids).select_related('marca', 'categoria'):
+        busqueda.indexar_producto(producto)
+
+# --- Caché de fragmentos del catálogo ---
+
+@receiver(post_save, sender=Productos)
+@receiver(post_delete, sender=Productos)
+def invalidar_tarjeta_producto(sender, instance, **kwargs):
+    fragmentos.invalidar_producto(instance.pk)
+
+@receiver(post_save, sender=Marcas)
+@receiver(post_delete, sender=Marcas)
+@receiver(post_save, sender=Categorias)
+@receiver(post_delete, sender=Categorias)
+def invalidar_catalogo(sender, **kwargs):
+    """Los nombres de marcas y categorías aparecen en todas las tarjetas y secciones"""
+    fragmentos.invalidar()
+
+@receiver(user_logged_in)
+def fusionar_carrito_anonimo(sender, request, user, **kwargs):
+    """Al iniciar sesión, el carrito armado como anónimo pasa al carrito del usuario"""
+    if request is not None:
+        almacen_carrito.fusionar_al_iniciar_sesion(request, user)
+
+# --- Caché de roles (ver roles.py) ---
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    """user.groups.add/remove/clear o grupo.user_set.add/remove/clear"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            roles.invalidar([instance.pk], usuario=instance)
+    elif action == 'pre_clear':
+        # Después del clear ya no se sabe quiénes estaban en el grupo
+        instance._usuarios_a_invalidar = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        roles.invalidar(getattr(instance, '_usuarios_a_invalidar', []))
+    elif action in ('post_add', 'post_remove'):
+        roles.invalidar(pk_set or [])
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidar_roles_del_grupo(sender, instance, created=False, **kwargs):
+    """Renombrar o borrar un grupo cambia los roles de todos sus usuarios"""
+    if not created:
+        roles.invalidar(instance.user_set.values_list('pk', flat=True))
@@ -0,0 +1,150 @@
+"""
+Sincronización del catálogo de cócteles con el índice alfabético de TheCocktailDB.
+
+TheCocktailDB no tiene listado paginado: search.php?f=<letra> devuelve todos
+los tragos que empiezan con esa letra. SincronizadorCocteles recorre las
+letras en tandas de `concurrencia` peticiones paralelas (get_concurrente sobre
+el pool del cliente compartido), espaciadas por un LimitadorTasa, y por tanda:
+- compara cada trago con los existentes, cargados una sola vez en memoria
+  por id_externo, y descarta los que no cambiaron,
+- hace upsert del resto con bulk_create(update_conflicts=True) sobre
+  id_externo: los nuevos entran con stock y precio por defecto, los existentes
+  actualizan receta e imagen pero conservan stock y precio,
+- reindexa los cambiados en la búsqueda,
+- guarda en el checkpoint las letras ya confirmadas.
+
+Las letras que fallan (status != 200, timeout, breaker abierto) quedan
+pendientes: la siguiente ejecución retoma desde el checkpoint y solo pide esas.
+"""
+import json
+import string
+import time
+from pathlib import Path
+
+from django.db import transaction
+
+from . import busqueda
+from .cliente_http import LimitadorTasa, cocktaildb
+
+LETRAS = string.ascii_lowercase
+CAMPOS_ACTUALIZABLES = ['nombre', 'instrucciones', 'imagen_url', 'categoria', 'ingredientes', 'es_alcoholico']
+
+
+class CheckpointLetras:
+    """Letras ya sincronizadas y contadores, en un JSON"""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+
+    def cargar(self):
+        if not self.ruta.exists():
+            return [], None
+        datos = json.loads(self.ruta.read_text())
+        return datos['completadas'], datos['estadisticas']
+
+    def guardar(self, completadas, estadisticas):
+        temporal = self.ruta.with_suffix(self.ruta.suffix + '.tmp')
+        temporal.write_text(json.dumps({'completadas': sorted(completadas), 'estadisticas': estadisticas}))
+        temporal.replace(self.ruta)
+
+    def borrar(self):
+        self.ruta.unlink(missing_ok=True)
+
+
+def _valores(coctel):
+    """Campos de Cocteles a partir de formatear_coctel(), recortados al largo de cada columna"""
+    return {
+        'nombre': (coctel['nombre'] or 'Sin Nombre')[:200],
+        'instrucciones': coctel['instrucciones'] or None,
+        'imagen_url': (coctel['imagen_url'] or '')[:500] or None,
+        'categoria': (coctel['categoria'] or '')[:100] or None,
+        'ingredientes': coctel['ingredientes'] or None,
+        'es_alcoholico': coctel['es_alcoholico'],
+    }
+
+
+class SincronizadorCocteles:
+    def __init__(self, concurrencia=4, por_segundo=5, checkpoint=None, progreso=None):
+        from .models import Cocteles
+
+        self.concurrencia = concurrencia
+        self.limitador = LimitadorTasa(por_segundo)
+        self.checkpoint = checkpoint
+        self.progreso = progreso
+        self.completadas = set()
+        self.fallidas = []
+        self.estadisticas = {'letras': 0, 'recibidos': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0}
+        self._inicio = time.monotonic()
+
+        if checkpoint:
+            completadas, estadisticas = checkpoint.cargar()
+            self.completadas.update(completadas)
+            self.estadisticas.update(estadisticas or {})
+
+        # Una sola consulta: el estado actual de todos los cócteles importados
+        self.existentes = {
+            fila[0]: dict(zip(CAMPOS_ACTUALIZABLES, fila[1:]))
+            for fila in Cocteles.objects.exclude(id_externo=None).values_list('id_externo', *CAMPOS_ACTUALIZABLES)
+        }
+
+    def sincronizar(self, letras=LETRAS):
+        pendientes = [letra for letra in letras if letra not in self.completadas]
+        for i in range(0, len(pendientes), self.concurrencia):
+            tanda = pendientes[i:i + self.concurrencia]
+            respuestas = cocktaildb.get_concurrente([('search.php', {'f': letra}) for letra in tanda],
+                                                    max_workers=self.concurrencia, limitador=self.limitador)
+            tragos, correctas = {}, []
+            for letra, respuesta in zip(tanda, respuestas):
+                drinks = self._drinks(respuesta)
+                if drinks is None:
+                    self.fallidas.append(letra)
+                    continue
+                correctas.append(letra)
+                for item in drinks:
+                    if item.get('idDrink'):
+                        tragos[str(item['idDrink'])] = item
+            self.confirmar(correctas, tragos)
+        return self.estadisticas
+
+    @staticmethod
+    def _drinks(respuesta):
+        """Lista de tragos de la respuesta, o None si la letra falló"""
+        if isinstance(respuesta, Exception) or respuesta.status_code != 200:
+            return None
+        try:
+            return respuesta.json().get('drinks') or []  # null cuando no hay tragos con esa letra
+        except ValueError:
+            return None
+
+    def confirmar(self, letras, tragos):
+        """Guarda los tragos de una tanda y marca sus letras como completadas"""
+        from .api_views import formatear_coctel
+        from .models import Cocteles
+
+        cambiados = {}
+        for id_externo, item in tragos.items():
+            valores = _valores(formatear_coctel(item))
+            if self.existentes.get(id_externo) == valores:
+                self.estadisticas['sin_cambios'] += 1
+            else:
+                cambiados[id_externo] = valores
+
+        if cambiados:
+            with transaction.atomic():
+                Cocteles.objects.bulk_create(
+                    [Cocteles(id_externo=id_externo, **valores) for id_externo, valores in cambiados.items()],
+                    update_conflicts=True, unique_fields=['id_externo'], update_fields=CAMPOS_ACTUALIZABLES,
+                )
+                busqueda.indexar_cocteles(Cocteles.objects.filter(id_externo__in=cambiados))
+            nuevos = sum(1 for id_externo in cambiados if id_externo not in self.existentes)
+            self.estadisticas['creados'] += nuevos
+            self.estadisticas['actualizados'] += len(cambiados) - nuevos
+            self.existentes.update(cambiados)
+
+        self.estadisticas['letras'] += len(letras)
+        self.estadisticas['recibidos'] += len(tragos)
+        self.completadas.update(letras)
+        if self.checkpoint:
+            self.checkpoint.guardar(self.completadas, self.estadisticas)
+        if self.progreso:
+            self.progreso(letras, self.estadisticas, time.monotonic() - self._inicio)
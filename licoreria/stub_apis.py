@@ -0,0 +1,327 @@
+"""
+Open Food Facts y TheCocktailDB sin red: grabaciones y servidor stub.
+
+Grabación / reproducción (grabacion()):
+    Monta en las sesiones de `off` y `cocktaildb` (cliente_http.py) un adaptador
+    de requests que, en modo 'replay', responde desde archivos JSON de un
+    directorio de fixtures y falla con FixtureFaltante si la petición no está
+    grabada; en modo 'record' hace la petición real y la guarda. Cada archivo
+    es una respuesta: servicio/ruta + hash de los parámetros.
+
+Servidor stub (ServidorStub):
+    HTTP local multihilo con las formas de cgi/search.pl,
+    api/v2/product/<ean>.json, search.php (s= y f=) y random.php sobre un
+    catálogo sintético reproducible. Permite inyectar latencia, errores 5xx y
+    respuestas colgadas para medir de forma determinista el throughput, la
+    caché y los timeouts del importador. stub.settings() da las URLs base
+    para override_settings; `python manage.py stub_apis` lo levanta aparte.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from .cliente_http import cocktaildb, off
+
+SERVICIOS = {'off': off, 'cocktaildb': cocktaildb}
+DIRECTORIO_FIXTURES = Path(__file__).resolve().parent / 'tests' / 'fixtures' / 'apis'
+
+
+class FixtureFaltante(requests.ConnectionError):
+    """Modo replay y la petición no tiene grabación"""
+
+
+# --- Grabaciones ---
+
+class Fixtures:
+    """Directorio de respuestas grabadas, una por archivo JSON"""
+
+    def __init__(self, directorio=DIRECTORIO_FIXTURES):
+        self.directorio = Path(directorio)
+
+    def ruta(self, servicio, ruta, params):
+        params = sorted((str(k), str(v)) for k, v in params)
+        nombre = re.sub(r'[^A-Za-z0-9._-]+', '_', ruta.strip('/')).removesuffix('.json') or 'raiz'
+        if params:
+            nombre += '__' + hashlib.sha1(urlencode(params).encode()).hexdigest()[:10]
+        return self.directorio / servicio / f"{nombre}.json"
+
+    def leer(self, servicio, ruta, params):
+        archivo = self.ruta(servicio, ruta, params)
+        return json.loads(archivo.read_text(encoding='utf-8')) if archivo.exists() else None
+
+    def guardar(self, servicio, ruta, params, status, cuerpo):
+        archivo = self.ruta(servicio, ruta, params)
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        archivo.write_text(json.dumps({
+            'peticion': {'ruta': ruta, 'params': dict(params)},
+            'status': status,
+            'cuerpo': cuerpo,
+        }, indent=2, ensure_ascii=False, sort_keys=True), encoding='utf-8')
+        return archivo
+
+
+def _respuesta(peticion, status, cuerpo):
+    datos = json.dumps(cuerpo).encode()
+    respuesta = requests.Response()
+    respuesta.status_code = status
+    respuesta.headers['Content-Type'] = 'application/json'
+    respuesta.raw = HTTPResponse(body=BytesIO(datos), status=status, preload_content=False)
+    respuesta.url = peticion.url
+    respuesta.request = peticion
+    respuesta.encoding = 'utf-8'
+    return respuesta
+
+
+class AdaptadorGrabacion(HTTPAdapter):
+    def __init__(self, servicio, fixtures, modo, real):
+        super().__init__()
+        self.servicio = servicio
+        self.fixtures = fixtures
+        self.modo = modo
+        self.real = real
+
+    def _clave(self, peticion):
+        partes = urlsplit(peticion.url)
+        base = urlsplit(SERVICIOS[self.servicio].base_url).path.rstrip('/')
+        ruta = partes.path[len(base):] if partes.path.startswith(base) else partes.path
+        return ruta.lstrip('/'), parse_qsl(partes.query, keep_blank_values=True)
+
+    def send(self, request, **kwargs):
+        ruta, params = self._clave(request)
+        if self.modo == 'record':
+            respuesta = self.real.send(request, **kwargs)
+            try:
+                cuerpo = respuesta.json()
+            except ValueError:
+                return respuesta
+            self.fixtures.guardar(self.servicio, ruta, params, respuesta.status_code, cuerpo)
+            return _respuesta(request, respuesta.status_code, cuerpo)
+
+        grabada = self.fixtures.leer(self.servicio, ruta, params)
+        if grabada is None:
+            raise FixtureFaltante(
+                f"Sin grabación de {self.servicio} {ruta} {dict(params)} "
+                f"(esperada en {self.fixtures.ruta(self.servicio, ruta, params)}); grabarla con APIS_GRABAR=1",
+                request=request)
+        return _respuesta(request, grabada['status'], grabada['cuerpo'])
+
+
+def modo_desde_entorno():
+    """'record' con APIS_GRABAR=1 (requiere red), 'replay' en otro caso"""
+    return 'record' if os.environ.get('APIS_GRABAR') == '1' else 'replay'
+
+
+@contextmanager
+def grabacion(directorio=DIRECTORIO_FIXTURES, modo='replay'):
+    """Dentro del bloque las llamadas de off y cocktaildb se reproducen (o graban) en `directorio`"""
+    fixtures = Fixtures(directorio)
+    originales = {}
+    for nombre, cliente in SERVICIOS.items():
+        originales[nombre] = dict(cliente.session.adapters)
+        real = cliente.session.get_adapter(cliente.base_url)
+        adaptador = AdaptadorGrabacion(nombre, fixtures, modo, real)
+        cliente.session.mount('https://', adaptador)
+        cliente.session.mount('http://', adaptador)
+    try:
+        yield fixtures
+    finally:
+        for nombre, cliente in SERVICIOS.items():
+            cliente.session.adapters.clear()
+            cliente.session.adapters.update(originales[nombre])
+
+
+# --- Catálogo sintético ---
+
+TIPOS_LICOR = [
+    ('Whisky', 'en:whiskies', 40), ('Ron', 'en:rums', 38), ('Vodka', 'en:vodkas', 40),
+    ('Gin', 'en:gins', 42), ('Vino Tinto', 'en:red-wines', 13), ('Cerveza', 'en:beers', 5),
+]
+BEBIDAS_BASE = ['Margarita', 'Mojito', 'Martini', 'Negroni', 'Daiquiri', 'Manhattan', 'Cosmopolitan',
+                'Caipirinha', 'Piña Colada', 'Old Fashioned', 'Bloody Mary', 'Mai Tai']
+INGREDIENTES = ['Tequila', 'Ron Blanco', 'Vodka', 'Gin', 'Triple sec', 'Jugo de limón', 'Azúcar',
+                'Menta', 'Vermut', 'Campari', 'Angostura', 'Soda']
+
+
+def catalogo_sintetico(productos=200, cocteles=120, semilla=7):
+    """Productos OFF y tragos de TheCocktailDB con los campos que usa el importador"""
+    rng = random.Random(semilla)
+    lista_productos = []
+    for i in range(productos):
+        nombre, tag, grados = TIPOS_LICOR[i % len(TIPOS_LICOR)]
+        codigo = f"786{i:010d}"
+        lista_productos.append({
+            'code': codigo,
+            'product_name': f"{nombre} Reserva {i}",
+            'brands': f"Destilería {rng.randint(1, 25)}",
+            'categories': f"Bebidas alcohólicas, {nombre}",
+            'categories_tags': ['en:beverages', 'en:alcoholic-beverages', tag],
+            'image_url': f"https://images.openfoodfacts.org/images/products/{codigo}/front.jpg",
+            'nutriments': {'alcohol_100g': grados},
+            'origins': rng.choice(['Ecuador', 'Escocia', 'Cuba', 'México', 'Chile']),
+            'quantity': rng.choice(['700 ml', '750 ml', '1 l', '355 ml']),
+        })
+
+    lista_cocteles = []
+    for i in range(cocteles):
+        base = BEBIDAS_BASE[i % len(BEBIDAS_BASE)]
+        trago = {
+            'idDrink': str(11000 + i),
+            'strDrink': base if i < len(BEBIDAS_BASE) else f"{base} {i // len(BEBIDAS_BASE)}",
+            'strCategory': rng.choice(['Cocktail', 'Ordinary Drink', 'Shot']),
+            'strAlcoholic': 'Alcoholic' if rng.random() < 0.9 else 'Non alcoholic',
+            'strInstructions': 'Mezclar todo con hielo y servir.',
+            'strDrinkThumb': f"https://www.thecocktaildb.com/images/media/drink/{11000 + i}.jpg",
+        }
+        for n, ingrediente in enumerate(rng.sample(INGREDIENTES, 3), 1):
+            trago[f"strIngredient{n}"] = ingrediente
+            trago[f"strMeasure{n}"] = f"{rng.randint(1, 3)} oz"
+        lista_cocteles.append(trago)
+    return {'productos': lista_productos, 'cocteles': lista_cocteles}
+
+
+# --- Servidor stub ---
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como las APIs reales
+
+    def do_GET(self):
+        self.server.stub.atender(self)
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorStub:
+    """
+    Servidor local de OFF + TheCocktailDB.
+
+    latencia/variacion: segundos de espera por respuesta (+ uniforme en ±variacion).
+    tasa_error: probabilidad de responder `status_error` (503 por defecto).
+    tasa_cuelgue: probabilidad de dormir `cuelgue` segundos antes de responder (timeouts).
+    Los atributos se pueden cambiar con el servidor corriendo.
+    """
+
+    def __init__(self, catalogo=None, latencia=0.0, variacion=0.0, tasa_error=0.0, status_error=503,
+                 tasa_cuelgue=0.0, cuelgue=30.0, semilla=7, host='127.0.0.1', puerto=0):
+        self.catalogo = catalogo or catalogo_sintetico(semilla=semilla)
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_error = tasa_error
+        self.status_error = status_error
+        self.tasa_cuelgue = tasa_cuelgue
+        self.cuelgue = cuelgue
+        self.llamadas = Counter()
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._por_codigo = {p['code']: p for p in self.catalogo['productos']}
+        self._servidor = ThreadingHTTPServer((host, puerto), _Manejador)
+        self._servidor.daemon_threads = True
+        self._servidor.stub = self
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def settings(self):
+        """URLs base para override_settings"""
+        return {'OFF_BASE_URL': self.url, 'COCKTAILDB_BASE_URL': self.url}
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # Respuestas
+
+    def _sortear(self):
+        with self._lock:
+            demora = self.latencia + (self._rng.uniform(-self.variacion, self.variacion) if self.variacion else 0)
+            colgar = self.tasa_cuelgue and self._rng.random() < self.tasa_cuelgue
+            fallar = self.tasa_error and self._rng.random() < self.tasa_error
+        return max(demora, 0), colgar, fallar
+
+    def atender(self, manejador):
+        partes = urlsplit(manejador.path)
+        params = dict(parse_qsl(partes.query))
+        ruta = partes.path.rstrip('/')
+        with self._lock:
+            self.llamadas[ruta] += 1
+
+        demora, colgar, fallar = self._sortear()
+        time.sleep(self.cuelgue if colgar else demora)
+        if fallar:
+            status, cuerpo = self.status_error, {'error': 'stub: error inyectado'}
+        else:
+            status, cuerpo = self.responder(ruta, params)
+
+        datos = json.dumps(cuerpo).encode()
+        try:
+            manejador.send_response(status)
+            manejador.send_header('Content-Type', 'application/json')
+            manejador.send_header('Content-Length', str(len(datos)))
+            manejador.end_headers()
+            manejador.wfile.write(datos)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # el cliente se cansó de esperar (timeout)
+
+    def responder(self, ruta, params):
+        """(status, cuerpo) con la forma de la API real para `ruta`"""
+        ean = re.fullmatch(r'.*/api/v2/product/(\w+)\.json', ruta)
+        if ean:
+            producto = self._por_codigo.get(ean.group(1))
+            if producto is None:
+                return 404, {'code': ean.group(1), 'status': 0, 'status_verbose': 'product not found'}
+            return 200, {'code': producto['code'], 'product': producto, 'status': 1,
+                         'status_verbose': 'product found'}
+
+        if ruta.endswith('/cgi/search.pl'):
+            terminos = params.get('search_terms', '').lower().split()
+            tags = [v for k, v in params.items() if k.startswith('tag_') and k[4:].isdigit()]
+            encontrados = [p for p in self.catalogo['productos']
+                           if all(t in p['product_name'].lower() or t in p['categories'].lower() for t in terminos)
+                           and all(tag in p['categories_tags'] for tag in tags)]
+            tamano = int(params.get('page_size', 24))
+            pagina = int(params.get('page', 1))
+            return 200, {'count': len(encontrados), 'page': pagina, 'page_size': tamano, 'skip': (pagina - 1) * tamano,
+                         'products': encontrados[(pagina - 1) * tamano:pagina * tamano]}
+
+        if ruta.endswith('/search.php'):
+            if 's' in params:
+                texto = params['s'].lower()
+                tragos = [c for c in self.catalogo['cocteles'] if texto in c['strDrink'].lower()]
+            else:
+                letra = params.get('f', '').lower()[:1]
+                tragos = [c for c in self.catalogo['cocteles'] if c['strDrink'].lower().startswith(letra)]
+            return 200, {'drinks': tragos or None}  # TheCocktailDB responde null sin resultados
+
+        if ruta.endswith('/random.php'):
+            with self._lock:
+                return 200, {'drinks': [self._rng.choice(self.catalogo['cocteles'])]}
+
+        return 404, {'error': f"stub: ruta desconocida {ruta}"}
@@ -0,0 +1,19 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class PresupuestoConsultasMixin:
+    """
+    assertPresupuestoConsultas(maximo, url): hace la petición con self.client y
+    falla si ejecuta más de `maximo` consultas, listándolas en el mensaje.
+    A diferencia de assertNumQueries deja margen hacia abajo: sirve para
+    declarar el techo de una vista y detectar un N+1 nuevo.
+    """
+
+    def assertPresupuestoConsultas(self, maximo, url, metodo='get', **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, metodo)(url, **kwargs)
+        if len(ctx) > maximo:
+            consultas = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(ctx.captured_queries, 1))
+            self.fail(f"{url} ejecutó {len(ctx)} consultas; presupuesto {maximo}:\n{consultas}")
+        return response
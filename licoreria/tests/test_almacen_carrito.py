@@ -0,0 +1,117 @@
+import threading
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from licoreria import almacen_carrito
+from licoreria.models import Carrito, CarritoItem, Categorias, Productos
+
+
+class CodificacionTests(TestCase):
+    def test_ida_y_vuelta(self):
+        carrito = {'lic_12': 3, 'coc_4': 1}
+        self.assertEqual(almacen_carrito.codificar(carrito), 'l12:3,c4:1')
+        self.assertEqual(almacen_carrito.decodificar('l12:3,c4:1'), carrito)
+
+    def test_omite_claves_invalidas_y_acepta_dict_anterior(self):
+        self.assertEqual(almacen_carrito.codificar({'lic_1': 2, 'xx_3': 1, 'coc_2': 0}), 'l1:2')
+        self.assertEqual(almacen_carrito.decodificar('l1:2,z9:1,c:3,lx:1'), {'lic_1': 2})
+        self.assertEqual(almacen_carrito.decodificar({'lic_1': 2, 'basura': 1}), {'lic_1': 2})
+        self.assertEqual(almacen_carrito.decodificar(None), {})
+
+
+class AlmacenesTests(TestCase):
+    """Los tres backends se comportan igual desde las vistas"""
+
+    def setUp(self):
+        categoria = Categorias.objects.create(nombre="Rones")
+        self.ron = Productos.objects.create(nombre="Ron", categoria=categoria, precio=10, stock=5, grados_alcohol=40)
+        self.gin = Productos.objects.create(nombre="Gin", categoria=categoria, precio=12, stock=5, grados_alcohol=40)
+        self.usuario = User.objects.create_user('comprador', password='clave-segura-123')
+        caches['carritos'].clear()
+
+    def _flujo(self):
+        self.client.get(reverse('agregar_carrito', args=['lic', self.ron.id]))
+        self.client.get(reverse('agregar_carrito', args=['lic', self.ron.id]))
+        self.client.get(reverse('agregar_carrito', args=['lic', self.gin.id]))
+        response = self.client.get(reverse('ver_carrito'))
+        self.assertEqual({(l.item, l.cantidad) for l in response.context['items']},
+                         {(self.ron, 2), (self.gin, 1)})
+        self.assertContains(response, '<span class="cart-badge">2</span>')
+
+        self.client.get(reverse('quitar_uno_carrito', args=['lic', self.ron.id]))
+        self.client.get(reverse('eliminar_item_carrito', args=['lic', self.gin.id]))
+        response = self.client.get(reverse('ver_carrito'))
+        self.assertEqual([(l.item, l.cantidad) for l in response.context['items']], [(self.ron, 1)])
+
+    def test_sesion_guarda_forma_compacta(self):
+        self._flujo()
+        self.assertEqual(self.client.session['cart'], f"l{self.ron.id}:1")
+
+    @override_settings(CART_STORE={'BACKEND': 'cache'})
+    def test_cache(self):
+        self._flujo()
+        self.assertNotIn('cart', self.client.session)
+
+    @override_settings(CART_STORE={'BACKEND': 'db'})
+    def test_bd(self):
+        self._flujo()
+        self.assertEqual(list(CarritoItem.objects.values_list('item_id', 'cantidad')), [(self.ron.id, 1)])
+
+    @override_settings(CART_STORE={'BACKEND': 'db'})
+    def test_bd_sumar_a_linea_existente_es_un_update(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('agregar_carrito', args=['lic', self.ron.id]))
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('agregar_carrito', args=['lic', self.ron.id]))
+        escrituras = [q['sql'] for q in ctx.captured_queries
+                      if 'licoreria_carritoitem' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(len(escrituras), 1)
+        self.assertTrue(escrituras[0].startswith('UPDATE'))
+        self.assertEqual(CarritoItem.objects.get().cantidad, 2)
+
+    def _fusion_al_iniciar_sesion(self):
+        # El usuario ya tenía un Gin de una visita anterior
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('agregar_carrito', args=['lic', self.gin.id]))
+        self.client.logout()
+
+        self.client.get(reverse('agregar_carrito', args=['lic', self.ron.id]))
+        self.client.get(reverse('agregar_carrito', args=['lic', self.gin.id]))
+        self.client.post(reverse('login'), {'username': 'comprador', 'password': 'clave-segura-123'})
+
+        response = self.client.get(reverse('ver_carrito'))
+        self.assertEqual({(l.item, l.cantidad) for l in response.context['items']},
+                         {(self.ron, 1), (self.gin, 2)})
+
+    @override_settings(CART_STORE={'BACKEND': 'db'})
+    def test_bd_fusiona_carrito_anonimo_al_iniciar_sesion(self):
+        self._fusion_al_iniciar_sesion()
+        self.assertEqual(Carrito.objects.get().usuario, self.usuario)
+
+    @override_settings(CART_STORE={'BACKEND': 'cache'})
+    def test_cache_fusiona_carrito_anonimo_al_iniciar_sesion(self):
+        self._fusion_al_iniciar_sesion()
+
+    @override_settings(CART_STORE={'BACKEND': 'cache'})
+    def test_cache_cambios_simultaneos_no_se_pierden(self):
+        request = SimpleNamespace(user=self.usuario, session={})
+        barrera = threading.Barrier(8)
+
+        def sumar(i):
+            almacen = almacen_carrito.AlmacenCache(request)
+            barrera.wait()
+            for _ in range(25):
+                almacen.incrementar(f"lic_{i % 4}")
+
+        hilos = [threading.Thread(target=sumar, args=(i,)) for i in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(almacen_carrito.AlmacenCache(request).obtener(), {f"lic_{i}": 50 for i in range(4)})
@@ -0,0 +1,125 @@
+import asyncio
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from licoreria import stub_apis
+from licoreria.cliente_http import Coalescedor, cocktaildb, off
+from licoreria.models import Cocteles
+
+
+class CoalescedorTests(SimpleTestCase):
+    def test_llamadas_identicas_comparten_resultado(self):
+        coalescedor = Coalescedor()
+        llamadas = []
+
+        async def cargar(clave):
+            llamadas.append(clave)
+            await asyncio.sleep(0.01)
+            return {'clave': clave}
+
+        async def escenario():
+            resultados = await asyncio.gather(*[coalescedor.ejecutar(c, lambda c=c: cargar(c)) for c in 'aaaab'])
+            return resultados, coalescedor.en_vuelo()
+
+        resultados, en_vuelo = asyncio.run(escenario())
+        self.assertEqual(sorted(llamadas), ['a', 'b'])
+        self.assertEqual(resultados[:4], [{'clave': 'a'}] * 4)
+        self.assertEqual(en_vuelo, 0)
+
+    def test_la_excepcion_tambien_se_comparte(self):
+        coalescedor = Coalescedor()
+
+        async def fallar():
+            await asyncio.sleep(0.01)
+            raise ValueError('caída')
+
+        async def escenario():
+            return await asyncio.gather(*[coalescedor.ejecutar('x', fallar) for _ in range(3)], return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, ValueError) for r in asyncio.run(escenario())))
+
+    def test_cancelacion(self):
+        coalescedor = Coalescedor()
+        estado = {'cancelada': False}
+
+        async def lenta():
+            try:
+                await asyncio.sleep(0.2)
+                return 'ok'
+            except asyncio.CancelledError:
+                estado['cancelada'] = True
+                raise
+
+        async def escenario():
+            # Uno de dos clientes se desconecta: el otro sigue recibiendo el resultado
+            primero = asyncio.create_task(coalescedor.ejecutar('k', lenta))
+            segundo = asyncio.create_task(coalescedor.ejecutar('k', lenta))
+            await asyncio.sleep(0.01)
+            primero.cancel()
+            resultado = await segundo
+
+            # Se desconectan todos: la tarea compartida se cancela
+            unico = asyncio.create_task(coalescedor.ejecutar('k', lenta))
+            await asyncio.sleep(0.01)
+            unico.cancel()
+            await asyncio.gather(unico, return_exceptions=True)
+            await asyncio.sleep(0)
+            return resultado, primero.cancelled()
+
+        resultado, primero_cancelado = asyncio.run(escenario())
+        self.assertEqual(resultado, 'ok')
+        self.assertTrue(primero_cancelado)
+        self.assertTrue(estado['cancelada'])
+
+
+class PilaAsincronaTests(SimpleTestCase):
+    def test_ningun_middleware_es_solo_sincrono(self):
+        # Con uno solo síncrono, bajo ASGI cada petición ocuparía un hilo y las vistas async no servirían de nada
+        for ruta in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(ruta), 'async_capable', False), f"{ruta} no acepta modo asíncrono")
+
+
+class VistasAsincronasTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = stub_apis.ServidorStub(catalogo=stub_apis.catalogo_sintetico(productos=30, cocteles=24)).iniciar()
+        cls.enterClassContext(override_settings(**cls.stub.settings()))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.detener()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['apis'].clear()
+        off.breaker.reiniciar()
+        cocktaildb.breaker.reiniciar()
+        self.stub.llamadas.clear()
+        self.stub.latencia = 0
+
+    async def test_busquedas_identicas_concurrentes_una_sola_llamada(self):
+        self.stub.latencia = 0.2
+        respuestas = await asyncio.gather(
+            *[self.async_client.get(reverse('buscar_licores_api'), {'q': 'reserva'}) for _ in range(8)],
+            *[self.async_client.get(reverse('buscar_cocteles_api'), {'q': 'margarita'}) for _ in range(4)],
+        )
+        self.assertEqual({r.status_code for r in respuestas}, {200})
+        self.assertEqual(len({tuple(p['id'] for p in r.json()) for r in respuestas[:8]}), 1)
+        self.assertEqual(self.stub.llamadas['/cgi/search.pl'], 1)
+        self.assertEqual(self.stub.llamadas['/search.php'], 1)
+
+    async def test_busquedas_distintas_no_se_unen(self):
+        await asyncio.gather(*[self.async_client.get(reverse('api_licores_off'), {'search': termino})
+                               for termino in ('ron', 'gin', 'vodka')])
+        self.assertEqual(self.stub.llamadas['/cgi/search.pl'], 3)
+
+    def test_post_lo_atiende_la_vista_drf(self):
+        datos = {'nombre': 'Mojito', 'id_externo': '11000', 'categoria': 'Cocktail', 'precio': '6.50', 'stock': 3}
+        self.assertEqual(self.client.post(reverse('api_cocteles'), datos, content_type='application/json').status_code, 201)
+        self.assertEqual(self.client.post(reverse('api_cocteles'), datos, content_type='application/json').status_code, 400)
+        self.assertEqual(Cocteles.objects.get(id_externo='11000').stock, 3)
@@ -0,0 +1,91 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from licoreria import auditoria
+from licoreria.models import AuditLog
+from licoreria.utils import log_action
+
+
+class AuditoriaBufferTests(TestCase):
+    def setUp(self):
+        auditoria.buffer.flush()
+        self.user = User.objects.create_user(username='bodega', password='password')
+
+    def _registrar(self, n, accion='Stock'):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(n):
+                log_action(self.user, f"{accion} {i}", 'Inventario')
+
+    @override_settings(AUDIT_LOG={'BATCH_SIZE': 5, 'FLUSH_INTERVAL': 60})
+    def test_acumula_y_guarda_en_lote(self):
+        self._registrar(4)
+        self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(len(auditoria.buffer), 4)
+
+        with self.assertNumQueries(1):
+            self._registrar(1)
+        self.assertEqual(AuditLog.objects.count(), 5)
+        self.assertEqual(len(auditoria.buffer), 0)
+
+    @override_settings(AUDIT_LOG={'BATCH_SIZE': 50, 'FLUSH_INTERVAL': 60})
+    def test_middleware_vacia_buffer_al_terminar_la_peticion(self):
+        self._registrar(2)
+        self.client.get('/')
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('accion', flat=True)),
+                         ['Stock 0', 'Stock 1'])
+
+    @override_settings(AUDIT_LOG={'BATCH_SIZE': 1})
+    def test_transaccion_revertida_no_registra(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    log_action(self.user, 'Pago', 'Ordenes')
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(len(auditoria.buffer), 0)
+        self.assertFalse(AuditLog.objects.exists())
+
+    @override_settings(AUDIT_LOG={'BATCH_SIZE': 50, 'MAX_PENDIENTES': 3})
+    def test_buffer_acotado(self):
+        with self.assertLogs('licoreria.auditoria', 'ERROR'):
+            self._registrar(5)
+        self.assertEqual(len(auditoria.buffer), 3)
+        auditoria.flush()
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('accion', flat=True)),
+                         ['Stock 2', 'Stock 3', 'Stock 4'])
+
+    @override_settings(AUDIT_LOG={'ENABLED': False})
+    def test_modo_sincrono(self):
+        log_action(self.user, 'Pago', 'Ordenes')
+        self.assertEqual(AuditLog.objects.get().usuario, self.user)
+
+
+class AuditoriaFallasTests(TransactionTestCase):
+    """Fuera de una transacción, como en el middleware o el hilo de fondo"""
+
+    def setUp(self):
+        auditoria.buffer.flush()
+        self.user = User.objects.create_user(username='bodega', password='password')
+
+    def _registrar(self, n, accion='Stock'):
+        for i in range(n):
+            log_action(self.user, f"{accion} {i}", 'Inventario')
+
+    @override_settings(AUDIT_LOG={'BATCH_SIZE': 50, 'MAX_REINTENTOS': 2})
+    def test_fila_invalida_no_bloquea_las_demas(self):
+        self._registrar(2)
+        auditoria.buffer.agregar(AuditLog(accion=None, modulo='Inventario'))  # viola NOT NULL
+        with self.assertLogs('licoreria.auditoria', 'ERROR'):
+            self.assertEqual(auditoria.flush(), 2)
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertEqual(len(auditoria.buffer), 1)
+
+        self._registrar(1, accion='Pago')
+        with self.assertLogs('licoreria.auditoria', 'ERROR') as logs:
+            self.assertEqual(auditoria.flush(), 1)
+        # Agotó sus intentos: se descarta
+        self.assertIn('Se descarta', logs.output[-1])
+        self.assertEqual(len(auditoria.buffer), 0)
+        self.assertEqual(AuditLog.objects.count(), 3)
@@ -0,0 +1,47 @@
+import unittest
+from pathlib import Path
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from config import basedatos
+
+
+class ConfiguracionTests(SimpleTestCase):
+    base = Path('/srv/licoreria')
+
+    def test_sqlite_por_defecto(self):
+        config = basedatos.configuracion(self.base, {})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], self.base / 'db.sqlite3')
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(config['OPTIONS']['timeout'], 20)
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA synchronous=NORMAL', config['OPTIONS']['init_command'])
+
+    def test_postgres_conexiones_persistentes(self):
+        config = basedatos.configuracion(self.base, {'DB_ENGINE': 'postgres', 'DB_NAME': 'tienda', 'DB_CONN_MAX_AGE': '300'})
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['NAME'], 'tienda')
+        self.assertEqual(config['CONN_MAX_AGE'], 300)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS'], {})
+
+    def test_postgres_con_pool(self):
+        config = basedatos.configuracion(self.base, {'DB_ENGINE': 'postgres', 'DB_POOL': '1', 'DB_POOL_MAX': '20'})
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+
+    def test_motor_desconocido(self):
+        with self.assertRaises(ValueError):
+            basedatos.configuracion(self.base, {'DB_ENGINE': 'oracle'})
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Perfil SQLite')
+class PragmasSqliteTests(TestCase):
+    def test_la_conexion_aplica_los_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.test import TestCase
+
+from licoreria import benchmark
+from licoreria.models import Clientes, DetallesOrdenes, LibroFidelidad, Ordenes, Productos
+
+
+class BenchmarkTests(TestCase):
+    volumenes = {'productos': 30, 'clientes': 10, 'ordenes': 60, 'recompensas': 10, 'multas': 5}
+
+    def _totales_sembrados(self):
+        with transaction.atomic():
+            benchmark.sembrar(self.volumenes, usuarios=2)
+            totales = list(Ordenes.objects.order_by('codigo_orden').values_list('cliente__email', 'estado', 'total'))
+            transaction.set_rollback(True)
+        return totales
+
+    def test_siembra(self):
+        ctx = benchmark.sembrar(self.volumenes, usuarios=2)
+        self.assertEqual(Productos.objects.count(), 30)
+        self.assertEqual(Ordenes.objects.count(), 60)
+        self.assertEqual(DetallesOrdenes.objects.count(), 60)
+        self.assertEqual(LibroFidelidad.objects.count(), 10)
+        self.assertEqual(Clientes.objects.filter(user__isnull=False).count(), 2)
+        self.assertEqual(len(ctx['compradores']), 2)
+
+    def test_misma_semilla_mismos_datos(self):
+        self.assertEqual(self._totales_sembrados(), self._totales_sembrados())
+
+    def test_reporte_en_proceso(self):
+        ctx = benchmark.sembrar(self.volumenes, usuarios=1)
+        reporte = benchmark.en_proceso(ctx, list(benchmark.ESCENARIOS), iteraciones=2, calentamiento=0)
+
+        self.assertEqual(set(reporte['pasos']), {paso for pasos in benchmark.ESCENARIOS.values() for paso, _, _ in pasos})
+        self.assertEqual(reporte['pasos']['procesar_orden']['peticiones'], 2)
+        self.assertGreater(reporte['pasos']['productos']['consultas'], 0)
+        self.assertGreater(reporte['throughput_rps'], 0)
+        self.assertEqual(Ordenes.objects.filter(codigo_orden__regex=r'^B[0-9]{7}$').count(), 60)  # los del checkout son hex y pueden empezar con B
+        self.assertEqual(Ordenes.objects.count(), 62)  # dos checkouts completos
+
+    def test_paso_de_busqueda_filtra_por_texto(self):
+        import random
+        benchmark.sembrar(self.volumenes, usuarios=1)
+        url = dict((p, f) for p, _, f in benchmark.ESCENARIOS['catalogo'])['productos_busqueda'](random.Random(1), {})
+        termino = url.split('busqueda=')[1]
+        response = self.client.get(url)
+        self.assertTrue(response.context['modo_busqueda'])
+        productos = list(response.context['productos_globales'])
+        self.assertTrue(productos)
+        self.assertLess(len(productos), 30)
+        self.assertTrue(all(termino in f"{p.nombre} {p.categoria.nombre}" for p in productos))
+
+    def test_comparar_con_baseline(self):
+        base = {'throughput_rps': 100, 'pasos': {'index': {'p95_ms': 10, 'consultas': 6}}}
+        igual = {'throughput_rps': 95, 'pasos': {'index': {'p95_ms': 11, 'consultas': 6}}}
+        peor = {'throughput_rps': 50, 'pasos': {'index': {'p95_ms': 20, 'consultas': 7}, 'nuevo': {'p95_ms': 1, 'consultas': 1}}}
+
+        self.assertEqual(benchmark.comparar(igual, base), [])
+        self.assertEqual(len(benchmark.comparar(peor, base)), 3)
@@ -0,0 +1,68 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from licoreria import cache_apis
+
+
+class CacheAPIsTests(TestCase):
+    def setUp(self):
+        caches['apis'].clear()
+        self.llamadas = 0
+
+    def cargar(self):
+        self.llamadas += 1
+        return {"version": self.llamadas}
+
+    def test_clave_normalizada(self):
+        self.assertEqual(cache_apis.clave_cache('off:busqueda', '  Ron  AÑEJO ', 'Ron'),
+                         cache_apis.clave_cache('off:busqueda', 'ron añejo', 'ron'))
+        self.assertNotEqual(cache_apis.clave_cache('off:busqueda', 'ron', ''),
+                            cache_apis.clave_cache('off:busqueda', 'ron', 'vodka'))
+
+    def test_respuesta_fresca_no_llama_a_la_api(self):
+        self.assertEqual(cache_apis.consultar('off:busqueda', 'whisky', self.cargar), {"version": 1})
+        self.assertEqual(cache_apis.consultar('off:busqueda', 'WHISKY', self.cargar), {"version": 1})
+        self.assertEqual(self.llamadas, 1)
+
+    def test_stale_while_revalidate(self):
+        clave = cache_apis.clave_cache('off:busqueda', 'ron')
+        cache_apis.backend().set(clave, (time.time() - 7200, {"version": 0}), 3600 * 24)
+
+        # Se sirve la copia vieja y se revalida en segundo plano
+        self.assertEqual(cache_apis.consultar('off:busqueda', 'ron', self.cargar, ttl=3600), {"version": 0})
+        for _ in range(50):
+            if cache_apis.backend().get(clave)[1] == {"version": 1}:
+                break
+            time.sleep(0.02)
+        self.assertEqual(cache_apis.consultar('off:busqueda', 'ron', self.cargar, ttl=3600), {"version": 1})
+        self.assertEqual(self.llamadas, 1)
+
+    def test_backend_sqlite_persistente_con_lru(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / 'cache.sqlite3'
+            with override_settings(EXTERNAL_API_CACHE={'BACKEND': 'sqlite', 'PATH': ruta, 'MAX_ENTRIES': 2}):
+                cache_apis.consultar('off:busqueda', 'ron', self.cargar)
+                cache_apis.consultar('off:busqueda', 'vodka', self.cargar)
+                cache_apis.consultar('off:busqueda', 'ron', self.cargar)  # acceso: vodka pasa a ser el menos reciente
+                cache_apis.consultar('off:busqueda', 'gin', self.cargar)
+                self.assertEqual(self.llamadas, 3)
+
+                otro = cache_apis.BackendSQLite(ruta, 2)  # nueva conexión: los datos persisten
+                self.assertIsNotNone(otro.get(cache_apis.clave_cache('off:busqueda', 'ron')))
+                self.assertIsNone(otro.get(cache_apis.clave_cache('off:busqueda', 'vodka')))
+
+    def test_busqueda_ean_usa_ttl_largo(self):
+        producto = {"product": {"product_name": "Heineken", "code": "40822938"}}
+        with mock.patch('licoreria.api_views.off.get_json', return_value=producto) as get_json, \
+                mock.patch('licoreria.api_views.cache_apis.consultar', wraps=cache_apis.consultar) as consultar:
+            for _ in range(2):
+                response = self.client.get(reverse('api_licores_off'), {'search': '40822938'})
+                self.assertEqual(response.json()['results'][0]['nombre'], 'Heineken')
+        self.assertEqual(get_json.call_count, 1)
+        self.assertEqual(consultar.call_args.kwargs['ttl'], cache_apis.ttl_ean())
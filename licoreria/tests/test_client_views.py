@@ -35,3 +35,51 @@ class ClienteListTest(TestCase):
         
         # Verify admin client is NOT present
         self.assertNotIn(self.admin_cliente, clientes_ctx)
+
+
+class PerfilClienteTest(TestCase):
+    def setUp(self):
+        from django.test import RequestFactory
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(username='cli', password='password', email='cli@example.com')
+
+    def _request(self):
+        request = self.factory.get('/')
+        request.user = self.user
+        return request
+
+    def test_prefiere_user_id_y_memoriza_en_la_peticion(self):
+        from licoreria.views import get_cliente_perfil
+        # Otro registro con el mismo email que no es el vinculado al usuario
+        Clientes.objects.create(nombre="Por email", email="cli@example.com")
+        vinculado = Clientes.objects.create(user=self.user, nombre="Vinculado", email="otro@example.com")
+
+        request = self._request()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_cliente_perfil(request), vinculado)
+            self.assertEqual(get_cliente_perfil(request, crear=False), vinculado)
+
+    def test_respaldo_por_email_una_sola_vez(self):
+        from licoreria.views import get_cliente_perfil
+        legado = Clientes.objects.create(nombre="Legado", email="cli@example.com")
+        request = self._request()
+        with self.assertNumQueries(2):  # user_id, luego email
+            self.assertEqual(get_cliente_perfil(request), legado)
+            get_cliente_perfil(request)
+
+    def test_sin_perfil_no_repite_consultas(self):
+        from licoreria.views import get_cliente_perfil
+        request = self._request()
+        with self.assertNumQueries(2):
+            self.assertIsNone(get_cliente_perfil(request))
+            self.assertIsNone(get_cliente_perfil(request))
+
+    def test_detalle_cliente_no_se_autoriza_por_email(self):
+        # El perfil legado con su mismo email no está vinculado a su usuario: no puede verlo
+        legado = Clientes.objects.create(nombre="Legado", email="cli@example.com")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('detalle_cliente', args=[legado.id]))
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
+
+        propio = Clientes.objects.create(user=self.user, nombre="Propio", email="otro@example.com")
+        self.assertEqual(self.client.get(reverse('detalle_cliente', args=[propio.id])).status_code, 200)
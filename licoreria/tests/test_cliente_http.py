@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from licoreria.cliente_http import ClienteHTTP, LimitadorTasa, ServicioNoDisponible, cocktaildb
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Servidor local mínimo: /search.php responde un trago, /caido responde 503"""
+    llamadas = []
+
+    def do_GET(self):
+        StubHandler.llamadas.append(self.path)
+        if self.path.startswith('/search.php'):
+            body = json.dumps({"drinks": [{"idDrink": "11007", "strDrink": "Margarita",
+                                           "strIngredient1": "Tequila", "strMeasure1": "1 1/2 oz"}]})
+            self.send_response(200)
+        else:
+            body = json.dumps({"error": "caido"})
+            self.send_response(503)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class ClienteHTTPTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubHandler.llamadas = []
+        cocktaildb.breaker.reiniciar()
+        caches['apis'].clear()
+
+    def _cliente(self, **settings):
+        with override_settings(STUB_BASE_URL=self.base_url, **settings):
+            return ClienteHTTP('Stub', 'STUB_BASE_URL', self.base_url)
+
+    def test_vista_usa_cliente_compartido_contra_stub(self):
+        with override_settings(COCKTAILDB_BASE_URL=self.base_url):
+            response = self.client.get(reverse('buscar_cocteles_api'), {'q': 'margarita'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['nombre'], 'Margarita')
+        self.assertTrue(StubHandler.llamadas[0].startswith('/search.php?s=margarita'))
+
+    def test_reintenta_errores_5xx(self):
+        cliente = self._cliente(EXTERNAL_API_RETRIES=2, EXTERNAL_API_BREAKER_FAILURES=10)
+        response = cliente.get('caido')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(StubHandler.llamadas), 3)  # intento original + 2 reintentos
+
+    def test_breaker_se_abre_y_falla_rapido(self):
+        cliente = self._cliente(EXTERNAL_API_RETRIES=0, EXTERNAL_API_BREAKER_FAILURES=2,
+                                EXTERNAL_API_BREAKER_COOLDOWN=60)
+        cliente.get('caido')
+        cliente.get('caido')
+        self.assertTrue(cliente.breaker.abierto)
+        with self.assertRaises(ServicioNoDisponible):
+            cliente.get('search.php', params={'s': 'x'})
+        self.assertEqual(len(StubHandler.llamadas), 2)
+
+    def test_vista_responde_503_con_breaker_abierto(self):
+        for _ in range(cocktaildb.breaker.max_fallos):
+            cocktaildb.breaker.registrar_fallo()
+        response = self.client.get(reverse('buscar_cocteles_api'), {'q': 'margarita'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(StubHandler.llamadas, [])
+
+    def test_get_concurrente_conserva_orden(self):
+        cliente = self._cliente(EXTERNAL_API_RETRIES=0, EXTERNAL_API_BREAKER_FAILURES=10)
+        respuestas = cliente.get_concurrente([('search.php', {'s': 'a'}), ('caido', None), ('search.php', {'s': 'b'})])
+        self.assertEqual([r.status_code for r in respuestas], [200, 503, 200])
+
+    def test_limitador_espacia_las_peticiones(self):
+        cliente = self._cliente()
+        inicio = time.monotonic()
+        respuestas = cliente.get_concurrente([('search.php', {'s': letra}) for letra in 'abcde'], max_workers=5,
+                                             limitador=LimitadorTasa(25))
+        self.assertEqual([r.status_code for r in respuestas], [200] * 5)
+        self.assertGreaterEqual(time.monotonic() - inicio, 4 / 25)
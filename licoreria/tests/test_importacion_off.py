@@ -0,0 +1,123 @@
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from licoreria import busqueda, importacion_off
+from licoreria.models import Categorias, Marcas, Productos
+
+ALCOHOL = ['en:beverages', 'en:alcoholic-beverages', 'en:spirits']
+
+
+def producto_off(codigo, nombre, marca='Havana Club', tags=('en:rums',), grados=40):
+    return {'code': codigo, 'product_name': nombre, 'brands': marca, 'categories': 'Bebidas, Rones',
+            'categories_tags': ALCOHOL + list(tags), 'origins': 'Cuba', 'nutriments': {'alcohol_100g': grados},
+            'image_url': f'https://images.openfoodfacts.org/{codigo}.jpg'}
+
+
+class ImportacionOFFTests(TestCase):
+    def setUp(self):
+        self.directorio = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def _jsonl(self, productos, nombre='volcado.jsonl'):
+        ruta = self.directorio / nombre
+        lineas = '\n'.join(json.dumps(p) for p in productos) + '\n'
+        if ruta.suffix == '.gz':
+            with gzip.open(ruta, 'wt') as archivo:
+                archivo.write(lineas)
+        else:
+            ruta.write_text(lineas)
+        return ruta
+
+    def test_filtra_alcoholicas_y_resuelve_marcas_y_categorias(self):
+        ruta = self._jsonl([
+            producto_off('1001', 'Añejo 7', tags=['en:rums']),
+            {'code': '2002', 'product_name': 'Jugo de naranja', 'categories_tags': ['en:beverages', 'en:juices']},
+            producto_off('1002', 'Gin Seco', marca='Beefeater, Pernod', tags=['en:gins'], grados=47),
+            producto_off('', 'Sin código'),
+        ], nombre='volcado.jsonl.gz')
+        stats = importacion_off.ImportadorOFF(batch_size=10).importar(ruta)
+
+        self.assertEqual((stats['lineas'], stats['alcoholicas'], stats['creados'], stats['invalidas']), (4, 2, 2, 1))
+        gin = Productos.objects.select_related('marca', 'categoria').get(codigo_barras='1002')
+        self.assertEqual((gin.marca.nombre, gin.categoria.nombre, gin.grados_alcohol, gin.stock), ('BEEFEATER', 'Gins', 47, 0))
+        self.assertGreater(gin.precio, 0)
+        self.assertEqual(busqueda.buscar_ids(busqueda.PRODUCTO, 'anejo'), [Productos.objects.get(codigo_barras='1001').pk])
+
+    def test_csv_de_off(self):
+        ruta = self.directorio / 'productos.csv'
+        ruta.write_text(
+            'code\tproduct_name\tbrands\tcategories\tcategories_tags\torigins\timage_url\talcohol_100g\n'
+            f'3001\tMalbec Reserva\tTrapiche\tVinos\t{",".join(ALCOHOL[:2])},en:red-wines\tArgentina\t\t13.5\n'
+            '3002\tAgua mineral\tGüitig\tAguas\ten:beverages,en:waters\tEcuador\t\t\n'
+        )
+        stats = importacion_off.ImportadorOFF().importar(ruta)
+
+        self.assertEqual(stats['creados'], 1)
+        vino = Productos.objects.get(codigo_barras='3001')
+        self.assertEqual((vino.categoria.nombre, str(vino.grados_alcohol), vino.origen), ('Red Wines', '13.5', 'Argentina'))
+
+    def test_upsert_conserva_precio_y_stock(self):
+        marca = Marcas.objects.create(nombre='HAVANA CLUB')
+        existente = Productos.objects.create(nombre='Añejo 7', marca=marca, codigo_barras='1001', precio=25, stock=12,
+                                             grados_alcohol=38)
+        ruta = self._jsonl([producto_off('1001', 'Añejo 7 Años', grados=40), producto_off('1001', 'Añejo 7 Años', grados=40)])
+        stats = importacion_off.ImportadorOFF().importar(ruta)
+
+        existente.refresh_from_db()
+        self.assertEqual((stats['creados'], stats['actualizados']), (0, 1))
+        self.assertEqual((existente.nombre, existente.grados_alcohol, existente.precio, existente.stock),
+                         ('Añejo 7 Años', 40, 25, 12))
+        self.assertEqual(Productos.objects.count(), 1)
+
+    def test_omite_nombre_y_marca_de_otro_codigo(self):
+        ruta = self._jsonl([producto_off('1001', 'Añejo 7'), producto_off('1002', 'Añejo 7')])
+        stats = importacion_off.ImportadorOFF().importar(ruta)
+        self.assertEqual((stats['creados'], stats['omitidos']), (1, 1))
+
+    def test_omite_nombre_y_marca_de_un_producto_sin_codigo(self):
+        marca = Marcas.objects.create(nombre='ABUELO')
+        Productos.objects.create(nombre='Ron Viejo', marca=marca, codigo_barras=None, precio=20, stock=3, grados_alcohol=40)
+        ruta = self._jsonl([producto_off('1001', 'Ron Viejo', marca='Abuelo'), producto_off('1002', 'Ron Nuevo', marca='Abuelo')])
+        stats = importacion_off.ImportadorOFF().importar(ruta)
+        self.assertEqual((stats['creados'], stats['omitidos']), (1, 1))
+        self.assertIsNone(Productos.objects.get(nombre='Ron Viejo').codigo_barras)
+
+    def test_consultas_por_lote_acotadas(self):
+        ruta = self._jsonl([producto_off(str(1000 + i), f'Ron {i}', marca=f'Marca {i % 7}', tags=[f'en:rum-{i % 3}'])
+                            for i in range(200)])
+        importador = importacion_off.ImportadorOFF(batch_size=100)
+        with CaptureQueriesContext(connection) as consultas:
+            importador.importar(ruta)
+        # Por lote: marcas/categorías nuevas (2+2), existentes, upsert, lectura e índice (3), más el savepoint
+        self.assertLessEqual(len(consultas), 2 * 12)
+        self.assertEqual((Productos.objects.count(), Marcas.objects.count(), Categorias.objects.count()), (200, 7, 3))
+
+    def test_reanuda_desde_el_checkpoint(self):
+        ruta = self._jsonl([producto_off(str(1000 + i), f'Ron {i}') for i in range(10)])
+        checkpoint = importacion_off.Checkpoint(self.directorio / 'volcado.checkpoint.json', ruta)
+        importacion_off.ImportadorOFF(batch_size=4, checkpoint=checkpoint).importar(ruta, limite=4)
+        offset, stats = checkpoint.cargar()
+        self.assertEqual(stats['creados'], 4)
+
+        salida = StringIO()
+        call_command('importar_off', str(ruta), '--reanudar', '--lote', '4',
+                     '--checkpoint', str(checkpoint.ruta), stdout=salida)
+        self.assertIn(f'Reanudando desde el byte {offset}', salida.getvalue())
+        self.assertIn('10 productos nuevos', salida.getvalue())  # los contadores siguen desde el checkpoint
+        self.assertEqual(Productos.objects.count(), 10)
+        self.assertFalse(checkpoint.ruta.exists())
+
+    def test_checkpoint_de_otro_archivo(self):
+        ruta = self._jsonl([producto_off('1001', 'Ron')])
+        checkpoint = importacion_off.Checkpoint(self.directorio / 'c.json', ruta)
+        checkpoint.guardar(10, {})
+        ruta.write_text('')
+        with self.assertRaises(ValueError):
+            checkpoint.cargar()
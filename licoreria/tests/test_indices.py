@@ -0,0 +1,93 @@
+"""
+Regresión de planes de consulta: las vistas filtran por columnas con índice.
+
+Se capturan las consultas SQL de cada vista y se pasan por EXPLAIN QUERY PLAN;
+si un cambio en la vista o en el modelo deja de usar el índice, falla aquí.
+"""
+import unittest
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from licoreria.models import (AuditLog, Categorias, Clientes, LibroFidelidad, Multas, Ordenes, Productos,
+                              Recompensas)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN es de SQLite')
+class IndicesFiltrosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('cliente', password='password')
+        cls.cliente = Clientes.objects.create(user=cls.usuario, nombre="Cliente", email="cliente@example.com")
+        cls.usuario.groups.add(Group.objects.create(name='Cliente'))
+        cls.admin = User.objects.create_user('admin', password='password', is_staff=True)
+        cls.admin.groups.add(Group.objects.create(name='Administrador'))
+
+        categoria = Categorias.objects.create(nombre="Rones")
+        Productos.objects.create(nombre="Ron", categoria=categoria, precio=10, stock=3, grados_alcohol=40)
+        for codigo, estado in (('ORD1', 'SOLI'), ('ORD2', 'PREST'), ('ORD3', 'PAGD')):
+            Ordenes.objects.create(cliente=cls.cliente, codigo_orden=codigo, estado=estado, pagada=estado == 'PAGD')
+        Multas.objects.create(cliente=cls.cliente, tipo='DEVOL', monto=5)
+        Recompensas.objects.create(cliente=cls.cliente, tipo='DES', descripcion="Descuento", valor=5)
+        AuditLog.objects.create(usuario=cls.admin, accion='Prueba')
+
+    def setUp(self):
+        cache.clear()
+
+    def _planes(self, tabla, funcion):
+        """Plan de cada consulta de `funcion` que lee `tabla`"""
+        with CaptureQueriesContext(connection) as ctx:
+            funcion()
+        planes = []
+        with connection.cursor() as cursor:
+            for consulta in ctx.captured_queries:
+                sql = consulta['sql']
+                if sql.startswith('SELECT') and f'"{tabla}"' in sql:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                    planes.append(' | '.join(fila[-1] for fila in cursor.fetchall()))
+        self.assertTrue(planes, f"no se consultó {tabla}")
+        return planes
+
+    def _vista(self, usuario, url):
+        def get():
+            self.client.force_login(usuario)
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return get
+
+    def assertUsaIndice(self, indice, tabla, funcion):
+        planes = self._planes(tabla, funcion)
+        self.assertTrue(any(indice in plan for plan in planes), '\n'.join(planes))
+
+    def test_ordenes_del_cliente_por_estado(self):
+        for nombre in ('mis_solicitudes', 'mis_prestamos'):
+            with self.subTest(nombre):
+                self.assertUsaIndice('orden_cliente_estado_idx', 'licoreria_ordenes',
+                                     self._vista(self.usuario, reverse(nombre)))
+
+    def test_solicitudes_por_estado_y_fecha(self):
+        self.assertUsaIndice('orden_estado_fecha_idx', 'licoreria_ordenes',
+                             self._vista(self.admin, reverse('gestion_solicitudes')))
+
+    def test_ordenes_impagas(self):
+        self.assertUsaIndice('orden_impaga_idx', 'licoreria_ordenes', self._vista(self.admin, reverse('ordenes')))
+
+    def test_dashboard(self):
+        self.assertUsaIndice('orden_pagada_fecha_idx', 'licoreria_ordenes', self._vista(self.admin, reverse('index')))
+        cache.clear()
+        self.assertUsaIndice('producto_stock_idx', 'licoreria_productos', self._vista(self.admin, reverse('index')))
+
+    def test_recompensas_del_cliente(self):
+        self.assertUsaIndice('recompensa_cliente_idx', 'licoreria_recompensas',
+                             self._vista(self.usuario, reverse('mis_recompensas')))
+
+    def test_multas_impagas(self):
+        self.assertUsaIndice('multa_impaga_idx', 'licoreria_multas',
+                             lambda: LibroFidelidad.calcular_saldos([self.cliente.pk]))
+
+    def test_auditoria(self):
+        self.assertUsaIndice('auditlog_fecha_idx', 'licoreria_auditlog',
+                             self._vista(self.admin, reverse('auditoria_logs')))
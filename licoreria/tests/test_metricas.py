@@ -0,0 +1,118 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from licoreria import metricas
+from licoreria.models import Categorias, Clientes, Cocteles, Productos, Recompensas
+from licoreria.tests.presupuesto import PresupuestoConsultasMixin
+
+# Techo de consultas por vista, con N productos / recompensas en juego
+PRESUPUESTOS = {
+    'index': 7,
+    'productos': 5,
+    'ver_carrito': 5,
+    'gestion_recompensas': 4,
+}
+
+
+class PresupuestoConsultasTests(PresupuestoConsultasMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin', password='password')
+        self.admin.groups.add(Group.objects.create(name='Administrador'))
+        self.usuario = User.objects.create_user('cliente', password='password')
+        self.usuario.groups.add(Group.objects.create(name='Cliente'))
+
+    def _datos(self, n):
+        categoria = Categorias.objects.create(nombre=f"Categoría {n}")
+        productos = [Productos.objects.create(nombre=f"Ron {n}-{i}", categoria=categoria, precio=10, stock=5,
+                                              grados_alcohol=40) for i in range(n)]
+        coctel = Cocteles.objects.create(nombre=f"Mojito {n}", precio=5, stock=5)
+        for i in range(n):
+            cliente = Clientes.objects.create(nombre=f"Cliente {n}-{i}", email=f"c{n}-{i}@example.com")
+            Recompensas.objects.create(cliente=cliente, tipo='DES', descripcion="Canje", valor=5,
+                                       estado_solicitud='PEND', solicitada_por_cliente=True)
+        return productos, coctel
+
+    def _recorrer(self, productos, coctel):
+        self.client.force_login(self.usuario)
+        session = self.client.session
+        session['cart'] = ','.join([f"l{p.id}:1" for p in productos] + [f"c{coctel.id}:1"])
+        session.save()
+        for nombre in ('productos', 'ver_carrito'):
+            with self.subTest(nombre):
+                self.assertPresupuestoConsultas(PRESUPUESTOS[nombre], reverse(nombre))
+
+        self.client.force_login(self.admin)
+        for nombre in ('index', 'gestion_recompensas'):
+            with self.subTest(nombre):
+                cache.clear()
+                self.assertPresupuestoConsultas(PRESUPUESTOS[nombre], reverse(nombre))
+
+    def test_vistas_dentro_del_presupuesto_sin_importar_el_volumen(self):
+        self._recorrer(*self._datos(2))
+        self._recorrer(*self._datos(8))
+
+    def test_el_helper_falla_al_pasarse(self):
+        self.client.force_login(self.admin)
+        with self.assertRaisesMessage(AssertionError, 'presupuesto 0'):
+            self.assertPresupuestoConsultas(0, reverse('index'))
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metricas.registro.limpiar()
+        self.admin = User.objects.create_user('admin', password='password')
+        self.admin.groups.add(Group.objects.create(name='Administrador'))
+        self.client.force_login(self.admin)
+
+    def test_registra_consultas_render_y_latencia_por_vista(self):
+        for _ in range(3):
+            self.client.get(reverse('auditoria_logs'))
+        response = self.client.get(reverse('metricas_vistas'))
+        self.assertEqual(response.status_code, 200)
+
+        datos = response.json()['vistas']['auditoria_logs']
+        self.assertEqual(datos['peticiones'], 3)
+        self.assertGreater(datos['consultas_max'], 0)
+        self.assertGreater(datos['plantillas_ms_promedio'], 0)
+        self.assertGreaterEqual(datos['total_ms_promedio'], datos['sql_ms_promedio'] + datos['plantillas_ms_promedio'])
+        self.assertEqual(sum(datos['histograma_ms'].values()), 3)
+
+    @override_settings(REQUEST_METRICS={'WINDOW': 2, 'BUCKETS_MS': [1, 100000]})
+    def test_ventana_movil(self):
+        metricas.registro = metricas.RegistroMetricas()
+        try:
+            for _ in range(4):
+                self.client.get(reverse('auditoria_logs'))
+            datos = metricas.registro.resumen()['auditoria_logs']
+        finally:
+            metricas.registro = metricas.RegistroMetricas()
+        self.assertEqual(datos['peticiones'], 2)
+        self.assertEqual(set(datos['histograma_ms']), {'<=1', '<=100000', '>100000'})
+
+    def test_cuenta_consultas_de_otros_hilos(self):
+        # Como las de una vista asíncrona: sync_to_async lleva el contexto de la medición al hilo
+        def consultar():
+            try:
+                return Productos.objects.count()
+            finally:
+                connection.close()
+
+        with metricas.medir() as medicion:
+            async_to_sync(sync_to_async(consultar, thread_sensitive=False))()
+        self.assertEqual(medicion.consultas, 1)
+
+    def test_solo_administradores(self):
+        self.client.force_login(User.objects.create_user('otro', password='password'))
+        response = self.client.get(reverse('metricas_vistas'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_desactivado(self):
+        self.client.get(reverse('auditoria_logs'))
+        self.assertEqual(metricas.registro.resumen(), {})
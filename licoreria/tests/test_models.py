@@ -21,3 +21,78 @@ class ModelTests(TestCase):
     def test_producto_creacion(self):
         self.assertEqual(self.producto.stock, 100)
         self.assertEqual(self.producto.categoria, self.categoria)
+
+
+class LibroFidelidadTests(TestCase):
+    def setUp(self):
+        from licoreria.models import Clientes
+        self.cliente = Clientes.objects.create(nombre="Ana", email="ana@example.com", telefono="099")
+
+    def _cliente(self):
+        from licoreria.models import Clientes
+        return Clientes.objects.get(pk=self.cliente.pk)
+
+    def test_libro_se_actualiza_con_ordenes_recompensas_y_multas(self):
+        from decimal import Decimal
+        from licoreria.models import Ordenes, Recompensas, Multas
+        Ordenes.objects.create(cliente=self.cliente, codigo_orden='ORD1', total=Decimal('120.00'), pagada=True, estado='PAGD')
+        orden_prestamo = Ordenes.objects.create(cliente=self.cliente, codigo_orden='ORD2', total=Decimal('30.00'), estado='PREST')
+        Recompensas.objects.create(cliente=self.cliente, descripcion="Cupón", valor=5, costo_puntos=4)
+        Multas.objects.create(cliente=self.cliente, orden=orden_prestamo, monto=Decimal('7.50'), descripcion="Atraso")
+
+        cliente = self._cliente()
+        self.assertEqual(cliente.total_gastado(), Decimal('120.00'))
+        self.assertEqual(cliente.puntos_totales_ganados, 12)
+        self.assertEqual(cliente.puntos_actuales_calculados, 8)
+        self.assertEqual(cliente.deuda_ordenes_pendientes, Decimal('30.00'))
+        self.assertEqual(cliente.total_deuda_multas(), Decimal('7.50'))
+        self.assertEqual(cliente.limite_credito_calculado, Decimal('68.00'))
+
+        # Al pagar la orden, su multa deja de contar como deuda
+        orden_prestamo.pagada = True
+        orden_prestamo.save()
+        cliente = self._cliente()
+        self.assertEqual(cliente.total_gastado(), Decimal('150.00'))
+        self.assertEqual(cliente.deuda_ordenes_pendientes, Decimal('0.00'))
+        self.assertEqual(cliente.total_deuda_multas(), Decimal('0.00'))
+
+    def test_reasignar_a_otro_cliente_refresca_los_dos_libros(self):
+        from decimal import Decimal
+        from licoreria.models import Clientes, Multas, Ordenes, Recompensas
+        otro = Clientes.objects.create(nombre="Beto", email="beto@example.com", telefono="098")
+        orden = Ordenes.objects.create(cliente=self.cliente, codigo_orden='ORD4', total=Decimal('50.00'), pagada=True, estado='PAGD')
+        recompensa = Recompensas.objects.create(cliente=self.cliente, descripcion="Cupón", valor=5, costo_puntos=2)
+        multa = Multas.objects.create(cliente=self.cliente, monto=Decimal('3.00'), descripcion="Atraso")
+
+        for fila in (orden, recompensa, multa):
+            fila.cliente = otro
+            fila.save()
+
+        cliente, otro = self._cliente(), Clientes.objects.get(pk=otro.pk)
+        self.assertEqual((cliente.total_gastado(), cliente.total_deuda_multas()), (Decimal('0.00'), Decimal('0.00')))
+        self.assertEqual(cliente.puntos_actuales_calculados, 0)
+        self.assertEqual((otro.total_gastado(), otro.total_deuda_multas()), (Decimal('50.00'), Decimal('3.00')))
+        self.assertEqual(otro.puntos_actuales_calculados, 3)
+
+    def test_lecturas_del_libro_no_consultan_agregados(self):
+        cliente = self._cliente()
+        cliente.obtener_libro()
+        with self.assertNumQueries(0):
+            cliente.puntos_actuales_calculados
+            cliente.limite_credito_calculado
+            cliente.total_gastado()
+
+    def test_comando_reconstruir_corrige_desvios(self):
+        from decimal import Decimal
+        from io import StringIO
+        from django.core.management import call_command
+        from licoreria.models import LibroFidelidad, Ordenes
+        Ordenes.objects.create(cliente=self.cliente, codigo_orden='ORD3', total=Decimal('40.00'), pagada=True, estado='PAGD')
+        LibroFidelidad.objects.filter(cliente=self.cliente).delete()
+
+        call_command('reconstruir_fidelidad', stdout=StringIO())
+        self.assertEqual(self._cliente().libro_fidelidad.total_gastado, Decimal('40.00'))
+
+        LibroFidelidad.objects.filter(cliente=self.cliente).update(total_gastado=1)
+        call_command('reconstruir_fidelidad', stdout=StringIO())
+        self.assertEqual(self._cliente().libro_fidelidad.total_gastado, Decimal('40.00'))
@@ -0,0 +1,230 @@
+import random
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from licoreria import reservas
+from licoreria.carrito import cargar_carrito
+from licoreria.models import Categorias, Clientes, Cocteles, Ordenes, Productos, ReservaStock
+
+
+class ReservasTests(TestCase):
+    def setUp(self):
+        categoria = Categorias.objects.create(nombre="Whisky")
+        self.producto = Productos.objects.create(nombre="Single Malt", categoria=categoria, precio=50,
+                                                 stock=3, grados_alcohol=40)
+        self.coctel = Cocteles.objects.create(nombre="Old Fashioned", precio=8, stock=2)
+
+    def _lineas(self, cant_producto, cant_coctel=0):
+        carrito = {f"lic_{self.producto.id}": cant_producto}
+        if cant_coctel:
+            carrito[f"coc_{self.coctel.id}"] = cant_coctel
+        return cargar_carrito(carrito)
+
+    def test_reserva_aparta_stock_para_otros_carritos(self):
+        reservas.reservar(self._lineas(2, 2), 'carrito-a')
+        self.assertEqual(reservas.disponibles('lic', [self.producto.id], 'carrito-b'), {self.producto.id: 1})
+        self.assertEqual(reservas.disponibles('lic', [self.producto.id], 'carrito-a'), {self.producto.id: 3})
+
+        with self.assertRaises(reservas.StockInsuficiente) as ctx:
+            reservas.reservar(self._lineas(2), 'carrito-b')
+        self.assertEqual(ctx.exception.disponibles, 1)
+        with self.assertRaises(reservas.StockInsuficiente):
+            reservas.descontar_stock(self._lineas(0, 1), 'carrito-b')
+
+        # El dueño de la reserva sí puede comprar, y al liberar queda todo disponible
+        reservas.descontar_stock(self._lineas(2, 2), 'carrito-a')
+        reservas.liberar('carrito-a')
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 1)
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_reserva_vencida_no_cuenta(self):
+        reservas.reservar(self._lineas(3), 'carrito-a')
+        ReservaStock.objects.update(expira_en=timezone.now() - timedelta(seconds=1))
+        reservas.reservar(self._lineas(3), 'carrito-b')
+        # La reserva vencida se purga al reservar
+        self.assertEqual(list(ReservaStock.objects.values_list('clave', flat=True)), ['carrito-b'])
+
+    def test_reservar_de_nuevo_reemplaza_la_reserva_propia(self):
+        reservas.reservar(self._lineas(3), 'carrito-a')
+        reservas.reservar(self._lineas(1), 'carrito-a')
+        self.assertEqual(ReservaStock.objects.get().cantidad, 1)
+
+    def test_version_detecta_escritura_concurrente(self):
+        leido = Productos.objects.get(pk=self.producto.pk)
+        Productos.objects.filter(pk=self.producto.pk).update(version=leido.version + 1)
+        with self.assertRaises(reservas._Conflicto):
+            reservas._subir_versiones(Productos, [leido])
+
+    def test_detalles_fuera_del_checkout_no_pisan_el_stock(self):
+        from licoreria.models import DetallesOrdenes
+        cliente = Clientes.objects.create(nombre="Cliente", email="cliente@example.com")
+        orden = Ordenes.objects.create(cliente=cliente, codigo_orden='ADM1', total=0)
+        detalle = DetallesOrdenes.objects.create(orden=orden, producto=self.producto, cantidad=1, precio_unitario=50)
+        detalle = DetallesOrdenes.objects.select_related('producto').get(pk=detalle.pk)
+        leido = Productos.objects.get(pk=self.producto.pk)
+        # Un checkout descuenta mientras el detalle (con su producto viejo en memoria) se borra
+        reservas.descontar_stock(self._lineas(1))
+        detalle.delete()
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 2)
+        self.assertEqual(self.producto.version, leido.version + 2)
+        with self.assertRaises(reservas._Conflicto):
+            reservas._subir_versiones(Productos, [leido])
+
+    @mock.patch.object(reservas, 'REINTENTOS_OPTIMISTAS', 2)
+    def test_reintentos_agotados_no_se_informan_como_falta_de_stock(self):
+        with mock.patch.object(reservas, '_subir_versiones', side_effect=reservas._Conflicto):
+            with self.assertRaises(reservas.ReservaEnConflicto):
+                reservas.reservar(self._lineas(1, 1), 'carrito-a')
+            # Si además falta stock se informa la línea que no alcanza, no la primera del carrito
+            with self.assertRaises(reservas.StockInsuficiente) as ctx:
+                reservas.reservar(self._lineas(1, 3), 'carrito-a')
+        self.assertEqual((ctx.exception.item, ctx.exception.disponibles), (self.coctel, 2))
+
+    def test_factura_previa_reserva_y_compra_libera(self):
+        user = User.objects.create_user(username='cliente', password='password')
+        Clientes.objects.create(user=user, nombre="Cliente", email="cliente@example.com")
+        self.client.force_login(user)
+        session = self.client.session
+        session['cart'] = {f"lic_{self.producto.id}": 2}
+        session.save()
+
+        self.client.get(reverse('previsualizar_factura'))
+        self.assertEqual(ReservaStock.objects.get().cantidad, 2)
+        self.client.get(reverse('procesar_orden', args=['PAGO']))
+        self.assertFalse(ReservaStock.objects.exists())
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 1)
+
+
+def martillar(funcion, hilos):
+    """
+    Ejecuta `funcion(i)` en `hilos` hilos que arrancan a la vez (barrera).
+    Retorna la lista de resultados o excepciones. Cada hilo cierra su conexión.
+    """
+    barrera = threading.Barrier(hilos)
+    resultados = [None] * hilos
+
+    def correr(i):
+        try:
+            barrera.wait()
+            resultados[i] = funcion(i)
+        except Exception as e:
+            resultados[i] = e
+        finally:
+            connection.close()
+
+    trabajadores = [threading.Thread(target=correr, args=(i,)) for i in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    return resultados
+
+
+class CheckoutConcurrenteTests(TransactionTestCase):
+    """Muchos checkouts simultáneos sobre un stock chico: nunca se vende más de lo que hay"""
+    HILOS = 12
+    STOCK = 5
+
+    def setUp(self):
+        self.producto = Productos.objects.create(nombre="Última Botella", precio=30, stock=self.STOCK,
+                                                 grados_alcohol=40)
+
+    def _reintentar(self, paso):
+        # La base en memoria de los tests devuelve "table is locked" en vez de esperar: se reintenta el paso
+        for _ in range(200):
+            try:
+                with transaction.atomic():
+                    return paso()
+            except OperationalError:
+                time.sleep(random.uniform(0.001, 0.02))
+        raise AssertionError("Demasiados bloqueos seguidos")
+
+    def _comprar(self, i, reservar=True):
+        lineas = self._reintentar(lambda: cargar_carrito({f"lic_{self.producto.id}": 1}))
+        clave = f"carrito-{i}"
+        try:
+            if reservar:
+                self._reintentar(lambda: reservas.reservar(lineas, clave))
+            self._reintentar(lambda: reservas.descontar_stock(lineas, clave))
+            return True
+        except reservas.StockInsuficiente:
+            return False
+        finally:
+            self._reintentar(lambda: reservas.liberar(clave))
+
+    def _verificar(self, resultados):
+        self.assertEqual([r for r in resultados if isinstance(r, Exception)], [])
+        self.producto.refresh_from_db()
+        self.assertEqual(resultados.count(True), self.STOCK)
+        self.assertEqual(self.producto.stock, 0)
+
+    def test_descuento_condicional_no_sobrevende(self):
+        self._verificar(martillar(lambda i: self._comprar(i, reservar=False), self.HILOS))
+
+    def test_reserva_y_compra_no_sobrevenden(self):
+        self._verificar(martillar(self._comprar, self.HILOS))
+        self.assertFalse(ReservaStock.objects.exists())
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cache')
+class CheckoutConcurrenteVistasTests(TransactionTestCase):
+    """Lo mismo por las vistas: factura previa (reserva) y procesar_orden (descuento, rollback y carrito)"""
+    HILOS = 12
+    STOCK = 5
+
+    def setUp(self):
+        self.producto = Productos.objects.create(nombre="Última Botella", precio=30, stock=self.STOCK,
+                                                 grados_alcohol=40)
+        # Sesiones en caché: solo el checkout compite por la base en memoria
+        cache.clear()
+        self.clientes = []
+        for i in range(self.HILOS):
+            user = User.objects.create_user(username=f'cliente{i}', password='password')
+            Clientes.objects.create(user=user, nombre=f"Cliente {i}", email=f"cliente{i}@example.com")
+            client = Client()
+            client.force_login(user)
+            session = client.session
+            session['cart'] = {f"lic_{self.producto.id}": 1}
+            session.save()
+            self.clientes.append(client)
+
+    def _reintentar(self, paso):
+        # Las vistas son atómicas (o lo es su reserva): si la base estaba bloqueada se repite la petición
+        for _ in range(1000):
+            try:
+                return paso()
+            except OperationalError:
+                time.sleep(random.uniform(0.001, 0.1))
+        raise AssertionError("Demasiados bloqueos seguidos")
+
+    def _comprar_por_vistas(self, i):
+        client = self.clientes[i]
+        self._reintentar(lambda: client.get(reverse('previsualizar_factura')))
+        # Los que no alcanzaron a reservar pasan la validación del stock bruto, pero el descuento los revierte
+        self._reintentar(lambda: client.get(reverse('procesar_orden', args=['PAGO'])))
+        return self._reintentar(lambda: Ordenes.objects.filter(cliente__user__username=f'cliente{i}').exists())
+
+    def test_compras_por_las_vistas_no_sobrevenden(self):
+        resultados = martillar(self._comprar_por_vistas, self.HILOS)
+        self.assertEqual([r for r in resultados if isinstance(r, Exception)], [])
+        self.producto.refresh_from_db()
+        self.assertEqual((resultados.count(True), self.producto.stock), (self.STOCK, 0))
+        self.assertEqual(Ordenes.objects.count(), self.STOCK)
+        self.assertFalse(ReservaStock.objects.exists())
+        for client, compro in zip(self.clientes, resultados):
+            # Solo se vacía el carrito de quien compró; al resto el rollback le deja el cupo como estaba
+            self.assertEqual(bool(client.session.get('cart')), not compro)
+        self.assertEqual(Clientes.objects.filter(limite_prestamo__gt=25).count(), self.STOCK)
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from licoreria import roles
+
+
+class RolesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bodega = Group.objects.create(name='Bodeguero')
+        self.usuario = User.objects.create_user('bodega', password='password')
+        self.usuario.groups.add(self.bodega)
+        self.client.force_login(self.usuario)
+
+    def _consultas_de_grupos(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, sum('auth_group' in q['sql'] for q in ctx.captured_queries)
+
+    def test_una_consulta_por_peticion_y_luego_cache(self):
+        # rol_requerido + menú de base.html leen los mismos roles
+        response, consultas = self._consultas_de_grupos(reverse('gestion_productos'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Gestión de Inventario')
+        self.assertEqual(consultas, 1)
+
+        _, consultas = self._consultas_de_grupos(reverse('gestion_productos'))
+        self.assertEqual(consultas, 0)
+
+    def test_cambios_de_grupos_invalidan(self):
+        self.assertEqual(self.usuario.rol, 'Bodeguero')
+        self.usuario.groups.add(Group.objects.create(name='Administrador'))
+        self.assertEqual(self.usuario.rol, 'Administrador')
+
+        self.bodega.user_set.remove(self.usuario)
+        usuario = User.objects.get(pk=self.usuario.pk)
+        self.assertEqual(roles.grupos_de(usuario), {'Administrador'})
+
+        Group.objects.filter(name='Administrador').update(name='Admin')  # sin señales: sigue en caché
+        self.assertEqual(roles.grupos_de(User.objects.get(pk=self.usuario.pk)), {'Administrador'})
+        grupo = Group.objects.get(name='Admin')
+        grupo.name = 'Supervisor'
+        grupo.save()
+        self.assertEqual(roles.grupos_de(User.objects.get(pk=self.usuario.pk)), {'Supervisor'})
+
+    def test_ttl_recortado_con_cache_por_proceso(self):
+        # LocMem: la invalidación no llega a los otros workers, así que los roles viven poco
+        self.assertTrue(roles.es_local())
+        self.assertEqual(roles.ttl(), 30)
+        compartida = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                      'compartida': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=compartida, ROLES_CACHE_ALIAS='compartida'):
+            self.assertFalse(roles.es_local())
+            self.assertEqual(roles.ttl(), 60 * 5)
+
+    def test_quitar_el_rol_niega_el_acceso(self):
+        self.client.get(reverse('gestion_productos'))
+        self.usuario.groups.clear()
+        response = self.client.get(reverse('gestion_productos'))
+        self.assertRedirects(response, reverse('index'), fetch_redirect_response=False)
@@ -0,0 +1,76 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from licoreria import busqueda, stub_apis
+from licoreria.cliente_http import cocktaildb
+from licoreria.models import Cocteles
+from licoreria.sincronizacion_cocteles import CheckpointLetras, SincronizadorCocteles
+
+
+class SincronizacionCoctelesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = stub_apis.ServidorStub(catalogo=stub_apis.catalogo_sintetico(productos=0, cocteles=24)).iniciar()
+        cls.enterClassContext(override_settings(**cls.stub.settings()))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.detener()
+        super().tearDownClass()
+
+    def setUp(self):
+        cocktaildb.breaker.reiniciar()
+        self.stub.llamadas.clear()
+        self.stub.tasa_error = 0
+        self.checkpoint = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'cocteles.json'
+
+    def _comando(self, *args):
+        salida = StringIO()
+        call_command('sincronizar_cocteles', '--checkpoint', str(self.checkpoint), '--por-segundo', '0',
+                     *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_sincroniza_todo_el_indice(self):
+        existente = Cocteles.objects.create(id_externo='11000', nombre='Nombre viejo', stock=7, precio=5)
+        salida = self._comando('--concurrencia', '8')
+
+        self.assertEqual(self.stub.llamadas['/search.php'], 26)
+        self.assertEqual(Cocteles.objects.count(), 24)
+        self.assertIn('23 cócteles nuevos, 1 actualizados', salida)
+        existente.refresh_from_db()
+        self.assertEqual((existente.nombre, existente.stock, existente.precio), ('Margarita', 7, 5))
+        self.assertEqual(len(busqueda.buscar_ids(busqueda.COCTEL, 'margarita')), 2)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_segunda_pasada_sin_escrituras(self):
+        self._comando()
+        sincronizador = SincronizadorCocteles(concurrencia=4, por_segundo=0)
+        with CaptureQueriesContext(connection) as consultas:
+            stats = sincronizador.sincronizar()
+        self.assertEqual((stats['sin_cambios'], stats['creados'], stats['actualizados']), (24, 0, 0))
+        self.assertEqual(len(consultas), 0)
+
+    def test_retoma_desde_el_checkpoint(self):
+        CheckpointLetras(self.checkpoint).guardar(list('abcdefghij'), None)
+        salida = self._comando()
+        self.assertIn('Retomando: 10 letras ya sincronizadas', salida)
+        self.assertEqual(self.stub.llamadas['/search.php'], 16)
+
+    def test_letras_fallidas_quedan_pendientes(self):
+        self.stub.tasa_error, self.stub.status_error = 1, 500
+        with self.assertRaisesMessage(CommandError, 'Fallaron las letras a,b'):
+            self._comando('--letras', 'ab')
+        self.assertEqual(CheckpointLetras(self.checkpoint).cargar()[0], [])
+
+        self.stub.tasa_error = 0
+        cocktaildb.breaker.reiniciar()
+        self._comando('--letras', 'ab')
+        self.assertFalse(self.checkpoint.exists())
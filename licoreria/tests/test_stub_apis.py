@@ -0,0 +1,84 @@
+import tempfile
+import time
+
+import requests
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from licoreria import stub_apis
+from licoreria.cliente_http import cocktaildb, off
+
+
+class StubAPIsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = stub_apis.ServidorStub(catalogo=stub_apis.catalogo_sintetico(productos=30, cocteles=24)).iniciar()
+        cls.enterClassContext(override_settings(**cls.stub.settings()))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub.detener()
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['apis'].clear()
+        off.breaker.reiniciar()
+        cocktaildb.breaker.reiniciar()
+        self.stub.llamadas.clear()
+        self.stub.latencia = self.stub.tasa_error = self.stub.tasa_cuelgue = 0
+
+    def test_formas_de_las_apis(self):
+        data = self.client.get(reverse('api_cocteles'), {'search': 'margarita'}).json()
+        self.assertEqual([r['nombre'] for r in data['results']], ['Margarita', 'Margarita 1'])
+        self.assertEqual(len(self.client.get(reverse('api_cocteles'), {'search': 'm'}).json()['results']), 10)
+        self.assertEqual(len(self.client.get(reverse('api_cocteles'), {'search': 'random'}).json()['results']), 1)
+        self.assertEqual(self.client.get(reverse('api_cocteles'), {'search': 'zzz'}).json()['results'], [])
+
+        ean = self.client.get(reverse('api_licores_off'), {'search': '7860000000001'}).json()
+        self.assertEqual(ean['results'][0]['nombre'], 'Ron Reserva 1')
+        self.assertEqual(self.client.get(reverse('api_licores_off'), {'search': '99999999'}).status_code, 404)
+
+        rones = self.client.get(reverse('buscar_licores_api'), {'q': 'reserva', 'cat': 'ron'}).json()
+        self.assertEqual(len(rones), 5)
+        self.assertTrue(all(r['categoria_api'] == 'en:rums' for r in rones))
+
+    def test_la_cache_evita_llamadas_repetidas(self):
+        for _ in range(3):
+            self.client.get(reverse('buscar_licores_api'), {'q': 'whisky'})
+        self.assertEqual(self.stub.llamadas['/cgi/search.pl'], 1)
+
+    def test_latencia_y_timeout(self):
+        self.stub.latencia = 0.05
+        inicio = time.monotonic()
+        off.get('cgi/search.pl', params={'search_terms': 'gin'})
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.05)
+
+        # read=0 en los reintentos: el timeout de lectura corta la llamada sin repetirla
+        self.stub.tasa_cuelgue, self.stub.cuelgue = 1, 1
+        inicio = time.monotonic()
+        with self.assertRaises(requests.RequestException):
+            off.get('cgi/search.pl', params={'search_terms': 'gin'}, timeout=(1, 0.2))
+        self.assertLess(time.monotonic() - inicio, 0.9)
+
+    def test_errores_inyectados_abren_el_breaker(self):
+        self.stub.tasa_error, self.stub.status_error = 1, 500
+        for _ in range(off.breaker.max_fallos):
+            self.assertEqual(self.client.get(reverse('api_licores_off'), {'search': 'gin'}).status_code, 500)
+            caches['apis'].clear()
+        self.assertEqual(self.client.get(reverse('api_licores_off'), {'search': 'gin'}).status_code, 503)
+        self.assertEqual(self.stub.llamadas['/cgi/search.pl'], off.breaker.max_fallos)
+
+    def test_grabar_y_reproducir(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            with stub_apis.grabacion(directorio, modo='record'):
+                grabado = self.client.get(reverse('api_cocteles'), {'search': 'mojito'}).json()
+            self.assertEqual(self.stub.llamadas['/search.php'], 1)
+
+            caches['apis'].clear()
+            with stub_apis.grabacion(directorio):
+                self.assertEqual(self.client.get(reverse('api_cocteles'), {'search': 'mojito'}).json(), grabado)
+                with self.assertRaises(stub_apis.FixtureFaltante):
+                    cocktaildb.get('search.php', params={'s': 'negroni'})
+            self.assertEqual(self.stub.llamadas['/search.php'], 1)
@@ -29,3 +29,355 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['categoria_activa_id'], self.categoria_vinos.id)
 
+
+
+class CatalogoPorCategoriaTests(TestCase):
+    def _crear_categorias(self, desde, hasta):
+        from licoreria.models import Marcas
+        marca = Marcas.objects.get_or_create(nombre="Casa")[0]
+        for i in range(desde, hasta):
+            categoria = Categorias.objects.create(nombre=f"Categoria {i}")
+            for j in range(7):
+                Productos.objects.create(nombre=f"Prod {i}-{j}", categoria=categoria, marca=marca,
+                                         precio=10, stock=10, grados_alcohol=40)
+
+    def _consultas(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('productos'))
+        return response, len(ctx.captured_queries)
+
+    def test_vista_por_categorias_con_consultas_constantes(self):
+        self._crear_categorias(0, 2)
+        Categorias.objects.create(nombre="Vacia")
+        response, pocas = self._consultas()
+        grupos = response.context['categorias_preview']
+        self.assertEqual([g['categoria'].nombre for g in grupos], ["Categoria 0", "Categoria 1"])
+        self.assertEqual([p.nombre for p in grupos[0]['productos']], [f"Prod 0-{j}" for j in range(5)])
+
+        self._crear_categorias(2, 6)
+        response, muchas = self._consultas()
+        self.assertEqual(len(response.context['categorias_preview']), 6)
+        self.assertEqual(pocas, muchas)
+
+
+class CarritoTests(TestCase):
+    def setUp(self):
+        from licoreria.models import Cocteles
+        categoria = Categorias.objects.create(nombre="Rones")
+        self.productos = [
+            Productos.objects.create(nombre=f"Ron {i}", categoria=categoria, precio=10, stock=20, grados_alcohol=40)
+            for i in range(5)
+        ]
+        self.coctel = Cocteles.objects.create(nombre="Mojito", precio=6, stock=3)
+
+    def _cargar_sesion(self, carrito):
+        session = self.client.session
+        session['cart'] = carrito
+        session.save()
+
+    def test_cargar_carrito_usa_una_consulta_por_modelo(self):
+        from licoreria.carrito import cargar_carrito, total_carrito
+        carrito = {f"lic_{p.id}": 2 for p in self.productos}
+        carrito[f"coc_{self.coctel.id}"] = 4
+        carrito["lic_999999"] = 1  # ítem eliminado: se omite
+
+        with self.assertNumQueries(2):
+            lineas = cargar_carrito(carrito)
+            [l.item.categoria for l in lineas]
+
+        self.assertEqual(len(lineas), 6)
+        self.assertEqual(total_carrito(lineas), 5 * 2 * 10 + 4 * 6)
+        self.assertTrue(lineas[-1].error_stock)
+        self.assertEqual(lineas[-1].seccion, "Cócteles")
+
+    def test_ver_carrito_consultas_constantes(self):
+        self._cargar_sesion({f"lic_{self.productos[0].id}": 1})
+        with self.assertNumQueries(2):  # sesión + productos
+            self.client.get(reverse('ver_carrito'))
+
+        self._cargar_sesion({f"lic_{p.id}": 1 for p in self.productos} | {f"coc_{self.coctel.id}": 1})
+        with self.assertNumQueries(3):  # sesión + productos + cócteles
+            response = self.client.get(reverse('ver_carrito'))
+        self.assertEqual(len(response.context['items']), 6)
+
+    def _login_cliente(self):
+        from django.contrib.auth.models import User
+        from licoreria.models import Clientes
+        user = User.objects.create_user(username='comprador', password='password')
+        Clientes.objects.create(user=user, nombre="Comprador", email="comprador@example.com")
+        self.client.force_login(user)
+
+    def _consultas_procesar(self, carrito):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._cargar_sesion(carrito)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('procesar_orden', args=['PAGO']))
+        return len(ctx.captured_queries)
+
+    def test_procesar_orden_en_sentencias_constantes(self):
+        from licoreria.models import Ordenes
+        self._login_cliente()
+        una = self._consultas_procesar({f"lic_{self.productos[0].id}": 1})
+        todas = self._consultas_procesar({f"lic_{p.id}": 2 for p in self.productos} | {f"coc_{self.coctel.id}": 1})
+        # Más líneas no suman consultas; solo los cócteles agregan su carga y su UPDATE (+2)
+        self.assertEqual(todas, una + 2)
+
+        orden = Ordenes.objects.latest('id')
+        self.assertEqual(orden.total, 5 * 2 * 10 + 6)
+        self.assertEqual(orden.detalles.count(), 6)
+        self.assertEqual([p.stock for p in Productos.objects.order_by('id')], [17, 18, 18, 18, 18])
+        self.coctel.refresh_from_db()
+        self.assertEqual(self.coctel.stock, 2)
+
+    def test_descontar_stock_detecta_sobreventa(self):
+        from licoreria.carrito import cargar_carrito
+        from licoreria.reservas import descontar_stock, StockInsuficiente
+        lineas = cargar_carrito({f"lic_{self.productos[0].id}": 5, f"lic_{self.productos[1].id}": 5})
+        # Otra compra se lleva el stock entre la validación y la confirmación
+        Productos.objects.filter(pk=self.productos[1].pk).update(stock=3)
+        with self.assertRaises(StockInsuficiente) as ctx:
+            descontar_stock(lineas)
+        self.assertEqual(ctx.exception.item.pk, self.productos[1].pk)
+
+    def test_procesar_orden_revierte_si_no_alcanza_el_stock(self):
+        from unittest import mock
+        from licoreria.reservas import StockInsuficiente
+        from licoreria.models import Ordenes
+        self._login_cliente()
+        self._cargar_sesion({f"lic_{self.productos[0].id}": 2})
+        with mock.patch('licoreria.reservas.descontar_stock', side_effect=StockInsuficiente(self.productos[0])):
+            response = self.client.get(reverse('procesar_orden', args=['PAGO']))
+        self.assertRedirects(response, reverse('ver_carrito'), fetch_redirect_response=False)
+        self.assertFalse(Ordenes.objects.exists())
+
+    def test_acciones_ajax_responden_json_sin_redirigir(self):
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        coctel = ('coc', self.coctel.id)
+        self.client.get(reverse('agregar_carrito', args=coctel), **ajax)
+        self.client.get(reverse('agregar_carrito', args=coctel), **ajax)
+        with self.assertNumQueries(6):  # ítem, sesión, cócteles del carrito y el UPDATE de la sesión (con su savepoint)
+            response = self.client.get(reverse('agregar_carrito', args=coctel), **ajax)
+        data = response.json()
+        self.assertEqual(data['cart_count'], 1)
+        self.assertEqual(data['total'], '18.00')
+        self.assertEqual(data['linea']['cantidad'], 3)
+        self.assertEqual(data['linea']['subtotal'], '18.00')
+
+        # Sin stock para otra unidad: 409 con la línea tal como está
+        response = self.client.get(reverse('agregar_carrito', args=coctel), **ajax)
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['error'])
+        self.assertEqual(response.json()['linea']['cantidad'], 3)
+
+        data = self.client.get(reverse('quitar_uno_carrito', args=coctel), **ajax).json()
+        self.assertEqual((data['linea']['cantidad'], data['total']), (2, '12.00'))
+        data = self.client.get(reverse('eliminar_item_carrito', args=coctel), **ajax).json()
+        self.assertEqual((data['linea'], data['cart_count'], data['total']), (None, 0, '0.00'))
+
+        # Sin el encabezado se mantiene la redirección de siempre
+        response = self.client.get(reverse('agregar_carrito', args=coctel))
+        self.assertRedirects(response, reverse('ver_carrito'), fetch_redirect_response=False)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from licoreria.models import Clientes
+        cache.clear()
+        self.cliente = Clientes.objects.create(nombre="Luis", email="luis@example.com", telefono="099")
+        Productos.objects.create(nombre="Gin", precio=20, stock=2, grados_alcohol=40)
+        Productos.objects.create(nombre="Vodka", precio=15, stock=30, grados_alcohol=40)
+
+    def _orden(self, codigo, total, **kwargs):
+        from licoreria.models import Ordenes
+        return Ordenes.objects.create(cliente=self.cliente, codigo_orden=codigo, total=total, **kwargs)
+
+    def test_estadisticas_en_pocas_consultas_y_cacheadas(self):
+        from django.utils import timezone
+        from licoreria.dashboard import estadisticas_dashboard
+        self._orden('V1', 100, pagada=True, estado='PAGD')
+        self._orden('S1', 40, estado='SOLI')
+        hoy = timezone.now().date()
+
+        with self.assertNumQueries(3):
+            stats = estadisticas_dashboard(hoy, ver_negocio=True, ver_bodega=True)
+        self.assertEqual(stats['ventas_hoy'], 100)
+        self.assertEqual(stats['chart_data'][-1], 100.0)
+        self.assertEqual(len(stats['chart_labels']), 7)
+        self.assertEqual(stats['solicitudes_pendientes'], 1)
+        self.assertEqual(stats['productos_stock'], 32)
+        self.assertEqual(stats['stock_bajo'], 1)
+
+        with self.assertNumQueries(0):
+            estadisticas_dashboard(hoy, ver_negocio=True, ver_bodega=True)
+
+        # Una nueva venta invalida la caché
+        self._orden('V2', 50, pagada=True, estado='PAGD')
+        stats = estadisticas_dashboard(hoy, ver_negocio=True, ver_bodega=True)
+        self.assertEqual(stats['ventas_hoy'], 150)
+
+
+class BusquedaCatalogoTests(TestCase):
+    def setUp(self):
+        from licoreria.models import Cocteles, Marcas
+        rones = Categorias.objects.create(nombre="Rones")
+        self.marca = Marcas.objects.create(nombre="Abuelo")
+        self.anejo = Productos.objects.create(nombre="Ron Añejo", categoria=rones, marca=self.marca,
+                                              precio=20, stock=5, grados_alcohol=40)
+        Productos.objects.create(nombre="Ron Blanco", categoria=rones, precio=10, stock=5, grados_alcohol=40)
+        Cocteles.objects.create(nombre="Mojito", categoria="Cocktail", ingredientes="Ron blanco, menta, limón")
+
+    def test_busqueda_sin_tildes_y_por_prefijo(self):
+        response = self.client.get(reverse('productos'), {'busqueda': 'anej'})
+        self.assertEqual([p.nombre for p in response.context['productos_globales']], ["Ron Añejo"])
+
+    def test_ordena_por_relevancia(self):
+        # "abuelo" solo aparece en la marca del añejo; "ron" en ambos nombres
+        response = self.client.get(reverse('productos'), {'busqueda': 'ron abuelo'})
+        self.assertEqual([p.nombre for p in response.context['productos_globales']], ["Ron Añejo"])
+
+    def test_indice_sigue_cambios_de_marca_y_borrado(self):
+        from licoreria import busqueda
+        self.marca.nombre = "Havana Club"
+        self.marca.save()
+        self.assertEqual(busqueda.buscar_ids(busqueda.PRODUCTO, 'havana'), [self.anejo.pk])
+        self.assertEqual(busqueda.buscar_ids(busqueda.PRODUCTO, 'abuelo'), [])
+        self.anejo.delete()
+        self.assertEqual(busqueda.buscar_ids(busqueda.PRODUCTO, 'havana'), [])
+
+    def test_cocteles_por_ingrediente(self):
+        response = self.client.get(reverse('catalogo_general'), {'q': 'limon'})
+        self.assertEqual([c.nombre for c in response.context['cocteles']], ["Mojito"])
+        self.assertEqual(list(response.context['productos']), [])
+
+
+class PaginacionTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from licoreria.models import Clientes, Ordenes
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        cliente = Clientes.objects.create(nombre="Cliente", email="cliente@example.com")
+        self.ordenes = [Ordenes.objects.create(cliente=cliente, codigo_orden=f"P{i}", total=10) for i in range(30)]
+        # Varias órdenes con la misma fecha: el id desempata
+        Ordenes.objects.filter(pk__in=[o.pk for o in self.ordenes[10:20]]).update(fecha=self.ordenes[10].fecha)
+        self.client.force_login(staff)
+
+    def test_recorre_ordenes_por_cursor_sin_repetir(self):
+        vistos = []
+        params = {}
+        while True:
+            pagina = self.client.get(reverse('ordenes'), params).context['ordenes']
+            self.assertEqual(pagina.count, 30)
+            vistos += [o.pk for o in pagina]
+            if not pagina.tiene_siguiente:
+                break
+            params = {'despues': pagina.siguiente}
+        self.assertEqual(vistos, sorted((o.pk for o in self.ordenes), reverse=True))
+
+        # Volver desde la última página a la anterior
+        anterior = self.client.get(reverse('ordenes'), {'antes': pagina.anterior}).context['ordenes']
+        self.assertEqual([o.pk for o in anterior], vistos[:25])
+        self.assertFalse(anterior.tiene_anterior)
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        pagina = self.client.get(reverse('ordenes'), {'despues': 'no-es-un-cursor'}).context['ordenes']
+        self.assertEqual(len(pagina), 25)
+        self.assertFalse(pagina.tiene_anterior)
+
+    def test_scroll_infinito_del_catalogo(self):
+        categoria = Categorias.objects.create(nombre="Licores")
+        for i in range(30):
+            Productos.objects.create(nombre=f"Licor {i:02d}", categoria=categoria, precio=10, stock=5, grados_alcohol=40)
+        response = self.client.get(reverse('productos'), {'precio_max': '50'})
+        pagina = response.context['productos_globales']
+        self.assertEqual(len(pagina), 25)
+
+        datos = self.client.get(reverse('productos_pagina'), {'precio_max': '50', 'despues': pagina.siguiente}).json()
+        self.assertEqual(datos['cantidad'], 5)
+        self.assertIn("Licor 29", datos['html'])
+        self.assertIsNone(datos['siguiente'])
+
+    def test_resultados_de_busqueda_paginados_por_relevancia(self):
+        from licoreria import busqueda
+        categoria = Categorias.objects.create(nombre="Licores")
+        for i in range(30):
+            Productos.objects.create(nombre=f"Licor {i:02d}", categoria=categoria, precio=10, stock=5, grados_alcohol=40)
+        relevancia = busqueda.buscar_ids(busqueda.PRODUCTO, 'licor')
+        pagina = self.client.get(reverse('productos'), {'busqueda': 'licor'}).context['productos_globales']
+        self.assertEqual([p.pk for p in pagina], relevancia[:25])
+        self.assertEqual(pagina.count, 30)
+
+        datos = self.client.get(reverse('productos_pagina'), {'busqueda': 'licor', 'despues': pagina.siguiente}).json()
+        self.assertEqual(datos['cantidad'], 5)
+        self.assertIsNone(datos['siguiente'])
+        siguiente = self.client.get(reverse('productos'), {'busqueda': 'licor', 'despues': pagina.siguiente})
+        self.assertEqual([p.pk for p in siguiente.context['productos_globales']], relevancia[25:])
+        self.assertIsNone(pagina.limite_busqueda)
+
+    def test_busqueda_truncada_se_avisa(self):
+        from unittest import mock
+        from licoreria import busqueda
+        categoria = Categorias.objects.create(nombre="Licores")
+        for i in range(30):
+            Productos.objects.create(nombre=f"Licor {i:02d}", categoria=categoria, precio=10, stock=5, grados_alcohol=40)
+        with mock.patch.object(busqueda, 'LIMITE_RESULTADOS', 20):
+            self.assertTrue(busqueda.buscar_ids(busqueda.PRODUCTO, 'licor').truncado)
+            response = self.client.get(reverse('productos'), {'busqueda': 'licor'})
+            datos = self.client.get(reverse('productos_pagina'), {'busqueda': 'licor'}).json()
+        pagina = response.context['productos_globales']
+        self.assertEqual((len(pagina), pagina.count, pagina.limite_busqueda), (20, 20, 20))
+        self.assertContains(response, 'más de 20 coincidencias')
+        self.assertEqual(datos['limite_busqueda'], 20)
+
+
+class FragmentosCatalogoTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.categoria = Categorias.objects.create(nombre="Whiskies")
+        self.producto = Productos.objects.create(nombre="Whisky Doce", categoria=self.categoria,
+                                                 precio=40, stock=8, grados_alcohol=40)
+
+    def _catalogo(self, **params):
+        return self.client.get(reverse('productos'), params).content.decode()
+
+    def test_tarjetas_y_secciones_se_sirven_de_cache(self):
+        self.assertIn("Whisky Doce", self._catalogo())
+        # Un UPDATE sin señales no invalida: la página sigue saliendo de la caché
+        Productos.objects.filter(pk=self.producto.pk).update(nombre="Cambiado a escondidas")
+        self.assertIn("Whisky Doce", self._catalogo())
+        self.assertIn("Whisky Doce", self._catalogo(precio_max='100'))
+
+    def test_save_de_producto_invalida_su_tarjeta(self):
+        self._catalogo()
+        self._catalogo(precio_max='100')
+        self.producto.nombre = "Whisky Dieciocho"
+        self.producto.save()
+        self.assertIn("Whisky Dieciocho", self._catalogo())
+        self.assertIn("Whisky Dieciocho", self._catalogo(precio_max='100'))
+
+    def test_descuento_de_stock_por_reservas_invalida_su_tarjeta(self):
+        from licoreria.carrito import cargar_carrito
+        from licoreria.reservas import descontar_stock
+        self.assertIn("Stock: 8", self._catalogo())
+        descontar_stock(cargar_carrito({f"lic_{self.producto.id}": 3}))
+        self.assertIn("Stock: 5", self._catalogo())
+
+    def test_reserva_de_la_factura_previa_no_invalida_su_tarjeta(self):
+        from licoreria.carrito import cargar_carrito
+        from licoreria.reservas import reservar
+        self._catalogo()
+        Productos.objects.filter(pk=self.producto.pk).update(nombre="Cambiado a escondidas")
+        # reservar() sube `version` pero no el stock: la tarjeta sigue saliendo de la caché
+        reservar(cargar_carrito({f"lic_{self.producto.id}": 3}), 'carrito-a')
+        self.assertIn("Whisky Doce", self._catalogo())
+
+    def test_cambio_de_categoria_invalida_las_secciones(self):
+        self._catalogo()
+        self.categoria.nombre = "Whiskys de Malta"
+        self.categoria.save()
+        # El nombre viejo salía en el encabezado de la sección y en la tarjeta
+        self.assertNotIn("Whiskies", self._catalogo())
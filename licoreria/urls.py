@@ -15,6 +15,7 @@ urlpatterns = [
     # General
     path('', views.index, name='index'),
     path('productos/', views.productos_catalogo, name='productos'),
+    path('productos/pagina/', views.productos_catalogo_pagina, name='productos_pagina'),
     path('clientes/', views.clientes_list, name='clientes'),
     path('clientes/<int:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('ordenes/<int:orden_id>/', views.detalle_orden, name='detalle_orden'),
@@ -55,6 +56,7 @@ urlpatterns = [
     # Administrador (Empleados y Auditoría)
     path('gestion/personal/', views.registro_empleado, name='registro_empleado'),
     path('gestion/auditoria/', views.auditoria_logs, name='auditoria_logs'),
+    path('gestion/metricas/', views.metricas_vistas, name='metricas_vistas'),
     
     # Órdenes
     path('ordenes/', views.ordenes_list, name='ordenes'),
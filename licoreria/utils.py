@@ -1,7 +1,10 @@
+from django.utils import timezone
+
 from .models import AuditLog
+from . import auditoria
 
 def log_action(user, accion, modulo, detalles=None, request=None):
-    """ Registra una acción en el AuditLog """
+    """ Registra una acción en el AuditLog (se guarda en lote, ver auditoria.py) """
     ip = None
     if request:
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -10,13 +13,14 @@ def log_action(user, accion, modulo, detalles=None, request=None):
         else:
             ip = request.META.get('REMOTE_ADDR')
             
-    AuditLog.objects.create(
-        usuario=user if user.is_authenticated else None,
+    auditoria.registrar(AuditLog(
+        usuario=user if user and user.is_authenticated else None, # None: tareas sin usuario (comandos)
         accion=accion,
         modulo=modulo,
         detalles=detalles,
-        ip_address=ip
-    )
+        ip_address=ip,
+        fecha=timezone.now(), # Hora de la acción, no la del flush
+    ))
 
 
 def check_loan_limit(cliente, nuevo_valor):
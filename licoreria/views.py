@@ -1,5 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q, Sum
+from django.template.loader import get_template
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import RowNumber
 from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
@@ -15,6 +17,14 @@ from .forms import (ClienteForm, ProductoForm, RegistroClienteForm, RecompensaFo
 from .models import (Clientes, Productos, Categorias, Marcas, Distribuidores, 
                     Recompensas, Empleados, Cocteles, Multas, AuditLog, Ordenes, DetallesOrdenes)
 from .utils import log_action
+from .carrito import cargar_carrito, total_carrito, crear_detalles, resumen_json
+from .almacen_carrito import obtener_almacen
+from . import reservas
+from .reservas import ReservaEnConflicto, StockInsuficiente
+from .dashboard import estadisticas_dashboard
+from . import busqueda as indice_busqueda
+from . import fragmentos, metricas, roles
+from .paginacion import paginar
 from .decorators import (rol_requerido, administrador_required, bodeguero_required, 
                         supervisor_required, cliente_required)
 from . import api_views
@@ -71,33 +81,18 @@ def index(request):
 
     # 3. Datos por Roles (Solo si está autenticado)
     if request.user.is_authenticated:
-        user_groups = [g.name for g in request.user.groups.all()]
+        user_groups = request.roles
         is_admin = request.user.is_superuser or 'Administrador' in user_groups
         is_bodeguero = 'Bodeguero' in user_groups
         is_supervisor = 'Supervisor' in user_groups
         is_cliente = 'Cliente' in user_groups or (not is_admin and not is_bodeguero and not is_supervisor)
 
-        # Estadísticas para Administración / Negocio
-        if is_admin or is_supervisor:
-            context['ventas_hoy'] = Ordenes.objects.filter(fecha__date=hoy, pagada=True).aggregate(Sum('total'))['total__sum'] or 0
-            context['solicitudes_pendientes'] = Ordenes.objects.filter(estado='SOLI').count()
-            context['canjes_pendientes'] = Recompensas.objects.filter(estado_solicitud='PEND').count()
-            
-            # Gráfico de ventas (7 días)
-            chart_labels = []
-            chart_data = []
-            for i in range(6, -1, -1):
-                fecha = hoy - timezone.timedelta(days=i)
-                chart_labels.append(fecha.strftime("%d/%m"))
-                venta_dia = Ordenes.objects.filter(fecha__date=fecha, pagada=True).aggregate(Sum('total'))['total__sum'] or 0
-                chart_data.append(float(venta_dia))
-            context['chart_labels'] = chart_labels
-            context['chart_data'] = chart_data
-
-        # Estadísticas para Bodega
-        if is_admin or is_bodeguero:
-            context['productos_stock'] = Productos.objects.aggregate(Sum('stock'))['stock__sum'] or 0
-            context['stock_bajo'] = Productos.objects.filter(stock__lt=5).count()
+        # Estadísticas para Administración / Negocio y Bodega (cacheadas, ver dashboard.py)
+        context.update(estadisticas_dashboard(
+            hoy,
+            ver_negocio=is_admin or is_supervisor,
+            ver_bodega=is_admin or is_bodeguero,
+        ))
 
         # Estadísticas para Cliente
         if is_cliente or cliente_perfil:
@@ -120,7 +115,7 @@ def index(request):
 @login_required
 @rol_requerido('Bodeguero', 'Administrador')
 def gestion_productos(request):
-    productos_list = Productos.objects.all().order_by('nombre')
+    productos_list = paginar(Productos.objects.all(), request, ('nombre', 'id'))
     return render(request, 'bodeguero/productos_list.html', {'productos': productos_list})
 
 @login_required
@@ -205,7 +200,7 @@ def cocteles_catalogo(request):
     cocteles = Cocteles.objects.all().order_by('nombre')
     
     if busqueda:
-        cocteles = cocteles.filter(Q(nombre__icontains=busqueda) | Q(ingredientes__icontains=busqueda))
+        cocteles = indice_busqueda.filtrar(cocteles, indice_busqueda.COCTEL, busqueda, ['nombre', 'ingredientes'])
         
     return render(request, 'cliente/cocteles_catalog.html', {'cocteles': cocteles})
 
@@ -213,7 +208,7 @@ def cocteles_catalogo(request):
 @rol_requerido('Bodeguero', 'Administrador')
 def gestion_cocteles(request):
     """Administración de la lista de cócteles importados"""
-    cocteles = Cocteles.objects.all().order_by('-fecha_creacion')
+    cocteles = paginar(Cocteles.objects.all(), request, ('-fecha_creacion', '-id'))
     return render(request, 'bodeguero/cocteles_list.html', {'cocteles': cocteles})
 
 @login_required
@@ -228,17 +223,29 @@ def eliminar_coctel(request, pk):
     return render(request, 'bodeguero/coctel_confirm_delete.html', {'coctel': coctel})
 
 # --- Auxiliares ---
-def get_cliente_perfil(request):
+_SIN_BUSCAR = object()
+
+def buscar_cliente(user):
+    """Perfil del usuario por user_id (índice único) y, si no está vinculado, por email"""
+    clientes = Clientes.objects.select_related('libro_fidelidad')
+    cliente = clientes.filter(user=user).first()
+    if cliente is None and user.email:
+        cliente = clientes.filter(email=user.email).first()
+    return cliente
+
+def get_cliente_perfil(request, crear=True):
     """
-    Retorna el perfil de cliente del usuario logueado.
-    Si es Admin/Supervisor y no tiene perfil, lo crea automáticamente.
+    Retorna el perfil de cliente del usuario logueado. Se busca una sola vez por petición.
+    Si es Admin/Supervisor y no tiene perfil, lo crea automáticamente (salvo crear=False).
     """
     if not request.user.is_authenticated:
         return None
-        
-    cliente = Clientes.objects.filter(Q(email=request.user.email) | Q(user=request.user)).first()
+
+    cliente = getattr(request, '_cliente_perfil', _SIN_BUSCAR)
+    if cliente is _SIN_BUSCAR:
+        cliente = request._cliente_perfil = buscar_cliente(request.user)
     
-    if not cliente and (request.user.is_staff or request.user.is_superuser):
+    if not cliente and crear and (request.user.is_staff or request.user.is_superuser):
         # Auto-creación para administradores
         cliente = Clientes.objects.create(
             user=request.user,
@@ -247,6 +254,7 @@ def get_cliente_perfil(request):
             telefono="0000000000",
             limite_prestamo=1000.00 # Cupo administrativo alto
         )
+        request._cliente_perfil = cliente
     return cliente
 
 # --- Vistas de Supervisor (Préstamos y Recompensas) ---
@@ -319,7 +327,7 @@ def ver_prestamos_global(request):
 @login_required
 def resumen_checkout(request):
     """Vista que muestra el resumen del carrito antes de decidir pago o préstamo"""
-    carrito = request.session.get('cart', {})
+    carrito = obtener_almacen(request).obtener()
     if not carrito:
         messages.warning(request, 'Tu carrito está vacío.')
         return redirect('index')
@@ -330,29 +338,8 @@ def resumen_checkout(request):
         messages.error(request, 'Debes completar tu perfil de cliente antes de comprar.')
         return redirect('index')
 
-    items_resumen = []
-    total = 0
-    
-    for key, cant in carrito.items():
-        try:
-            tipo, item_id = key.split('_')
-            if tipo == 'lic':
-                item = Productos.objects.select_related('categoria').get(id=item_id)
-                seccion = "Licores"
-            else:
-                item = Cocteles.objects.get(id=item_id)
-                seccion = "Cócteles"
-            
-            sub = item.precio * cant
-            total += sub
-            items_resumen.append({
-                'item': item,
-                'cantidad': cant,
-                'subtotal': sub,
-                'seccion': seccion
-            })
-        except:
-            continue
+    items_resumen = cargar_carrito(carrito)
+    total = total_carrito(items_resumen)
 
     # Validar multas pendientes (Solo informativo)
     total_deuda = float(cliente.total_deuda_multas())
@@ -367,7 +354,7 @@ def resumen_checkout(request):
 
     # Calculo de Credito Disponible (Sin restar multas)
     limite_total = cliente.limite_credito_calculado
-    deuda_ordenes = cliente.ordenes_set.filter(pagada=False).aggregate(total=Sum('total'))['total'] or Decimal('0')
+    deuda_ordenes = cliente.deuda_ordenes_pendientes
     # credito_disponible = limite_total - (deuda_ordenes + Decimal(total_deuda)) 
     credito_disponible = limite_total - deuda_ordenes
     
@@ -386,7 +373,7 @@ def resumen_checkout(request):
 @login_required
 def previsualizar_factura(request):
     """Vista de factura previa antes del pago final"""
-    carrito = request.session.get('cart', {})
+    carrito = obtener_almacen(request).obtener()
     if not carrito:
         return redirect('index')
     
@@ -396,48 +383,23 @@ def previsualizar_factura(request):
         messages.error(request, 'No se pudo identificar un perfil de cliente.')
         return redirect('index')
 
-    items_resumen = []
-    total = 0
+    items_resumen = cargar_carrito(carrito)
     subtotal_general = 0
     iva_general = 0
     
-    # Validar STOCK antes de cualquier cosa
-    for key, cant in carrito.items():
-        try:
-            tipo, item_id = key.split('_')
-            if tipo == 'lic':
-                item_val = Productos.objects.get(id=item_id)
-            else:
-                item_val = Cocteles.objects.get(id=item_id)
-            
-            if cant > item_val.stock:
-                messages.error(request, f'Stock insuficiente para {item_val.nombre}. Disponibles: {item_val.stock}')
-                return redirect('ver_carrito')
-            if item_val.stock <= 0:
-                 messages.error(request, f'El producto {item_val.nombre} se ha agotado.')
-                 return redirect('ver_carrito')
-        except:
-             continue # Si hay error de datos, se limpiará luego o ignorará
+    # Validar STOCK antes de cualquier cosa y apartarlo mientras el cliente confirma
+    for linea in items_resumen:
+        item_val = linea.item
+        if item_val.stock <= 0:
+             messages.error(request, f'El producto {item_val.nombre} se ha agotado.')
+             return redirect('ver_carrito')
+    try:
+        reservas.reservar(items_resumen, reservas.clave_sesion(request))
+    except (StockInsuficiente, ReservaEnConflicto) as e:
+        messages.error(request, str(e))
+        return redirect('ver_carrito')
 
-    for key, cant in carrito.items():
-        try:
-            tipo, item_id = key.split('_')
-            if tipo == 'lic':
-                item = Productos.objects.select_related('categoria').get(id=item_id)
-            else:
-                item = Cocteles.objects.get(id=item_id)
-            
-            sub = item.precio * cant
-            total += sub
-            items_resumen.append({
-                'item': item,
-                'cantidad': cant,
-                'subtotal': sub,
-                'tipo': tipo,
-                'item_id': item_id
-            })
-        except:
-            continue
+    total = total_carrito(items_resumen)
             
     # Calculos básicos de factura
     # --- Lógica Descuentos ---
@@ -545,7 +507,7 @@ def previsualizar_factura(request):
 @transaction.atomic
 def procesar_orden(request, tipo):
     """Procesa la orden como PAGO o PRESTAMO"""
-    carrito = request.session.get('cart', {})
+    carrito = obtener_almacen(request).obtener()
     if not carrito:
         return redirect('index')
 
@@ -556,27 +518,18 @@ def procesar_orden(request, tipo):
         return redirect('index')
 
     # Calcular total
+    lineas = cargar_carrito(carrito)
     total_orden = Decimal('0.00')
-    items_to_process = []
     
-    for key, cant in carrito.items():
-        try:
-            t, item_id = key.split('_')
-            if t == 'lic':
-                item = Productos.objects.get(id=item_id)
-            else:
-                item = Cocteles.objects.get(id=item_id)
-            
-            # --- VALIDACIÓN FINAL DE STOCK ---
-            if cant > item.stock:
-                messages.error(request, f"¡CRÍTICO! Stock insuficiente para {item.nombre} al procesar. Disponibles: {item.stock}")
-                return redirect('ver_carrito')
-            
-            subtotal = item.precio * cant
-            total_orden += subtotal
-            items_to_process.append((item, cant, item.precio))
-        except:
-            continue
+    for linea in lineas:
+        item, cant = linea.item, linea.cantidad
+        
+        # --- VALIDACIÓN FINAL DE STOCK ---
+        if cant > item.stock:
+            messages.error(request, f"¡CRÍTICO! Stock insuficiente para {item.nombre} al procesar. Disponibles: {item.stock}")
+            return redirect('ver_carrito')
+        
+        total_orden += linea.subtotal
 
     # Validar crédito y multas si no es administrativo
     es_admin = request.user.is_staff or request.user.is_superuser
@@ -608,7 +561,7 @@ def procesar_orden(request, tipo):
 
         # 2. Bloqueo por límite de crédito REAL (Límite - Deuda Actual)
         limite_total = cliente.limite_credito_calculado
-        deuda_ordenes = cliente.ordenes_set.filter(pagada=False).aggregate(total=Sum('total'))['total'] or Decimal('0')
+        deuda_ordenes = cliente.deuda_ordenes_pendientes
         credito_disponible = limite_total - (deuda_ordenes + deuda_multas)
         
         if total_orden > credito_disponible:
@@ -649,6 +602,16 @@ def procesar_orden(request, tipo):
     else:
         return redirect('resumen_checkout')
 
+    # Descontar stock de todas las líneas con un UPDATE condicional por modelo (ver reservas.py).
+    # Si otra compra se llevó el stock desde la validación, se revierte todo (puntos incluidos).
+    clave_reserva = reservas.clave_sesion(request)
+    try:
+        reservas.descontar_stock(lineas, clave_reserva)
+    except StockInsuficiente as e:
+        transaction.set_rollback(True)
+        messages.error(request, f"¡CRÍTICO! {e}")
+        return redirect('ver_carrito')
+
     # Crear Orden
     orden = Ordenes.objects.create(
         cliente=cliente,
@@ -667,29 +630,12 @@ def procesar_orden(request, tipo):
         recompensa_usada.save()
         request.session.pop('descuento_id', None)
 
-    # Crear Detalles y descontar stock
-    for item, cant, precio in items_to_process:
-        if isinstance(item, Productos):
-            DetallesOrdenes.objects.create(
-                orden=orden,
-                producto=item,
-                cantidad=cant,
-                precio_unitario=precio
-            )
-            # El stock de Productos se descuenta vía señal post_save en DetallesOrdenes
-        else:
-            # Para Cocteles, ahora sí guardamos el detalle
-            DetallesOrdenes.objects.create(
-                orden=orden,
-                coctel=item, # Guardamos en el campo coctel
-                cantidad=cant,
-                precio_unitario=precio
-            )
-            # Descontamos stock vía señal post_save en DetallesOrdenes (ahora soporta cocteles)
-            pass
+    # Crear Detalles (un solo INSERT; el stock ya se descontó arriba)
+    crear_detalles(orden, lineas)
+    reservas.liberar(clave_reserva)
 
     # Limpiar carrito
-    request.session['cart'] = {}
+    obtener_almacen(request).vaciar()
     
     messages.success(request, mensaje)
     return redirect('ordenes')
@@ -731,7 +677,7 @@ def gestion_multas(request):
 def ver_multas_global(request):
     """Vista global de todas las multas de todos los usuarios"""
     # Obtener todas las multas ordenadas por fecha (más recientes primero)
-    multas = Multas.objects.select_related('cliente', 'orden').order_by('-fecha_generada')
+    multas = paginar(Multas.objects.select_related('cliente', 'orden'), request, ('-fecha_generada', '-id'))
     
     return render(request, 'global/multas.html', {
         'multas': multas,
@@ -741,9 +687,15 @@ def ver_multas_global(request):
 @administrador_required
 def auditoria_logs(request):
     """ Visualización de logs de auditoría (Solo Admin) """
-    logs = AuditLog.objects.all()[:200] # Mostrar últimos 200
+    logs = paginar(AuditLog.objects.select_related('usuario'), request, ('-fecha', '-id'), por_pagina=50)
     return render(request, 'admin/logs.html', {'logs': logs})
 
+@login_required
+@administrador_required
+def metricas_vistas(request):
+    """ Consultas SQL y latencias por vista en las últimas peticiones de este proceso (Solo Admin) """
+    return JsonResponse({'ventana': metricas.config()['WINDOW'], 'vistas': metricas.registro.resumen()})
+
 @login_required
 @rol_requerido('Supervisor', 'Administrador', 'Bodeguero')
 def gestion_recompensas(request):
@@ -776,12 +728,8 @@ def gestion_recompensas(request):
     ).order_by('-fecha_solicitud')
     
     # Intento de obtener perfil de cliente para el supervisor (si quiere canjear)
-    puntos_usuario = 0
-    try:
-        match_cliente = Clientes.objects.get(user=request.user)
-        puntos_usuario = match_cliente.puntos_acumulados
-    except Clientes.DoesNotExist:
-        puntos_usuario = 0
+    match_cliente = get_cliente_perfil(request, crear=False)
+    puntos_usuario = match_cliente.puntos_acumulados if match_cliente else 0
         
     cupones = [r for r in CATALOGO_RECOMPENSAS if r.get('seccion') == 'efectivo']
     porcentajes = [r for r in CATALOGO_RECOMPENSAS if r.get('seccion') == 'porcentaje']
@@ -824,8 +772,9 @@ def gestion_recompensas(request):
 @rol_requerido('Supervisor', 'Administrador')
 def ver_canjes_global(request):
     """Vista global de todos los canjes de puntos de todos los usuarios"""
-    # Obtener todas las recompensas ordenadas por fecha de solicitud (más recientes primero)
-    canjes = Recompensas.objects.select_related('cliente', 'supervisor_aprobador').order_by('-fecha_solicitud', '-fecha_otorgada')
+    # Más recientes primero; fecha_solicitud admite NULL, así que el cursor va sobre fecha_otorgada
+    canjes = paginar(Recompensas.objects.select_related('cliente', 'supervisor_aprobador'),
+                     request, ('-fecha_otorgada', '-id'))
     
     return render(request, 'global/canjes.html', {
         'canjes': canjes,
@@ -838,14 +787,15 @@ def ordenes_list(request):
     if not (request.user.is_staff or request.user.is_superuser):
         return redirect('mis_compras')
     
-    ordenes = Ordenes.objects.select_related('cliente').all().order_by('-fecha')
+    ordenes_qs = Ordenes.objects.select_related('cliente')
+    ordenes = paginar(ordenes_qs, request, ('-fecha', '-id'))
     
     # Calcular estadísticas
     stats = {
-        'solicitudes': ordenes.filter(estado='SOLI').count(),
-        'prestamos': ordenes.filter(estado='PREST').count(),
-        'pagadas': ordenes.filter(estado='PAGD').count(),
-        'pendientes_pago': ordenes.filter(pagada=False).exclude(estado='CANC').count()
+        'solicitudes': ordenes_qs.filter(estado='SOLI').count(),
+        'prestamos': ordenes_qs.filter(estado='PREST').count(),
+        'pagadas': ordenes_qs.filter(estado='PAGD').count(),
+        'pendientes_pago': ordenes_qs.filter(pagada=False).exclude(estado='CANC').count()
     }
     
     return render(request, 'ordenes.html', {'ordenes': ordenes, 'stats': stats})
@@ -887,7 +837,7 @@ def mis_compras(request):
     if not cliente:
         return redirect('index')
     
-    ordenes = Ordenes.objects.filter(cliente=cliente).order_by('-fecha')
+    ordenes = paginar(Ordenes.objects.filter(cliente=cliente), request, ('-fecha', '-id'))
     return render(request, 'cliente/mis_compras.html', {
         'ordenes': ordenes,
         'cliente': cliente
@@ -946,12 +896,9 @@ def marcar_orden_pagada(request, pk):
 @cliente_required
 def mis_prestamos(request):
     # Mostrar solo préstamos activos (PREST), no solicitudes
-    try:
-        cliente_perfil = Clientes.objects.get(email=request.user.email)
-        # Buscar solo órdenes con estado PREST (préstamos activos)
-        prestamos = Ordenes.objects.filter(cliente=cliente_perfil, estado='PREST').order_by('-fecha')
-    except Clientes.DoesNotExist:
-        prestamos = []
+    cliente_perfil = get_cliente_perfil(request, crear=False)
+    # Buscar solo órdenes con estado PREST (préstamos activos)
+    prestamos = Ordenes.objects.filter(cliente=cliente_perfil, estado='PREST').order_by('-fecha') if cliente_perfil else []
     
     return render(request, 'cliente/mis_prestamos.html', {'prestamos': prestamos})
 
@@ -1050,7 +997,7 @@ def registro_empleado(request):
     empleados = Empleados.objects.all().select_related('user').order_by('-id')
     
     # También incluir administradores que no tienen registro en Empleados
-    staff_users = User.objects.filter(is_staff=True).select_related('empleados')
+    staff_users = User.objects.filter(is_staff=True).select_related('empleados').prefetch_related('groups')
     
     return render(request, 'admin/empleados.html', {
         'empleados': empleados,
@@ -1064,19 +1011,43 @@ def importar_cocteles(request):
     categorias = Categorias.objects.all()
     return render(request, 'bodeguero/importar_cocteles.html', {'categorias': categorias})
 
-def productos_catalogo(request):
-    # Ya no excluimos nada, mostramos todo
-    categorias = Categorias.objects.all()
-    
+PRODUCTOS_POR_CATEGORIA = 5
+
+def top_productos_por_categoria(limite):
+    """
+    {categoria_id: [productos]} con los primeros `limite` productos de cada categoría.
+    Usa ROW_NUMBER() OVER (PARTITION BY categoria_id) para hacerlo en una sola consulta.
+    """
+    fila = Window(RowNumber(), partition_by=[F('categoria_id')], order_by=F('id').asc())
+    productos = (Productos.objects
+                 .filter(categoria__isnull=False)
+                 .select_related('marca', 'categoria')
+                 .annotate(fila=fila)
+                 .filter(fila__lte=limite)
+                 .order_by('categoria_id', 'fila'))
+    por_categoria = {}
+    for producto in productos:
+        por_categoria.setdefault(producto.categoria_id, []).append(producto)
+    return por_categoria
+
+def productos_filtrados(request):
+    """
+    Página de productos del catálogo según los filtros de la URL (busqueda, categoria, precio_max).
+    Se pagina por cursor: con texto de búsqueda sobre (relevancia, nombre, id), sin texto
+    sobre (nombre, id).
+    """
     categoria_id = request.GET.get('categoria')
     busqueda = request.GET.get('busqueda')
     precio_max = request.GET.get('precio_max')
-    
-    productos_list = Productos.objects.all()
-    
-    # Filtros
+
+    productos_list = Productos.objects.select_related('marca', 'categoria')
+    truncado = False
+
     if busqueda:
-        productos_list = productos_list.filter(Q(nombre__icontains=busqueda) | Q(marca__nombre__icontains=busqueda))
+        # Índice de texto completo: sin tildes, por prefijo y ordenado por relevancia. Solo pagina
+        # las LIMITE_RESULTADOS coincidencias más relevantes; si había más, la plantilla lo avisa.
+        productos_list, truncado = indice_busqueda.filtrar_con_limite(
+            productos_list, indice_busqueda.PRODUCTO, busqueda, ['nombre', 'marca__nombre'])
     if categoria_id:
         productos_list = productos_list.filter(categoria_id=categoria_id)
     if precio_max:
@@ -1084,6 +1055,21 @@ def productos_catalogo(request):
              productos_list = productos_list.filter(precio__lte=float(precio_max))
         except ValueError:
              pass
+
+    # Con búsqueda, por relevancia (filtrar() la anota); nombre e id desempatan
+    orden = ('relevancia', 'nombre', 'id') if busqueda else ('nombre', 'id')
+    pagina = paginar(productos_list, request, orden)
+    pagina.limite_busqueda = indice_busqueda.LIMITE_RESULTADOS if truncado else None
+    fragmentos.versionar(pagina.items)
+    return pagina
+
+def productos_catalogo(request):
+    # Ya no excluimos nada, mostramos todo
+    categorias = Categorias.objects.all()
+    
+    categoria_id = request.GET.get('categoria')
+    busqueda = request.GET.get('busqueda')
+    precio_max = request.GET.get('precio_max')
         
     categoria_activa_id = None
     if categoria_id:
@@ -1097,16 +1083,18 @@ def productos_catalogo(request):
     # 2. Si NO hay filtros, mostrar vista por categorías (Top 5 por categoría).
     
     modo_busqueda = True if (busqueda or categoria_id or precio_max) else False
+    productos_list = productos_filtrados(request) if modo_busqueda else []
     
     categorias_preview = []
     if not modo_busqueda:
+        # Los primeros 5 productos de cada categoría, todos en una sola consulta
+        por_categoria = top_productos_por_categoria(PRODUCTOS_POR_CATEGORIA)
         for cat in categorias:
-            # Traer solo los primeros 5 productos de cada categoria
-            prods = Productos.objects.filter(categoria=cat)[:5]
-            if prods.exists():
+            if cat.id in por_categoria:
                 categorias_preview.append({
                     'categoria': cat,
-                    'productos': prods
+                    'productos': por_categoria[cat.id],
+                    'firma': fragmentos.versionar(por_categoria[cat.id]),
                 })
 
     return render(request, 'productos.html', {
@@ -1117,10 +1105,25 @@ def productos_catalogo(request):
         'categoria_activa_id': categoria_activa_id
     })
 
+def productos_catalogo_pagina(request):
+    """Siguiente página del catálogo filtrado en JSON (scroll infinito): tarjetas ya renderizadas y cursor"""
+    pagina = productos_filtrados(request)
+    tarjeta = get_template('licoreria/components/product_card.html')
+    html = ''.join(tarjeta.render({'producto': p}, request) for p in pagina)
+    return JsonResponse({'html': html, 'cantidad': len(pagina), 'siguiente': pagina.siguiente,
+                         'limite_busqueda': pagina.limite_busqueda})
+
+
+def _es_ajax(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
 
+def _respuesta_carrito_json(almacen, key, message, error=False, status=200):
+    """Respuesta de las acciones del carrito por AJAX: la línea tocada, el conteo y el total, sin redirigir"""
+    datos = resumen_json(cargar_carrito(almacen.obtener()), key)
+    return JsonResponse({'message': message, 'error': error, **datos}, status=status)
 
 def agregar_carrito(request, tipo, item_id):
-    carrito = request.session.get('cart', {})
+    almacen = obtener_almacen(request)
     # Prefix: lic_ for Productos, coc_ for Cocteles
     key = f"{tipo}_{item_id}"
     
@@ -1131,17 +1134,20 @@ def agregar_carrito(request, tipo, item_id):
     else:
         return JsonResponse({'message': 'Tipo inválido', 'error': True}, status=400)
     
-    cantidad_actual = carrito.get(key, 0)
+    cantidad_actual = almacen.cantidad(key)
     if cantidad_actual + 1 > item.stock:
+         if _es_ajax(request):
+             return _respuesta_carrito_json(almacen, key, f'No hay más stock disponible de {item.nombre}',
+                                            error=True, status=409)
          messages.error(request, f'No hay más stock disponible de {item.nombre}')
          referer = request.META.get('HTTP_REFERER')
          return redirect(referer) if referer else redirect('ver_carrito')
 
-    carrito[key] = cantidad_actual + 1
-    request.session['cart'] = carrito
-    
-    total_items = sum(carrito.values())
+    almacen.incrementar(key)
     
+    if _es_ajax(request):
+        return _respuesta_carrito_json(almacen, key, f'¡{item.nombre} agregado al carrito!')
+
     messages.success(request, f'¡{item.nombre} agregado al carrito!')
     
     # Redirigir a la misma página (Catálogo o Carrito)
@@ -1149,80 +1155,40 @@ def agregar_carrito(request, tipo, item_id):
     return redirect(referer) if referer else redirect('ver_carrito')
 
 def quitar_uno_carrito(request, tipo, item_id):
-    carrito = request.session.get('cart', {})
+    almacen = obtener_almacen(request)
     key = f"{tipo}_{item_id}"
     
-    if key in carrito:
-        if carrito[key] > 1:
-            carrito[key] -= 1
-            messages.success(request, 'Cantidad actualizada.')
-        else:
-            del carrito[key]
-            messages.success(request, 'Producto eliminado del carrito.')
-        request.session['cart'] = carrito
+    mensaje = None
+    if almacen.cantidad(key):
+        mensaje = 'Cantidad actualizada.' if almacen.incrementar(key, -1) else 'Producto eliminado del carrito.'
         
+    if _es_ajax(request):
+        return _respuesta_carrito_json(almacen, key, mensaje or 'El producto no está en el carrito.')
+    if mensaje:
+        messages.success(request, mensaje)
     return redirect('ver_carrito')
 
 def eliminar_item_carrito(request, tipo, item_id):
-    carrito = request.session.get('cart', {})
+    almacen = obtener_almacen(request)
     key = f"{tipo}_{item_id}"
     
-    if key in carrito:
-        del carrito[key]
-        request.session['cart'] = carrito
-        messages.success(request, 'Producto eliminado del carrito.')
+    eliminado = bool(almacen.cantidad(key))
+    if eliminado:
+        almacen.quitar(key)
         
+    if _es_ajax(request):
+        return _respuesta_carrito_json(almacen, key, 'Producto eliminado del carrito.')
+    if eliminado:
+        messages.success(request, 'Producto eliminado del carrito.')
     return redirect('ver_carrito')
 
 def ver_carrito(request):
-    carrito = request.session.get('cart', {})
-    items_carrito = []
-    total = 0
-    
-    for key, cant in carrito.items():
-        try:
-            tipo, item_id = key.split('_')
-            if tipo == 'lic':
-                item = Productos.objects.get(id=item_id)
-                seccion = "Licores"
-            else:
-                item = Cocteles.objects.get(id=item_id)
-                seccion = "Cócteles"
-            
-            subtotal = item.precio * cant
-            total += subtotal
-            
-            # Validacion de Stock
-            error_stock = False
-            msg_stock = ""
-            if cant > item.stock:
-                error_stock = True
-                msg_stock = f"Stock insuficiente (Máx: {item.stock})"
-            
-            items_carrito.append({
-                'item': item,
-                'cantidad': cant,
-                'subtotal': subtotal,
-                'tipo': tipo,
-                'item_id': item_id,
-                'seccion': seccion,
-                'error_stock': error_stock,
-                'msg_stock': msg_stock
-            })
-        except Exception as e:
-            print(f"Error procesando item {key}: {e}")
+    carrito = obtener_almacen(request).obtener()
+    items_carrito = cargar_carrito(carrito)
+    total = total_carrito(items_carrito)
             
     # Obtener perfil de cliente para validar límites
-    cliente = None
-    if request.user.is_authenticated:
-        try:
-            # Intentar obtener el cliente por email o por usuario vinculado
-            try:
-                cliente = Clientes.objects.get(email=request.user.email)
-            except Clientes.DoesNotExist:
-                cliente = Clientes.objects.get(user=request.user)
-        except Clientes.DoesNotExist:
-            pass
+    cliente = get_cliente_perfil(request, crear=False)
             
     # Calculos de Credito Disponible
     credito_disponible = Decimal('0.00')
@@ -1233,7 +1199,7 @@ def ver_carrito(request):
         limite_total = cliente.limite_credito_calculado
         
         # 2. Calcular deuda actual (Ordenes no pagadas)
-        deuda_ordenes = cliente.ordenes_set.filter(pagada=False).aggregate(total=Sum('total'))['total'] or Decimal('0')
+        deuda_ordenes = cliente.deuda_ordenes_pendientes
         
         # 3. Calcular deuda multas
         deuda_multas = cliente.total_deuda_multas()
@@ -1243,7 +1209,7 @@ def ver_carrito(request):
         deuda_total = deuda_ordenes 
         credito_disponible = limite_total - deuda_total
         
-    hay_errores_stock = any(i['error_stock'] for i in items_carrito)
+    hay_errores_stock = any(i.error_stock for i in items_carrito)
             
     return render(request, 'carrito.html', {
         'items': items_carrito, 
@@ -1274,21 +1240,21 @@ def clientes_list(request):
     else:
         form = ClienteForm()
     
-    clientes = Clientes.objects.filter(Q(user__isnull=True) | Q(user__is_staff=False))
+    clientes = paginar(Clientes.objects.filter(Q(user__isnull=True) | Q(user__is_staff=False)),
+                       request, ('nombre', 'id'))
     return render(request, 'clientes.html', {'clientes': clientes, 'form': form})
 
 def detalle_cliente(request, cliente_id):
     """Ficha completa del cliente con todo su historial y solicitudes"""
     cliente = get_object_or_404(Clientes, id=cliente_id)
     
-    # Seguridad: Si no es Staff/Admin, solo puede ver su propio perfil
+    # Seguridad: Si no es Staff/Admin, solo puede ver el perfil vinculado a su usuario.
+    # No se usa get_cliente_perfil: su respaldo por email sirve para encontrar, no para autorizar.
     if not (request.user.is_staff or request.user.is_superuser):
-        try:
-            propio_perfil = Clientes.objects.get(user=request.user)
-            if cliente.id != propio_perfil.id:
-                 messages.error(request, "No tienes permiso para ver este perfil.")
-                 return redirect('index')
-        except Clientes.DoesNotExist:
+        if not request.user.is_authenticated:
+             return redirect('index')
+        if cliente.user_id != request.user.id:
+             messages.error(request, "No tienes permiso para ver este perfil.")
              return redirect('index')
     
     # Órdenes recientes
@@ -1325,8 +1291,8 @@ def catalogo_general(request):
     cocteles = Cocteles.objects.all()
     
     if query:
-        productos = productos.filter(Q(nombre__icontains=query) | Q(categoria__nombre__icontains=query))
-        cocteles = cocteles.filter(Q(nombre__icontains=query) | Q(categoria__icontains=query))
+        productos = indice_busqueda.filtrar(productos, indice_busqueda.PRODUCTO, query, ['nombre', 'categoria__nombre'])
+        cocteles = indice_busqueda.filtrar(cocteles, indice_busqueda.COCTEL, query, ['nombre', 'categoria'])
         
     context = {
         'productos': productos,
@@ -1350,7 +1316,7 @@ def detalle_orden(request, orden_id):
     orden = get_object_or_404(Ordenes, id=orden_id)
     # Seguridad: solo el dueño o personal puede verla
     if not request.user.is_superuser and request.user.email != orden.cliente.email:
-        if not request.user.groups.filter(name__in=['Supervisor', 'Bodeguero']).exists():
+        if roles.EMPLEADOS.isdisjoint(request.roles):
             return redirect('index')
             
     detalles = DetallesOrdenes.objects.filter(orden=orden)
@@ -1480,12 +1446,8 @@ def solicitar_recompensa(request):
 @login_required
 def mis_recompensas(request):
     """Cliente ve sus recompensas"""
-    try:
-        cliente = Clientes.objects.get(email=request.user.email)
-        recompensas = Recompensas.objects.filter(cliente=cliente).order_by('-fecha_solicitud', '-fecha_otorgada')
-    except Clientes.DoesNotExist:
-        recompensas = []
-        cliente = None
+    cliente = get_cliente_perfil(request, crear=False)
+    recompensas = Recompensas.objects.filter(cliente=cliente).order_by('-fecha_solicitud', '-fecha_otorgada') if cliente else []
     
     return render(request, 'cliente/mis_recompensas.html', {
         'recompensas': recompensas,
@@ -1506,7 +1468,7 @@ def cocteles_catalogo(request):
     categoria = request.GET.get('categoria')
     
     if busqueda:
-        cocteles_list = cocteles_list.filter(nombre__icontains=busqueda)
+        cocteles_list = indice_busqueda.filtrar(cocteles_list, indice_busqueda.COCTEL, busqueda, ['nombre'])
     
     if categoria:
         cocteles_list = cocteles_list.filter(categoria__icontains=categoria)
@@ -1550,13 +1512,12 @@ def confirmar_entrega_recompensa(request, recompensa_id):
     recompensa = get_object_or_404(Recompensas, id=recompensa_id)
     
     # Verificar que sea del cliente
-    try:
-        cliente = Clientes.objects.get(email=request.user.email)
-        if recompensa.cliente != cliente:
-            messages.error(request, 'No tienes permiso para esta acción.')
-            return redirect('mis_recompensas')
-    except Clientes.DoesNotExist:
+    cliente = get_cliente_perfil(request, crear=False)
+    if not cliente:
         return redirect('index')
+    if recompensa.cliente != cliente:
+        messages.error(request, 'No tienes permiso para esta acción.')
+        return redirect('mis_recompensas')
     
     if recompensa.estado_solicitud == 'APROB':
         recompensa.estado_solicitud = 'ENTR'
@@ -1611,21 +1572,9 @@ def aprobar_recompensa(request, recompensa_id):
 def panel_fidelidad(request):
     """Panel completo de fidelidad del cliente con historial de puntos"""
     # Obtener el cliente
-    try:
-        if request.user.is_staff or request.user.is_superuser:
-            # Si es staff, crear perfil maestro si no existe
-            cliente, created = Clientes.objects.get_or_create(
-                email=request.user.email,
-                defaults={
-                    'nombre': request.user.get_full_name() or request.user.username,
-                    'telefono': '0000000000'
-                }
-            )
-        else:
-            cliente = Clientes.objects.get(
-                Q(email=request.user.email) | Q(user=request.user)
-            )
-    except Clientes.DoesNotExist:
+    # Si es staff, se crea su perfil si no existe
+    cliente = get_cliente_perfil(request)
+    if not cliente:
         messages.error(request, 'No se encontró tu perfil de cliente.')
         return redirect('index')
     